@@ -76,14 +76,15 @@ class AvatarAdmin(admin.ModelAdmin):
 
 @admin.register(AvatarSource)
 class AvatarSourceAdmin(admin.ModelAdmin):
-    list_display = ("avatar", "source_type", "enabled", "include_for_knowledge", "include_for_tone", "created_at")
+    list_display = ("avatar", "source_type", "enabled", "include_for_knowledge", "include_for_tone", "trained_at", "created_at")
     list_filter = ("source_type", "enabled", "include_for_knowledge", "include_for_tone")
     search_fields = ("avatar__name",)
     # FIX: AvatarSource model does not have 'updated_at'
-    readonly_fields = ("created_at",) 
+    readonly_fields = ("created_at", "fingerprint", "high_water_mark", "trained_at")
     fields = (
         "avatar", "source_type", "enabled",
         "include_for_knowledge", "include_for_tone", "metadata",
+        "fingerprint", "high_water_mark", "trained_at",
         "created_at", 
     )
 
@@ -97,10 +98,10 @@ class AvatarTrainingJobAdmin(admin.ModelAdmin):
     # FIX: AvatarTrainingJob model does not have 'created_at' as an explicit field, 
     
     # As the model does not have 'created_at', I will remove it.
-    list_display = ("avatar", "status", "started_at", "finished_at")
+    list_display = ("avatar", "status", "progress", "chunks_written", "started_at", "finished_at")
     list_filter = ("status",) # FIX: Removed "created_at"
     search_fields = ("avatar__name",)
-    readonly_fields = ("logs", "started_at", "finished_at") # FIX: Removed "created_at"
+    readonly_fields = ("logs", "checkpoint", "chunks_written", "progress", "started_at", "finished_at") # FIX: Removed "created_at"
 
     fields = (
         "avatar", "status",
@@ -118,7 +119,7 @@ class AvatarMemoryChunkAdmin(admin.ModelAdmin):
     list_display = ("avatar", "source_type", "short_text", "created_at")
     search_fields = ("text", "avatar__name")
     list_filter = ("source_type",)
-    readonly_fields = ("embedding", "created_at")
+    readonly_fields = ("embedding", "content_hash", "created_at")
 
     def short_text(self, obj):
         return obj.text[:80] + "..." if len(obj.text) > 80 else obj.text
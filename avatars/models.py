@@ -3,6 +3,8 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 
+from whisone.fields import VectorField
+
 # ----------------------------
 # Core Models
 # ----------------------------
@@ -134,6 +136,10 @@ class AvatarSource(models.Model):
     include_for_knowledge = models.BooleanField(default=True)
     enabled = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Change detection: hash of the source's settings and its items' versions when last trained
+    fingerprint = models.CharField(max_length=64, blank=True, default="")
+    high_water_mark = models.DateTimeField(null=True, blank=True)  # newest item updated_at seen
+    trained_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.source_type} → {self.avatar.name}"
@@ -157,10 +163,16 @@ class AvatarTrainingJob(models.Model):
     logs = models.TextField(blank=True, null=True)
     started_at = models.DateTimeField(null=True, blank=True)
     finished_at = models.DateTimeField(null=True, blank=True)
+    # Resume point: {"sources_done": [source ids], "source": id, "offset": chunks of it written}
+    checkpoint = models.JSONField(default=dict, blank=True)
+    chunks_written = models.IntegerField(default=0)
+    progress = models.PositiveSmallIntegerField(default=0)  # percent
 
-    def add_log(self, text):
+    def add_log(self, text, save=True):
+        """Appends a log line; with save=False it is written by the job's next save."""
         self.logs = (self.logs or "") + f"[{timezone.now()}] {text}\n"
-        self.save()
+        if save:
+            self.save(update_fields=["logs"])
 
     def __str__(self):
         return f"TrainingJob({self.avatar.name}) - {self.status}"
@@ -171,11 +183,14 @@ class AvatarMemoryChunk(models.Model):
     Stores chunks of knowledge / embeddings for AI responses
     """
     avatar = models.ForeignKey(Avatar, on_delete=models.CASCADE, related_name="chunks")
+    origin = models.ForeignKey(AvatarSource, on_delete=models.CASCADE, null=True, blank=True, related_name="chunks")
     chunk_id = models.UUIDField(default=uuid.uuid4, editable=False)
     text = models.TextField()
+    content_hash = models.CharField(max_length=64, blank=True, default="")
     source_type = models.CharField(max_length=50)
     source_id = models.CharField(max_length=200, null=True, blank=True)
-    embedding = models.JSONField(null=True, blank=True)  # optional if using vector DB
+    embedding = VectorField(multi=True, null=True, blank=True)  # one row per embedded passage
+    embedding_space = models.CharField(max_length=100, blank=True, default="", db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
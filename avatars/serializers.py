@@ -278,18 +278,23 @@ class AvatarTrainingJobSerializer(serializers.ModelSerializer):
     Handles serialization for AvatarTrainingJob.
     Includes a 'progress' field for UI monitoring.
     """
-    progress = serializers.IntegerField(default=0) 
+    progress = serializers.IntegerField(default=0, read_only=True)
 
     class Meta:
         model = AvatarTrainingJob
         fields = [
-            "id", "avatar", "status", "progress", "logs", "started_at", "finished_at",
+            "id", "avatar", "status", "progress", "chunks_written", "logs", "started_at", "finished_at",
         ]
-        read_only_fields = ["logs", "started_at", "finished_at"]
+        read_only_fields = ["logs", "chunks_written", "started_at", "finished_at"]
 
 
 class AvatarMemoryChunkSerializer(serializers.ModelSerializer):
     """Handles serialization for AvatarMemoryChunk (RAG data chunks)."""
+    embedding = serializers.SerializerMethodField()
+
+    def get_embedding(self, obj):
+        return obj.embedding.tolist() if obj.embedding is not None else None
+
     class Meta:
         model = AvatarMemoryChunk
         fields = [
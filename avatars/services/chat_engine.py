@@ -1,55 +1,28 @@
 # avatars/tasks/chat.py
 from celery import shared_task
-from openai import OpenAI
-from avatars.models import AvatarConversation, AvatarMessage
-import numpy as np
-from django.conf import settings
+from avatars.models import AvatarConversation, AvatarMemoryChunk, AvatarMessage
+from avatars.services.retrieval_index import AvatarIndex
+from whisone.llm_client import get_client
+from whisone.utils.embedding_utils import generate_embedding
 from whatsapp.tasks import send_whatsapp_text
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
-
-# ------------------------------
-# Helper: Cosine similarity
-# ------------------------------
-def cosine_similarity(a, b):
-    a = np.array(a, dtype=np.float32)
-    b = np.array(b, dtype=np.float32)
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+client = get_client("avatars")
 
 
 # ------------------------------
 # Helper: Retrieve top-K memorized text
 # ------------------------------
 def retrieve_relevant_chunks(avatar, query_embedding, top_k=6):
-    chunks = list(avatar.chunks.all()[:500])  # safe limit
-
-    if not chunks:
+    if query_embedding is None:
         return ""
 
-    scored = []
-
-    for c in chunks:
-        emb_list = c.embedding  # <-- could be list OR list of lists
-
-        if not emb_list:
-            continue
-
-        # If it's a single embedding, wrap it
-        if isinstance(emb_list[0], float):
-            emb_list = [emb_list]
-
-        # compute similarity against each embedding
-        max_score = max(
-            cosine_similarity(query_embedding, emb)
-            for emb in emb_list
-        )
-
-        scored.append((max_score, c.text))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
+    # One matrix-vector product over the avatar's cached retrieval matrix
+    hits = AvatarIndex.for_avatar(avatar).search(query_embedding, top_k)
+    if not hits:
+        return ""
 
-    return "\n\n".join(text for _, text in scored[:top_k])
+    texts = dict(AvatarMemoryChunk.objects.filter(pk__in=[pk for pk, _ in hits]).values_list("pk", "text"))
+    return "\n\n".join(texts[pk] for pk, _ in hits if pk in texts)
 
 
 
@@ -70,11 +43,7 @@ def generate_avatar_reply(conversation_id: str, user_message_id: str, whatsapp_m
     user_msg = AvatarMessage.objects.get(id=user_message_id)
 
     # 2. Embed query
-    emb = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=user_msg.content
-    )
-    query_embedding = emb.data[0].embedding
+    query_embedding = generate_embedding(user_msg.content, space="avatars")
 
     # 3. Retrieve memory context
     memory_context = retrieve_relevant_chunks(avatar, query_embedding)
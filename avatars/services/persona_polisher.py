@@ -1,7 +1,6 @@
-import openai
-from django.conf import settings
+from whisone.llm_client import get_client
 
-client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+client = get_client("avatars")
 
 def polish_persona(raw_prompt: str) -> str:
     system_prompt = """
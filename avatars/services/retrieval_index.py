@@ -0,0 +1,179 @@
+import io
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.core.cache import cache
+
+from avatars.models import AvatarMemoryChunk
+from whisone.embedding_spaces import get_space
+from whisone.similarity import normalize, top_k
+
+logger = logging.getLogger(__name__)
+
+
+class AvatarIndex:
+    """
+    Per-avatar retrieval matrix over AvatarMemoryChunk embeddings.
+
+    Every embedding row of every chunk (a chunk may carry several, e.g. an
+    upload's per-chunk vectors) is kept L2-normalized in one contiguous
+    float32 matrix, with `owners` mapping each row to its position in
+    `chunk_ids`. A query is one matrix-vector product; a chunk scores as its
+    best-matching row.
+
+    The serialized matrix lives in the Django cache (Redis) under a version
+    token, and each worker keeps the most recently used LOCAL_CAPACITY
+    avatars in memory, refreshed when the token changes. train_avatar
+    rebuilds the index when it finishes; chunk edits and deletes invalidate
+    it (avatars.signals), and the next query rebuilds it from the table.
+    """
+
+    CACHE_KEY = "avatar_index:{avatar_id}"
+    VERSION_KEY = "avatar_index:{avatar_id}:version"
+    CACHE_TTL = 60 * 60 * 24 * 7  # 1 week; rebuilt from the DB on miss
+    LOCAL_CAPACITY = 32  # avatars held per worker
+
+    _local: "OrderedDict[str, AvatarIndex]" = OrderedDict()
+    _local_lock = threading.Lock()
+
+    def __init__(self, avatar_id, dim: int = 0):
+        self.avatar_id = str(avatar_id)
+        self.dim = dim
+        self.version = ""
+        self.chunk_ids: List[int] = []
+        self.owners = np.empty(0, dtype=np.int32)
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    # -------------------------
+    # Loading / persistence
+    # -------------------------
+    @classmethod
+    def for_avatar(cls, avatar) -> "AvatarIndex":
+        """
+        Returns the avatar's index: the worker-local copy if it is current,
+        else the cached copy, else a fresh build from AvatarMemoryChunk.
+        """
+        avatar_id = str(getattr(avatar, "id", avatar))
+        version = cache.get(cls.VERSION_KEY.format(avatar_id=avatar_id))
+
+        with cls._local_lock:
+            local = cls._local.get(avatar_id)
+            if local is not None and version and local.version == version:
+                cls._local.move_to_end(avatar_id)
+                return local
+
+        index = None
+        if version:
+            blob = cache.get(cls.CACHE_KEY.format(avatar_id=avatar_id))
+            if blob:
+                try:
+                    index = cls._deserialize(avatar_id, blob)
+                    index.version = version
+                except Exception as e:
+                    logger.warning("AvatarIndex: corrupt cache entry for avatar=%s: %s", avatar_id, e)
+                    index = None
+
+        if index is None:
+            index = cls.build(avatar_id)
+            index.save()
+        else:
+            index._remember()
+        return index
+
+    @classmethod
+    def build(cls, avatar_id) -> "AvatarIndex":
+        space = get_space("avatars")
+        rows = (
+            space.active(AvatarMemoryChunk.objects.filter(avatar_id=avatar_id))
+            .exclude(embedding=None)
+            .order_by("pk")
+            .values_list("pk", "embedding", "embedding_space")
+        )
+
+        index = cls(avatar_id)
+        matrices, owners = [], []
+        for pk, emb, tag in rows.iterator(chunk_size=500):
+            matrix = space.coerce(emb, tag)  # (rows, dim)
+            if matrix is None or len(matrix) == 0:
+                continue
+            if index.dim == 0:
+                index.dim = matrix.shape[1]
+            if matrix.shape[1] != index.dim:
+                logger.warning("AvatarIndex: skipping chunk=%s with dim %d != %d", pk, matrix.shape[1], index.dim)
+                continue
+            owners.extend([len(index.chunk_ids)] * len(matrix))
+            index.chunk_ids.append(pk)
+            matrices.append(matrix)
+
+        if matrices:
+            index.vectors = normalize(np.vstack(matrices))
+            index.owners = np.asarray(owners, dtype=np.int32)
+
+        logger.info("AvatarIndex: built index for avatar=%s with %d chunks", avatar_id, len(index))
+        return index
+
+    def save(self):
+        self.version = uuid.uuid4().hex
+        cache.set(self.CACHE_KEY.format(avatar_id=self.avatar_id), self._serialize(), self.CACHE_TTL)
+        cache.set(self.VERSION_KEY.format(avatar_id=self.avatar_id), self.version, self.CACHE_TTL)
+        self._remember()
+
+    @classmethod
+    def rebuild(cls, avatar_id) -> "AvatarIndex":
+        index = cls.build(avatar_id)
+        index.save()
+        return index
+
+    @classmethod
+    def invalidate(cls, avatar_id):
+        avatar_id = str(avatar_id)
+        cache.delete_many([cls.CACHE_KEY.format(avatar_id=avatar_id), cls.VERSION_KEY.format(avatar_id=avatar_id)])
+        with cls._local_lock:
+            cls._local.pop(avatar_id, None)
+
+    def _remember(self):
+        with self._local_lock:
+            self._local[self.avatar_id] = self
+            self._local.move_to_end(self.avatar_id)
+            while len(self._local) > self.LOCAL_CAPACITY:
+                self._local.popitem(last=False)
+
+    def _serialize(self) -> bytes:
+        buf = io.BytesIO()
+        np.savez(
+            buf,
+            chunk_ids=np.asarray(self.chunk_ids, dtype=np.int64),
+            owners=self.owners,
+            vectors=self.vectors,
+            meta=np.array([self.dim], dtype=np.int64),
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def _deserialize(cls, avatar_id, blob: bytes) -> "AvatarIndex":
+        data = np.load(io.BytesIO(blob), allow_pickle=False)
+        index = cls(avatar_id, int(data["meta"][0]))
+        index.chunk_ids = data["chunk_ids"].tolist()
+        index.owners = data["owners"]
+        index.vectors = data["vectors"]
+        return index
+
+    # -------------------------
+    # Search
+    # -------------------------
+    def search(self, query: Sequence[float], k: int = 6, threshold: Optional[float] = None) -> List[Tuple[int, float]]:
+        """Up to k (chunk pk, similarity) pairs, best first."""
+        if not len(self) or query is None or len(query) != self.dim:
+            return []
+        row_scores = self.vectors @ normalize(query)
+        chunk_scores = np.full(len(self.chunk_ids), -np.inf, dtype=np.float32)
+        np.maximum.at(chunk_scores, self.owners, row_scores)
+        picked, scores = top_k(chunk_scores, k, threshold=threshold)
+        return [(self.chunk_ids[i], float(score)) for i, score in zip(picked, scores)]
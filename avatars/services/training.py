@@ -3,12 +3,21 @@
 from avatars.models import Avatar, AvatarSource, AvatarMemoryChunk, AvatarTrainingJob
 from django.utils import timezone
 from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+import hashlib
+import json
 import logging
 from datetime import datetime
 import traceback
+import numpy as np
+from django.apps import apps
 
 # Your embedding function
-from whisone.utils.embedding_utils import generate_embedding as get_embedding
+from avatars.services.retrieval_index import AvatarIndex
+from whisone.chunking import chunk_text
+from whisone.embedding_spaces import get_space
+from whisone.file_chunks import chunk_hash
+from whisone.utils.embedding_utils import embed_many, generate_embedding as get_embedding
 
 def dprint(msg: str):
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
@@ -17,214 +26,291 @@ def dprint(msg: str):
 logger = logging.getLogger(__name__)
 
 def normalize_embeddings(value):
-    if not value:
+    """Coerces a single vector or a list of vectors into a (rows, dim) float32 matrix."""
+    if value is None or len(value) == 0:
         return None
-    if isinstance(value, list) and value and isinstance(value[0], float):
-        return [value]
-    if isinstance(value, list) and value and isinstance(value[0], list):
-        return value
-    return None
-
-def split_text_into_chunks(text: str, max_tokens: int = 1000, overlap: int = 100):
-    words = text.split()
-    chunks = []
-    current = []
-    current_tokens = 0
-    for word in words:
-        current.append(word)
-        current_tokens += 1
-        if current_tokens >= max_tokens:
-            chunks.append(" ".join(current))
-            current = current[-overlap:] if overlap > 0 else []
-            current_tokens = len(current)
-    if current:
-        chunks.append(" ".join(current))
-    return chunks
+    return np.atleast_2d(np.asarray(value, dtype=np.float32))
 
+def split_text_into_chunks(text: str, max_tokens: int = 800, overlap: int = 80):
+    """Chunks of at most `max_tokens` model tokens, split at headings, paragraphs and sentences."""
+    return chunk_text(text, max_tokens, overlap, space="avatars")
 
-def train_avatar(avatar: Avatar, job: AvatarTrainingJob):
-    dprint(f"STARTING training job {job.id} for avatar @{avatar.handle} (id={avatar.id})")
 
-    job.status = "running"
-    job.started_at = timezone.now()
-    job.save()
+def reuse_embedding(value, source_space: str, space_id: str = ""):
+    """
+    Returns an embedding stored in another space as an avatars-space matrix,
+    or None when it can't be reused (another model: it must be re-embedded).
+    """
+    source = get_space(source_space)
+    value = source.coerce(value, space_id)
+    if value is None or source.model != get_space("avatars").model:
+        return None
+    return normalize_embeddings(get_space("avatars").convert(value, source.space_id))
 
-    chunk_counter = 0
 
+def attach_embeddings(to_embed):
+    """Embeds the (chunk, text) pairs with one embed_many call and sets chunk.embedding."""
+    if not to_embed:
+        return
+    dprint(f"Embedding {len(to_embed)} chunks in batches")
     try:
-        sources = AvatarSource.objects.filter(avatar=avatar, enabled=True)
-        dprint(f"Found {sources.count()} enabled sources")
+        vectors = embed_many([text for _, text in to_embed], space="avatars")
+    except Exception as e:
+        # Fall back to one request per text so a single bad input only costs its own embedding.
+        dprint(f"Batch embedding failed, embedding one by one: {e}")
+        for chunk, text in to_embed:
+            try:
+                get_space("avatars").assign(chunk, normalize_embeddings(get_embedding(text, space="avatars")))
+            except Exception as e:
+                dprint(f"Embedding failed for {chunk.source_type} {chunk.source_id}: {e}")
+        return
+    for (chunk, _), vector in zip(to_embed, vectors):
+        get_space("avatars").assign(chunk, normalize_embeddings(vector))
+
+
+WRITE_BATCH = 200  # chunks embedded and committed together
+
+# source_type -> (item model, fields whose values change when an item does)
+ITEM_SOURCES = {
+    "notes": ("whisone.Note", ["updated_at"]),
+    "reminders": ("whisone.Reminder", ["updated_at"]),
+    "todos": ("whisone.Todo", ["updated_at"]),
+    "uploads": ("whisone.UploadedFile", ["content_hash", "processed", "embedding_space"]),
+    "whatsapp": ("whatsapp.WhatsAppMessage", ["updated_at"]),
+}
+
+
+def source_fingerprint(avatar: Avatar, source: AvatarSource):
+    """
+    (fingerprint, high-water mark) of a source: a sha256 over its settings,
+    the avatars embedding space and the id + version fields of each of its
+    items, plus the newest item updated_at. An unchanged fingerprint means
+    retraining the source would produce the same chunks.
+    """
+    h = hashlib.sha256(json.dumps(
+        [source.source_type, source.metadata, source.include_for_knowledge, source.include_for_tone,
+         get_space("avatars").space_id],
+        sort_keys=True, default=str,
+    ).encode("utf-8"))
+    high_water = None
+
+    if source.source_type in ITEM_SOURCES:
+        label, fields = ITEM_SOURCES[source.source_type]
+        rows = (
+            apps.get_model(label).objects
+            .filter(id__in=source.metadata.get("item_ids", []), user=avatar.owner)
+            .order_by("id")
+            .values_list("id", *fields)
+        )
+        for row in rows.iterator(chunk_size=2000):
+            h.update(repr(row).encode("utf-8"))
+            if fields[0] == "updated_at" and row[1] and (high_water is None or row[1] > high_water):
+                high_water = row[1]
+    return h.hexdigest(), high_water
+
+
+def gather_source(avatar: Avatar, source: AvatarSource):
+    """
+    Builds the (unsaved) chunks of one source as (chunk, text to embed or
+    None) pairs. Items are read in id order, so a resumed job can skip the
+    chunks a previous attempt already wrote.
+    """
+    st = source.source_type
+    items = []
+
+    # ————————————————————————
+    # 1. RAW TEXT
+    # ————————————————————————
+    if st == "text":
+        texts = source.metadata.get("content", "") or source.metadata.get("texts", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        for block in texts:
+            text = str(block).strip()
+            if not text:
+                continue
+            chunks = split_text_into_chunks(text)
+            for chunk in chunks:
+                memory_chunk = AvatarMemoryChunk(
+                    avatar=avatar,
+                    text=chunk,
+                    source_type="text",
+                    source_id=source.id
+                )
+                items.append((memory_chunk, chunk if source.include_for_knowledge else None))
+
+    # ————————————————————————
+    # 2. NOTES
+    # ————————————————————————
+    elif st == "notes" and source.include_for_knowledge:
+        from whisone.models import Note
+        for note in Note.objects.filter(id__in=source.metadata.get("item_ids", []), user=avatar.owner).order_by("id"):
+            text = (note.content or "").strip()
+            if not text: continue
+            memory_chunk = AvatarMemoryChunk(avatar=avatar, text=text, source_type="notes", source_id=note.id)
+            get_space("avatars").assign(memory_chunk, reuse_embedding(note.embedding, "items", note.embedding_space))
+            items.append((memory_chunk, text if memory_chunk.embedding is None else None))
+
+    # ————————————————————————
+    # 3. UPLOADS
+    # ————————————————————————
+    elif st == "uploads" and source.include_for_knowledge:
+        from whisone.models import UploadedFile
+        from whisone.file_chunks import load_vectors
+        for f in UploadedFile.objects.filter(id__in=source.metadata.get("item_ids", []), user=avatar.owner).order_by("id"):
+            text = (f.content or "").strip()
+            if not text: continue
+            memory_chunk = AvatarMemoryChunk(avatar=avatar, text=text, source_type="uploads", source_id=f.id)
+            file_vectors = load_vectors(f, mmap=False)
+            get_space("avatars").assign(memory_chunk, reuse_embedding(file_vectors, "files", f.embedding_space))
+            if memory_chunk.embedding is None and file_vectors is not None:
+                dprint(f"Upload {f.id} is embedded with another model; skipping its vectors")
+            items.append((memory_chunk, None))
+
+    # ————————————————————————
+    # 4. REMINDERS (NEW!)
+    # ————————————————————————
+    elif st == "reminders" and (source.include_for_knowledge or source.include_for_tone):
+        from whisone.models import Reminder  # adjust import as needed
+
+        reminder_ids = source.metadata.get("item_ids", [])
+        for rem in Reminder.objects.filter(id__in=reminder_ids, user=avatar.owner).order_by("id"):
+            if not (rem.text or "").strip():
+                continue
+            parts = [f"Reminder: {rem.text.strip()}"]
+            if rem.remind_at:
+                parts.append(f"Due: {rem.remind_at.strftime('%Y-%m-%d %H:%M')}")
+            parts.append("Status: completed" if rem.completed else "Status: pending")
+            text = " | ".join(parts)
+
+            memory_chunk = AvatarMemoryChunk(
+                avatar=avatar,
+                text=text,
+                source_type="reminders",
+                source_id=rem.id
+            )
+            items.append((memory_chunk, text if source.include_for_knowledge else None))
+
+    # ————————————————————————
+    # 5. TODOS (NEW!)
+    # ————————————————————————
+    elif st == "todos" and (source.include_for_knowledge or source.include_for_tone):
+        from whisone.models import Todo  # adjust import
+
+        todo_ids = source.metadata.get("item_ids", [])
+        for todo in Todo.objects.filter(id__in=todo_ids, user=avatar.owner).order_by("id"):
+            if not (todo.task or "").strip():
+                continue
+            status = "completed" if todo.done else "pending"
+            text = f"Todo: {todo.task.strip()} | Status: {status}"
+
+            memory_chunk = AvatarMemoryChunk(
+                avatar=avatar,
+                text=text,
+                source_type="todos",
+                source_id=todo.id
+            )
+            items.append((memory_chunk, text if source.include_for_knowledge else None))
+
+    # ————————————————————————
+    # 7. WHATSAPP
+    # ————————————————————————
+    elif st == "whatsapp" and source.include_for_knowledge:
+        from whatsapp.models import WhatsAppMessage
+        for msg in WhatsAppMessage.objects.filter(id__in=source.metadata.get("item_ids", []), user=avatar.owner).order_by("id"):
+            text = (msg.content or "").strip()
+            if not text: continue
+            items.append((AvatarMemoryChunk(
+                avatar=avatar, text=text, source_type="whatsapp", source_id=msg.id, embedding=None
+            ), None))
+
+    return items
 
-        with transaction.atomic():
-            for source_idx, source in enumerate(sources, start=1):
-                st = source.source_type
-                dprint(f"[{source_idx}/{sources.count()}] Processing source id={source.id} | type={st} | knowledge={source.include_for_knowledge} | tone={source.include_for_tone}")
-
-                # ————————————————————————
-                # 1. RAW TEXT
-                # ————————————————————————
-                if st == "text":
-                    texts = source.metadata.get("content", "") or source.metadata.get("texts", [])
-                    if isinstance(texts, str):
-                        texts = [texts]
-                    for block in texts:
-                        text = str(block).strip()
-                        if not text:
-                            continue
-                        chunks = split_text_into_chunks(text)
-                        for chunk in chunks:
-                            embedding = None
-                            if source.include_for_knowledge:
-                                try:
-                                    embedding = normalize_embeddings(get_embedding(chunk))
-                                except Exception as e:
-                                    dprint(f"Embedding failed for text chunk: {e}")
-                            AvatarMemoryChunk.objects.create(
-                                avatar=avatar,
-                                text=chunk,
-                                source_type="text",
-                                source_id=source.id,
-                                embedding=embedding,
-                                metadata={"used_for_knowledge": source.include_for_knowledge, "used_for_tone": source.include_for_tone}
-                            )
-                            chunk_counter += 1
-
-                # ————————————————————————
-                # 2. NOTES
-                # ————————————————————————
-                elif st == "notes" and source.include_for_knowledge:
-                    from whisone.models import Note
-                    for note in Note.objects.filter(id__in=source.metadata.get("item_ids", []), user=avatar.owner):
-                        text = (note.content or "").strip()
-                        if not text: continue
-                        embedding = normalize_embeddings(note.embedding) if source.include_for_knowledge else None
-                        AvatarMemoryChunk.objects.create(
-                            avatar=avatar, text=text, source_type="notes", source_id=note.id, embedding=embedding
-                        )
-                        chunk_counter += 1
-
-                # ————————————————————————
-                # 3. UPLOADS
-                # ————————————————————————
-                elif st == "uploads" and source.include_for_knowledge:
-                    from whisone.models import UploadedFile
-                    for f in UploadedFile.objects.filter(id__in=source.metadata.get("item_ids", []), user=avatar.owner):
-                        text = (f.content or "").strip()
-                        if not text: continue
-                        embedding = normalize_embeddings(f.embedding) if source.include_for_knowledge else None
-                        AvatarMemoryChunk.objects.create(
-                            avatar=avatar, text=text, source_type="uploads", source_id=f.id, embedding=embedding
-                        )
-                        chunk_counter += 1
-
-                # ————————————————————————
-                # 4. REMINDERS (NEW!)
-                # ————————————————————————
-                elif st == "reminders" and (source.include_for_knowledge or source.include_for_tone):
-                    from whisone.models import Reminder  # adjust import as needed
-
-                    reminder_ids = source.metadata.get("item_ids", [])
-                    for rem in Reminder.objects.filter(id__in=reminder_ids, user=avatar.owner):
-                        parts = []
-                        if rem.title:
-                            parts.append(f"Reminder: {rem.title}")
-                        if rem.text:
-                            parts.append(rem.text)
-                        if rem.remind_at:
-                            due = rem.remind_at.strftime("%Y-%m-%d %H:%M") if rem.remind_at else "no due date"
-                            parts.append(f"Due: {due}")
-                        if rem.completed:
-                            parts.append("Status: completed")
-                        else:
-                            parts.append("Status: pending")
-
-                        text = " | ".join(parts).strip()
-                        if not text:
-                            continue
-
-                        embedding = None
-                        if source.include_for_knowledge:
-                            try:
-                                embedding = normalize_embeddings(get_embedding(text))
-                            except Exception as e:
-                                dprint(f"Failed to embed reminder {rem.id}: {e}")
-
-                        AvatarMemoryChunk.objects.create(
-                            avatar=avatar,
-                            text=text,
-                            source_type="reminders",
-                            source_id=rem.id,
-                            embedding=embedding,
-                            metadata={"completed": rem.completed, "due_date": rem.due_date.isoformat() if rem.due_date else None}
-                        )
-                        chunk_counter += 1
-                        dprint(f"    Added reminder chunk: {text[:100]}...")
-
-                # ————————————————————————
-                # 5. TODOS (NEW!)
-                # ————————————————————————
-                elif st == "todos" and (source.include_for_knowledge or source.include_for_tone):
-                    from whisone.models import Todo  # adjust import
-
-                    todo_ids = source.metadata.get("item_ids", [])
-                    for todo in Todo.objects.filter(id__in=todo_ids, user=avatar.owner):
-                        parts = []
-                        if todo.title:
-                            parts.append(f"Todo: {todo.title}")
-                        if todo.task:
-                            parts.append(todo.task)
-                        # if todo.due_date:
-                        #     due = todo.due_date.strftime("%Y-%m-%d")
-                        #     parts.append(f"Due: {due}")
-                        status = "completed" if todo.done else "pending"
-                        parts.append(f"Status: {status}")
-
-                        text = " | ".join(parts).strip()
-                        if not text:
-                            continue
-
-                        embedding = None
-                        if source.include_for_knowledge:
-                            try:
-                                embedding = normalize_embeddings(get_embedding(text))
-                            except Exception as e:
-                                dprint(f"Failed to embed todo {todo.id}: {e}")
-
-                        AvatarMemoryChunk.objects.create(
-                            avatar=avatar,
-                            text=text,
-                            source_type="todos",
-                            source_id=todo.id,
-                            embedding=embedding,
-                            metadata={"completed": todo.completed, "due_date": todo.due_date.isoformat() if todo.due_date else None}
-                        )
-                        chunk_counter += 1
-                        dprint(f"    Added todo chunk: {text[:100]}...")
-
-
-                # ————————————————————————
-                # 7. WHATSAPP
-                # ————————————————————————
-                elif st == "whatsapp" and source.include_for_knowledge:
-                    from whatsapp.models import WhatsAppMessage
-                    for msg in WhatsAppMessage.objects.filter(id__in=source.metadata.get("item_ids", []), user=avatar.owner):
-                        text = (msg.content or "").strip()
-                        if not text: continue
-                        AvatarMemoryChunk.objects.create(
-                            avatar=avatar, text=text, source_type="whatsapp", source_id=msg.id, embedding=None
-                        )
-                        chunk_counter += 1
+
+def train_avatar(avatar: Avatar, job: AvatarTrainingJob):
+    """
+    Incremental, resumable training.
+
+    Each enabled source is fingerprinted (source_fingerprint); a source
+    whose fingerprint matches the one stored when it was last trained is
+    skipped. A changed source is re-gathered and reconciled against its
+    existing chunks by (item, text hash): unchanged chunks are kept as they
+    are, edited items have their chunk updated and re-embedded, new ones are
+    created and chunks of removed items are deleted. Chunks of disabled or
+    deleted sources (and legacy chunks with no source) are removed.
+
+    Writes go WRITE_BATCH at a time, each batch committed in its own
+    transaction with the job's checkpoint; a failed job keeps what it wrote,
+    and running it again (the task retries) skips finished sources and,
+    through the reconcile, the chunks already written for the interrupted
+    one. Log lines are buffered on the job and written with the checkpoints.
+    Raises after marking the job as failed.
+    """
+    if job.status == "completed":
+        return
+
+    checkpoint = dict(job.checkpoint or {})
+    resuming = bool(checkpoint) or job.chunks_written > 0
+    dprint(f"{'RESUMING' if resuming else 'STARTING'} training job {job.id} for avatar @{avatar.handle} (id={avatar.id})")
+
+    job.status = "running"
+    job.started_at = job.started_at or timezone.now()
+    job.finished_at = None
+    if resuming:
+        job.add_log(f"Resuming after {job.chunks_written} chunks", save=False)
+    job.save(update_fields=["status", "started_at", "finished_at", "logs"])
+
+    try:
+        sources = list(AvatarSource.objects.filter(avatar=avatar, enabled=True).order_by("id"))
+        done = set(checkpoint.get("sources_done", []))
+        dprint(f"Found {len(sources)} enabled sources ({len(done)} already trained)")
+
+        # ——— Drop chunks no enabled source accounts for ———
+        removed, _ = (
+            AvatarMemoryChunk.objects.filter(avatar=avatar)
+            .exclude(origin__in=[s.pk for s in sources])
+            .delete()
+        )
+        AvatarSource.objects.filter(avatar=avatar, enabled=False).update(fingerprint="", trained_at=None)
+        if removed:
+            job.add_log(f"Removed {removed} chunks of disabled or deleted sources", save=False)
+        changed = removed
+
+        for source_idx, source in enumerate(sources, start=1):
+            source_key = str(source.id)
+            if source_key in done:
+                continue
+
+            fingerprint, high_water = source_fingerprint(avatar, source)
+            if fingerprint == source.fingerprint:
+                dprint(f"[{source_idx}/{len(sources)}] Source id={source.id} unchanged since {source.trained_at}, skipping")
+            else:
+                dprint(f"[{source_idx}/{len(sources)}] Processing source id={source.id} | type={source.source_type} | knowledge={source.include_for_knowledge} | tone={source.include_for_tone}")
+                changed += _train_source(avatar, source, job, checkpoint, source_idx, len(sources))
+                source.fingerprint, source.high_water_mark, source.trained_at = fingerprint, high_water, timezone.now()
+                source.save(update_fields=["fingerprint", "high_water_mark", "trained_at"])
+
+            done.add(source_key)
+            checkpoint = {"sources_done": sorted(done)}
+            job.progress = int(99 * source_idx / len(sources))
+            _save_checkpoint(job, checkpoint)
+
+        # ——— Rebuild the retrieval matrix chat queries read ———
+        if changed or resuming:
+            AvatarIndex.rebuild(avatar.id)
 
         # ——— Finalize ———
+        chunk_counter = AvatarMemoryChunk.objects.filter(avatar=avatar).count()
         avatar.summary_knowledge = f"{chunk_counter} memory chunks (notes, files, text, reminders, todos, etc.)"
         avatar.trained = True
         avatar.trained_at = timezone.now()
         avatar.save()
 
         job.status = "completed"
+        job.progress = 100
         job.finished_at = timezone.now()
-        job.add_log(f"Training completed: {chunk_counter} chunks processed.")
-        job.save()
+        job.add_log(f"Training completed: {chunk_counter} chunks ({job.chunks_written} written).", save=False)
+        job.save(update_fields=["status", "progress", "finished_at", "logs"])
 
         dprint(f"SUCCESS → Training job {job.id} finished with {chunk_counter} chunks")
         logger.info(f"Avatar @{avatar.handle} trained successfully → {chunk_counter} chunks")
@@ -236,8 +322,78 @@ def train_avatar(avatar: Avatar, job: AvatarTrainingJob):
 
         job.status = "error"
         job.finished_at = timezone.now()
-        job.add_log(f"Training failed: {str(e)}")
-        job.save()
+        job.add_log(f"Training failed after {job.chunks_written} chunks: {str(e)}", save=False)
+        job.save(update_fields=["status", "finished_at", "logs"])
 
         avatar.trained = False
-        avatar.save(update_fields=["trained"])
\ No newline at end of file
+        avatar.save(update_fields=["trained"])
+        raise
+
+
+def _train_source(avatar, source, job, checkpoint, source_idx, source_count) -> int:
+    """Reconciles one source's chunks with its current items; returns the rows changed."""
+    # ——— Stage 1: gather and diff against the stored chunks ———
+    items = gather_source(avatar, source)
+    for chunk, _ in items:
+        chunk.origin = source
+        chunk.content_hash = chunk_hash(chunk.text)
+
+    # Keyed on whether the row is embedded too, so toggling include_for_knowledge
+    # re-embeds (or clears) chunks whose text didn't change.
+    existing = {}
+    rows = (
+        AvatarMemoryChunk.objects.filter(origin=source)
+        .annotate(embedded=ExpressionWrapper(Q(embedding__isnull=False), output_field=BooleanField()))
+        .values_list("pk", "source_id", "content_hash", "embedded")
+    )
+    for pk, item_id, digest, embedded in rows:
+        existing.setdefault((item_id, digest, bool(embedded)), []).append(pk)
+
+    fresh = []
+    for chunk, text in items:
+        embedded = text is not None or chunk.embedding is not None
+        kept = existing.get((str(chunk.source_id), chunk.content_hash, embedded))
+        if kept:
+            kept.pop()  # unchanged: keep the row and its embedding
+        else:
+            fresh.append((chunk, text))
+
+    stale = {}  # item id -> pks of its chunks whose text changed or went away
+    for (item_id, _, _), pks in existing.items():
+        stale.setdefault(item_id, []).extend(pks)
+
+    # An edited item updates its old row in place instead of delete + insert
+    for chunk, _ in fresh:
+        pks = stale.get(str(chunk.source_id))
+        if pks:
+            chunk.pk = pks.pop()
+    deleted = [pk for pks in stale.values() for pk in pks]
+    if deleted:
+        AvatarMemoryChunk.objects.filter(pk__in=deleted).delete()
+
+    job.add_log(
+        f"Source {source.source_type} ({source.id}): {len(items) - len(fresh)} unchanged, "
+        f"{sum(1 for c, _ in fresh if c.pk)} updated, {sum(1 for c, _ in fresh if not c.pk)} added, "
+        f"{len(deleted)} removed",
+        save=False,
+    )
+
+    # ——— Stage 2 + 3: embed a batch, write it, checkpoint ———
+    for start in range(0, len(fresh), WRITE_BATCH):
+        batch = fresh[start:start + WRITE_BATCH]
+        attach_embeddings([(chunk, text) for chunk, text in batch if text is not None])
+        with transaction.atomic():
+            AvatarMemoryChunk.objects.bulk_create([chunk for chunk, _ in batch if not chunk.pk])
+            AvatarMemoryChunk.objects.bulk_update(
+                [chunk for chunk, _ in batch if chunk.pk],
+                ["text", "content_hash", "source_type", "embedding", "embedding_space"],
+            )
+            job.chunks_written += len(batch)
+            job.progress = int(99 * (source_idx - 1 + (start + len(batch)) / len(fresh)) / source_count)
+            _save_checkpoint(job, checkpoint)
+    return len(fresh) + len(deleted)
+
+
+def _save_checkpoint(job: AvatarTrainingJob, checkpoint: dict):
+    job.checkpoint = checkpoint
+    job.save(update_fields=["checkpoint", "chunks_written", "progress", "logs"])
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import AvatarMemoryChunk
+from .services.retrieval_index import AvatarIndex
+
+
+# -------------------------
+# Retrieval index invalidation
+# -------------------------
+@receiver(post_save, sender=AvatarMemoryChunk)
+@receiver(post_delete, sender=AvatarMemoryChunk)
+def invalidate_avatar_index(sender, instance, **kwargs):
+    # rebuilt from the table on the avatar's next query
+    AvatarIndex.invalidate(instance.avatar_id)
@@ -6,28 +6,24 @@ from avatars.models import AvatarTrainingJob, Avatar
 from avatars.services.training import train_avatar
 
 
-@shared_task
-def train_avatar_task(job_id: str):
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def train_avatar_task(self, job_id: str):
     """
     Celery task wrapper that loads the job + avatar
     and runs the training pipeline.
+
+    Training checkpoints on the job, so a retry resumes where the failed
+    attempt stopped instead of starting over.
     """
     job = get_object_or_404(AvatarTrainingJob, id=job_id)
     avatar = job.avatar
 
-    # Update job status to running
-    job.status = "running"
-    job.save(update_fields=["status"])
-
     try:
-        # Run actual training logic
+        # Run actual training logic (status, checkpoints and logs are handled *inside train_avatar*)
         train_avatar(avatar, job)
-
-        # Job completion is handled *inside train_avatar*
         return {"job_id": job_id, "status": "completed"}
 
     except Exception as e:
-        job.status = "error"
-        job.add_log(f"Training failed: {str(e)}")
-        job.save(update_fields=["status"])
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
         return {"job_id": job_id, "status": "error", "error": str(e)}
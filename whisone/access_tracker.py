@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+
+try:
+    from redis.exceptions import ResponseError as RedisResponseError
+except ImportError:  # no redis client installed: touches are only buffered locally
+    RedisResponseError = None
+
+logger = logging.getLogger(__name__)
+
+
+class AccessTracker:
+    """
+    Write-behind buffer for "last accessed" timestamps.
+
+    Read paths call `touch(model, pks)` instead of saving each row. Touches
+    are buffered in a Redis sorted set per table (member = pk, score = epoch
+    seconds), written with ZADD GT so concurrent touches of the same row keep
+    the latest time. `flush()` (run by the flush_access_buffer beat task)
+    drains each set and applies it in one statement per table:
+
+        UPDATE t SET col = GREATEST(t.col, v.at)
+        FROM (VALUES (pk, at), ...) AS v(pk, at) WHERE t.pk = v.pk
+
+    GREATEST keeps it last-write-wins against the stored value too, so a late
+    flush never moves a timestamp backwards.
+
+    Without a django-redis cache (or if Redis is unreachable) touches are
+    kept in a per-process buffer, flushed inline once FLUSH_INTERVAL passes.
+    """
+
+    # model label -> timestamp column bumped on access (labels whose model
+    # isn't installed are skipped)
+    FIELDS = {
+        "whisone.Memory": "updated_at",
+        "whisone.KnowledgeVaultEntry": "last_accessed",
+    }
+
+    KEY = "access_buffer:{label}"
+    FLUSH_INTERVAL = 60  # seconds; matches the beat schedule
+    FLUSH_BATCH = 1000  # rows per UPDATE statement
+
+    def __init__(self):
+        self._local: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._last_local_flush = time.monotonic()
+
+    # -------------------------
+    # Recording
+    # -------------------------
+    def touch(self, model, pks: Iterable, at: Optional[datetime] = None):
+        """Records that rows `pks` of `model` were accessed at `at` (default: now)."""
+        label = model if isinstance(model, str) else model._meta.label
+        if label not in self.FIELDS:
+            raise ValueError(f"AccessTracker: {label} is not tracked")
+
+        score = (at or datetime.now(dt_timezone.utc)).timestamp()
+        members = {str(pk): score for pk in pks if pk is not None}
+        if not members:
+            return
+
+        client = self._redis()
+        if client is not None:
+            try:
+                client.zadd(self.KEY.format(label=label), members, gt=True)
+                return
+            except Exception as e:
+                logger.warning("AccessTracker: redis write failed, buffering locally: %s", e)
+
+        with self._lock:
+            self._merge(self._local.setdefault(label, {}), members)
+            due = time.monotonic() - self._last_local_flush >= self.FLUSH_INTERVAL
+        if due:
+            self._flush_local()  # failures are logged and the touches kept
+
+    # -------------------------
+    # Flushing
+    # -------------------------
+    def flush(self) -> int:
+        """
+        Applies every buffered touch; returns the number of rows written.
+        A table that fails keeps its touches for the next run without
+        holding up the others; the first failure is raised at the end.
+        """
+        written, errors = self._flush_local()
+        client = self._redis()
+        if client is None:
+            if errors:
+                raise errors[0]
+            return written
+
+        for label in self.FIELDS:
+            try:
+                apps.get_model(label)
+            except LookupError:
+                continue
+            key = self.KEY.format(label=label)
+            draining = f"{key}:flushing:{uuid.uuid4().hex}"
+            try:
+                client.rename(key, draining)  # new touches go to a fresh set meanwhile
+            except RedisResponseError as e:
+                if "no such key" in str(e).lower():
+                    continue  # nothing buffered
+                raise
+
+            touches = {
+                (m.decode() if isinstance(m, bytes) else m): score
+                for m, score in client.zrange(draining, 0, -1, withscores=True)
+            }
+            try:
+                written += self._apply(label, touches)
+            except Exception as e:
+                logger.exception("AccessTracker: flushing %s failed, keeping its touches", label)
+                client.zadd(key, touches, gt=True)  # put them back for the next run
+                errors.append(e)
+            finally:
+                client.delete(draining)
+        if errors:
+            raise errors[0]
+        return written
+
+    def flush_local(self) -> int:
+        written, errors = self._flush_local()
+        if errors:
+            raise errors[0]
+        return written
+
+    def _flush_local(self) -> Tuple[int, List[Exception]]:
+        with self._lock:
+            pending, self._local = self._local, {}
+            self._last_local_flush = time.monotonic()
+
+        written, errors = 0, []
+        for label, touches in pending.items():
+            try:
+                written += self._apply(label, touches)
+            except Exception as e:
+                logger.exception("AccessTracker: flushing local %s touches failed, keeping them", label)
+                with self._lock:  # put them back for the next run
+                    self._merge(self._local.setdefault(label, {}), touches)
+                errors.append(e)
+        return written, errors
+
+    def _apply(self, label: str, touches: Dict[str, float]) -> int:
+        if not touches:
+            return 0
+        try:
+            model = apps.get_model(label)
+        except LookupError:
+            return 0
+
+        field = model._meta.get_field(self.FIELDS[label])
+        pk = model._meta.pk
+        rows = [
+            (pk.to_python(key), datetime.fromtimestamp(score, tz=dt_timezone.utc))
+            for key, score in touches.items()
+        ]
+
+        written = 0
+        with transaction.atomic():
+            for start in range(0, len(rows), self.FLUSH_BATCH):
+                batch = sorted(rows[start:start + self.FLUSH_BATCH], key=lambda r: str(r[0]))  # stable lock order
+                if connection.vendor == "postgresql":
+                    written += self._update_from_values(model, pk, field, batch)
+                else:
+                    written += model.objects.filter(pk__in=[k for k, _ in batch]).update(
+                        **{field.attname: Greatest(F(field.attname), Case(
+                            *[When(pk=k, then=Value(at)) for k, at in batch], output_field=field,
+                        ))}
+                    )
+        return written
+
+    @staticmethod
+    def _update_from_values(model, pk, field, batch) -> int:
+        qn = connection.ops.quote_name
+        table = qn(model._meta.db_table)
+        pk_type = pk.rel_db_type(connection)
+        at_type = field.db_type(connection)
+        values = ", ".join([f"(%s::{pk_type}, %s::{at_type})"] * len(batch))
+        sql = (
+            f"UPDATE {table} AS t SET {qn(field.column)} = GREATEST(t.{qn(field.column)}, v.at) "
+            f"FROM (VALUES {values}) AS v(pk, at) WHERE t.{qn(pk.column)} = v.pk"
+        )
+        params = [
+            p for key, at in batch
+            for p in (pk.get_db_prep_value(key, connection), field.get_db_prep_value(at, connection))
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    # -------------------------
+    # Helpers
+    # -------------------------
+    @staticmethod
+    def _merge(buffer: Dict[str, float], members: Dict[str, float]):
+        for key, score in members.items():
+            if score > buffer.get(key, 0.0):
+                buffer[key] = score
+
+    @staticmethod
+    def _redis():
+        try:
+            from django_redis import get_redis_connection
+
+            return get_redis_connection("default")
+        except Exception:
+            return None
+
+
+access_tracker = AccessTracker()
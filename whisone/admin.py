@@ -98,7 +98,7 @@ class MemoryAdmin(admin.ModelAdmin):
             "fields": ("user", "memory_type", "raw_text", "summary", "emotion", "sentiment", "importance")
         }),
         ("Context & Embedding", {
-            "fields": ("context", "embedding"),
+            "fields": ("context", "embedding", "embedding_space"),
             "classes": ("collapse",),
         }),
         ("Timestamps", {
@@ -110,10 +110,20 @@ class MemoryAdmin(admin.ModelAdmin):
 
 
 from django.contrib import admin
-from .models import UploadedFile
+from .models import UploadedFile, FileChunk
+
+
+class FileChunkInline(admin.TabularInline):
+    model = FileChunk
+    fields = ("index", "page_num", "start_char", "end_char")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
 
 @admin.register(UploadedFile)
 class UploadedFileAdmin(admin.ModelAdmin):
+    inlines = [FileChunkInline]
     list_display = (
         "id",
         "user",
@@ -134,3 +144,24 @@ class UploadedFileAdmin(admin.ModelAdmin):
             return obj.content[:75] + "..." if len(obj.content) > 75 else obj.content
         return "-"
     short_content.short_description = "Content Preview"
+
+
+
+from django.contrib import admin
+from .models import EmbeddingMigration
+
+@admin.register(EmbeddingMigration)
+class EmbeddingMigrationAdmin(admin.ModelAdmin):
+    list_display = ("table", "space", "space_id", "status", "processed", "updated", "reembedded", "updated_at")
+    list_filter = ("status", "space")
+    readonly_fields = ("started_at", "finished_at", "updated_at")
+
+
+from .models import PlannerLog
+
+@admin.register(PlannerLog)
+class PlannerLogAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "source", "message", "created_at")
+    list_filter = ("source", "created_at")
+    search_fields = ("message", "user__email")
+    readonly_fields = ("created_at",)
@@ -0,0 +1,57 @@
+"""
+Claim-check storage for large task payloads.
+
+Celery tasks that would otherwise pass page text or embedding matrices
+through the broker and result backend write them here instead and pass the
+returned reference (a storage path) along. Blobs live in the default file
+storage (media) under PREFIX, so every worker that shares the media volume
+can read them; the consumer deletes them once merged.
+"""
+import io
+import json
+import tempfile
+import uuid
+from typing import Any, Iterable
+
+import numpy as np
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+PREFIX = "processing"
+
+
+def _name(namespace: str, ext: str) -> str:
+    return f"{PREFIX}/{namespace}/{uuid.uuid4().hex}.{ext}"
+
+
+def put_json(namespace: str, value: Any) -> str:
+    data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+    return default_storage.save(_name(namespace, "json"), ContentFile(data))
+
+
+def get_json(ref: str) -> Any:
+    with default_storage.open(ref, "rb") as f:
+        return json.load(f)
+
+
+def put_array(namespace: str, array) -> str:
+    with tempfile.TemporaryFile() as tmp:
+        np.save(tmp, np.asarray(array, dtype=np.float32), allow_pickle=False)
+        tmp.seek(0)
+        return default_storage.save(_name(namespace, "npy"), File(tmp))
+
+
+def get_array(ref: str, mmap: bool = True) -> np.ndarray:
+    """Loads a stored array, memory-mapped when the storage is local."""
+    try:
+        return np.load(default_storage.path(ref), mmap_mode="r" if mmap else None, allow_pickle=False)
+    except NotImplementedError:  # remote storage: no local path to map
+        with default_storage.open(ref, "rb") as f:
+            return np.load(io.BytesIO(f.read()), allow_pickle=False)
+
+
+def delete(refs: Iterable[str]):
+    for ref in refs:
+        if ref:
+            default_storage.delete(ref)
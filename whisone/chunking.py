@@ -0,0 +1,232 @@
+"""
+Token-aware text chunking shared by file uploads and avatar training.
+
+Text is split into units at headings, paragraphs and sentences, and units
+are packed greedily into chunks of at most `max_tokens` model tokens. A
+heading always starts a new chunk (once the current one holds at least
+MIN_FILL of the budget), so sections are not glued to the tail of the
+previous one; consecutive chunks share up to `overlap` tokens of whole
+trailing sentences. A sentence longer than the budget is cut into word
+windows.
+
+Tokens are counted with tiktoken for the embedding space's model when it is
+installed, otherwise approximated at CHARS_PER_TOKEN.
+
+Chunks are returned as (start, end) character offsets into the text, so
+stored chunks can point back into the document. Header/footer lines found
+by `boilerplate_lines` can be passed as `skip`: they never become part of a
+unit and, since they sit at page edges, fall outside every chunk.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional: token counts fall back to an estimate
+    tiktoken = None
+
+CHUNK_TOKENS = 600
+CHUNK_OVERLAP = 60  # tokens of trailing sentences repeated in the next chunk
+MIN_FILL = 0.25  # a heading only closes a chunk holding at least this share of the budget
+CHARS_PER_TOKEN = 4
+BOILERPLATE_CHARS = 100  # longer lines are never treated as headers/footers
+
+LINE_RE = re.compile(r"[^\n]*\n?")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+WORD_RE = re.compile(r"\S+")
+DIGITS_RE = re.compile(r"\d+")
+MARKDOWN_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s+\S")
+NUMBERED_HEADING_RE = re.compile(r"^\s*(?:\d+(?:\.\d+)*\.?|[IVXLC]+\.|[A-Z]\.)\s+[A-Z]")
+
+
+# -------------------------
+# Token counting
+# -------------------------
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _model(space: str) -> str:
+    from .embedding_spaces import get_space
+
+    return get_space(space).model
+
+
+def count_tokens(text: str, space: str = "files") -> int:
+    """Model tokens in `text` for the space's embedding model."""
+    if not text:
+        return 0
+    encoding = _encoding(_model(space))
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode_ordinary(text))
+
+
+# -------------------------
+# Segmentation
+# -------------------------
+def _normalize_line(line: str) -> str:
+    """Whitespace-collapsed, with numbers masked so "Page 3 of 9" matches "Page 4 of 9"."""
+    return DIGITS_RE.sub("#", " ".join(line.split())).lower()
+
+
+def _is_heading(line: str, previous: str, after_heading: bool) -> bool:
+    stripped = line.strip()
+    if MARKDOWN_HEADING_RE.match(line):
+        return True
+    if not stripped or len(stripped) > 80 or stripped[-1] in ".,;:!?)\"'":
+        return False
+    # A short unpunctuated line only counts when it doesn't continue a sentence.
+    starts_block = after_heading or not previous.strip() or previous.rstrip()[-1] in ".!?:"
+    return starts_block and (
+        stripped.isupper() or bool(NUMBERED_HEADING_RE.match(stripped)) or stripped.istitle()
+    )
+
+
+def _units(text: str, skip: Set[str]) -> List[Tuple[int, int, bool]]:
+    """(start, end, is_heading) spans of the headings and sentences of `text`."""
+    units = []
+    paragraph_start = None
+    previous, after_heading = "", False
+
+    def close_paragraph(end):
+        nonlocal paragraph_start
+        if paragraph_start is None:
+            return
+        body = text[paragraph_start:end]
+        cursor = 0
+        for match in SENTENCE_END_RE.finditer(body):
+            units.append((paragraph_start + cursor, paragraph_start + match.start(), False))
+            cursor = match.end()
+        units.append((paragraph_start + cursor, paragraph_start + len(body.rstrip()), False))
+        paragraph_start = None
+
+    position = 0
+    for match in LINE_RE.finditer(text):
+        line = match.group()
+        if not line:
+            break
+        start, position = match.start(), match.end()
+        stripped = line.strip()
+        if not stripped:  # blank line: paragraph break
+            close_paragraph(start)
+        elif skip and _normalize_line(line) in skip:
+            close_paragraph(start)
+        elif _is_heading(line, previous, after_heading):
+            close_paragraph(start)
+            offset = len(line) - len(line.lstrip())
+            units.append((start + offset, start + offset + len(stripped), True))
+            after_heading = True
+        else:
+            if paragraph_start is None:
+                paragraph_start = start + len(line) - len(line.lstrip())
+            after_heading = False
+        previous = line if stripped else ""
+    close_paragraph(position)
+    return [(s, e, h) for s, e, h in units if e > s]
+
+
+def _word_windows(text: str, start: int, end: int, max_tokens: int, space: str) -> List[Tuple[int, int]]:
+    """Cuts an over-long span into consecutive word windows within the budget."""
+    words = [(start + m.start(), start + m.end()) for m in WORD_RE.finditer(text[start:end])]
+    windows, first, tokens = [], 0, 0
+    for i, (w_start, w_end) in enumerate(words):
+        size = count_tokens(text[w_start:w_end] + " ", space)
+        if i > first and tokens + size > max_tokens:
+            windows.append((words[first][0], words[i - 1][1]))
+            first, tokens = i, 0
+        tokens += size
+    if first < len(words):
+        windows.append((words[first][0], words[-1][1]))
+    return windows
+
+
+# -------------------------
+# Public API
+# -------------------------
+def chunk_spans(
+    text: str,
+    max_tokens: int = CHUNK_TOKENS,
+    overlap: int = CHUNK_OVERLAP,
+    skip: Optional[Iterable[str]] = None,
+    space: str = "files",
+) -> List[Tuple[int, int]]:
+    """
+    (start, end) character offsets of `text` chunked to `max_tokens` model
+    tokens, breaking at headings, paragraphs and sentences. `skip` holds
+    normalized boilerplate lines (see boilerplate_lines) to leave out.
+    """
+    if not text or not text.strip():
+        return []
+
+    units = []  # (start, end, is_heading, tokens)
+    for start, end, heading in _units(text, set(skip or ())):
+        tokens = count_tokens(text[start:end], space)
+        if tokens <= max_tokens:
+            units.append((start, end, heading, tokens))
+        else:
+            for w_start, w_end in _word_windows(text, start, end, max_tokens, space):
+                units.append((w_start, w_end, False, count_tokens(text[w_start:w_end], space)))
+
+    spans = []
+    current: List[Tuple[int, int, bool, int]] = []
+    size = 0
+    carried = 0  # leading units of `current` repeated from the previous chunk
+
+    def emit():
+        nonlocal current, size, carried
+        spans.append((current[0][0], current[-1][1]))
+        tail, tail_size = [], 0
+        for unit in reversed(current[1:]):
+            if unit[2] or tail_size + unit[3] > overlap:
+                break
+            tail.insert(0, unit)
+            tail_size += unit[3]
+        current, size, carried = tail, tail_size, len(tail)
+
+    for unit in units:
+        heading, tokens = unit[2], unit[3]
+        fresh = len(current) - carried  # units not already emitted
+        if fresh and heading and size >= max_tokens * MIN_FILL:
+            emit()
+            current, size, carried = [], 0, 0  # no overlap across a section break
+        elif fresh and size + tokens > max_tokens:
+            emit()
+        while current and size + tokens > max_tokens:  # overlap + unit must still fit
+            size -= current.pop(0)[3]
+            carried = max(carried - 1, 0)
+        current.append(unit)
+        size += tokens
+    if len(current) > carried:
+        emit()
+    return spans
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP, **kwargs) -> List[str]:
+    """The chunk strings of `text` (see chunk_spans)."""
+    return [text[start:end] for start, end in chunk_spans(text, max_tokens, overlap, **kwargs)]
+
+
+def boilerplate_lines(pages: Sequence[str], edge: int = 3, min_pages: int = 3, ratio: float = 0.5) -> Set[str]:
+    """
+    Normalized lines of up to BOILERPLATE_CHARS repeated at the top or
+    bottom (first/last `edge` non-blank lines) of at least `ratio` of the
+    pages, and of no fewer than `min_pages`: running headers, footers and
+    page numbers.
+    """
+    if len(pages) < min_pages:
+        return set()
+    seen = Counter()
+    for page in pages:
+        lines = [line for line in (page or "").splitlines() if line.strip()]
+        seen.update({_normalize_line(line) for line in lines[:edge] + lines[-edge:] if len(line) <= BOILERPLATE_CHARS})
+    needed = max(min_pages, ratio * len(pages))
+    return {line for line, count in seen.items() if count >= needed}
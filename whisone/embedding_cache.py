@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+from django.core.cache import cache
+
+from .fields import decode_vector, encode_vector
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache for embedding vectors.
+
+    Keys are (model, dimensions, sha256 of the whitespace-normalized text), so
+    the same text embedded by the same model is only paid for once, no matter
+    which code path asks for it.
+
+    Two tiers:
+      - a bounded in-process LRU (hot texts within one worker / request)
+      - the Django cache (Redis), holding packed float32 bytes with a TTL
+
+    Hit/miss counters are kept per tier and periodically added to Redis so
+    hit rates can be read across workers with `stats()`.
+    """
+
+    KEY_PREFIX = "emb"
+    STATS_KEY = "emb:stats:{name}"
+    TTL = 60 * 60 * 24 * 30  # 30 days
+    LRU_SIZE = 4096
+    STATS_FLUSH_EVERY = 100
+
+    def __init__(self, max_items: int = LRU_SIZE, ttl: int = TTL):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending_stats: Counter = Counter()
+
+    # -------------------------
+    # Keys
+    # -------------------------
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return " ".join((text or "").split())
+
+    def key(self, model: str, text: str, dimensions: Optional[int] = None) -> str:
+        digest = hashlib.sha256(self.normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self.KEY_PREFIX}:{model}:{dimensions or 'native'}:{digest}"
+
+    # -------------------------
+    # Lookups
+    # -------------------------
+    def get(self, model: str, text: str, dimensions: Optional[int] = None) -> Optional[np.ndarray]:
+        return self.get_many(model, [text], dimensions).get(self.normalize_text(text))
+
+    def get_many(self, model: str, texts: Iterable[str], dimensions: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Returns {normalized_text: vector} for every text found in either tier.
+        Redis is queried once for all LRU misses.
+        """
+        found: Dict[str, np.ndarray] = {}
+        remote_keys: Dict[str, str] = {}
+
+        with self._lock:
+            for text in texts:
+                norm = self.normalize_text(text)
+                if not norm or norm in found:
+                    continue
+                key = self.key(model, norm, dimensions)
+                vec = self._lru.get(key)
+                if vec is not None:
+                    self._lru.move_to_end(key)
+                    found[norm] = vec
+                    self._pending_stats["lru_hits"] += 1
+                else:
+                    remote_keys[key] = norm
+
+        if remote_keys:
+            try:
+                remote = cache.get_many(list(remote_keys))
+            except Exception as e:
+                logger.warning("EmbeddingCache: redis lookup failed: %s", e)
+                remote = {}
+
+            for key, norm in remote_keys.items():
+                packed = remote.get(key)
+                if packed is None:
+                    self._pending_stats["misses"] += 1
+                    continue
+                vec = decode_vector(packed)
+                found[norm] = vec
+                self._remember(key, vec)
+                self._pending_stats["redis_hits"] += 1
+
+        self._maybe_flush_stats()
+        return found
+
+    def set(self, model: str, text: str, vector, dimensions: Optional[int] = None) -> Optional[np.ndarray]:
+        return self.set_many(model, {text: vector}, dimensions).get(self.normalize_text(text))
+
+    def set_many(self, model: str, vectors: Dict[str, object], dimensions: Optional[int] = None) -> Dict[str, np.ndarray]:
+        stored: Dict[str, np.ndarray] = {}
+        to_redis = {}
+        for text, vector in vectors.items():
+            packed = encode_vector(vector)
+            norm = self.normalize_text(text)
+            if packed is None or not norm:
+                continue
+            key = self.key(model, norm, dimensions)
+            vec = decode_vector(packed)
+            self._remember(key, vec)
+            to_redis[key] = packed
+            stored[norm] = vec
+
+        if to_redis:
+            try:
+                cache.set_many(to_redis, self.ttl)
+            except Exception as e:
+                logger.warning("EmbeddingCache: redis write failed: %s", e)
+        return stored
+
+    def get_or_compute(
+        self,
+        model: str,
+        text: str,
+        compute: Callable[[str], Optional[List[float]]],
+        dimensions: Optional[int] = None,
+    ) -> Optional[np.ndarray]:
+        """
+        Returns the cached vector for `text`, calling `compute(text)` (the
+        actual embedding API call) only on a miss in both tiers.
+        """
+        if not self.normalize_text(text):
+            return None
+
+        vec = self.get(model, text, dimensions)
+        if vec is not None:
+            return vec
+
+        computed = compute(text)
+        if computed is None:
+            return None
+        return self.set(model, text, computed, dimensions)
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _remember(self, key: str, vec: np.ndarray):
+        with self._lock:
+            self._lru[key] = vec
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_items:
+                self._lru.popitem(last=False)
+
+    def _maybe_flush_stats(self, force: bool = False):
+        with self._lock:
+            if not force and sum(self._pending_stats.values()) < self.STATS_FLUSH_EVERY:
+                return
+            pending, self._pending_stats = self._pending_stats, Counter()
+
+        for name, count in pending.items():
+            key = self.STATS_KEY.format(name=name)
+            try:
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, count)
+            except Exception as e:
+                logger.debug("EmbeddingCache: could not record %s: %s", name, e)
+
+    def stats(self) -> Dict[str, float]:
+        """Cluster-wide counters plus the derived hit rate."""
+        self._maybe_flush_stats(force=True)
+        names = ("lru_hits", "redis_hits", "misses")
+        values = cache.get_many([self.STATS_KEY.format(name=n) for n in names])
+        counts = {n: int(values.get(self.STATS_KEY.format(name=n)) or 0) for n in names}
+        total = sum(counts.values())
+        counts["hit_rate"] = (counts["lru_hits"] + counts["redis_hits"]) / total if total else 0.0
+        counts["lru_size"] = len(self._lru)
+        return counts
+
+
+# Process-wide instance shared by every embedding entry point.
+embedding_cache = EmbeddingCache()
@@ -1,33 +1,31 @@
 import openai
-import numpy as np
 import logging
 from django.conf import settings
 
+from . import similarity
+from .utils.embedding_utils import generate_embedding
+
 logger = logging.getLogger(__name__)
 
 class EmbeddingService:
     """
     Handles creating embeddings using OpenAI models.
-    Uses caching + batching where possible.
+    Embeddings are served from the shared content-addressed cache.
     """
-    MODEL = "text-embedding-3-large"  # best universal option
+    SPACE = "knowledge"  # compared against KnowledgeVaultEntry embeddings
 
     def __init__(self, api_key=None):
         openai.api_key = api_key or settings.OPENAI_API_KEY
 
     def embed(self, text: str):
         """
-        Returns a list of floats (embedding vector).
+        Returns the embedding vector as a float32 array (cached by content).
         """
         if not text:
             return None
 
         try:
-            resp = openai.embeddings.create(
-                model=self.MODEL,
-                input=text,
-            )
-            return resp.data[0].embedding
+            return generate_embedding(text, space=self.SPACE)
         except Exception as e:
             logger.exception("Embedding error: %s", e)
             return None
@@ -37,8 +35,4 @@ class EmbeddingService:
         """
         Compute cosine similarity between two vectors.
         """
-        if not a or not b:
-            return 0.0
-        a = np.array(a)
-        b = np.array(b)
-        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+        return similarity.cosine(a, b)
@@ -0,0 +1,171 @@
+"""
+Embedding spaces.
+
+Every stored vector belongs to exactly one space: a model plus the dimension
+its vectors are kept at. Vectors are only ever compared within a space, so
+the query side and the stored side always come from the same model and have
+the same length.
+
+text-embedding-3 models are Matryoshka-trained: the first d components of a
+vector are themselves a usable embedding once re-normalized. A space may set
+`dimensions` below the model's native size; vectors are then truncated and
+renormalized on write and on query alike (see EmbeddingSpace.project).
+
+Spaces are configured with settings.EMBEDDING_SPACES, which overrides the
+defaults below per space, e.g.
+
+    EMBEDDING_SPACES = {"memory": {"dimensions": 512}}
+
+Each stored vector is tagged with the id of the space that produced it
+(the `embedding_space` column, e.g. "text-embedding-3-small:512:l2"). Reads
+only use vectors tagged with the active space id; untagged rows predate
+tagging and are accepted when their width fits. Changing a space changes its
+id, and `migrate_embedding_space` moves the stale rows over in the background.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .similarity import normalize
+
+
+# Native output size per model.
+MODEL_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+# Models whose vectors may be truncated (Matryoshka representation learning).
+MATRYOSHKA_MODELS = {"text-embedding-3-small", "text-embedding-3-large"}
+
+# Every vector we store is L2-normalized; recorded in the space id.
+NORMALIZATION = "l2"
+
+# Model column holding each row's space id.
+SPACE_FIELD = "embedding_space"
+
+DEFAULT_SPACES = {
+    "memory": {"model": "text-embedding-3-small"},     # Memory (ingestor, querier, MemoryIndex)
+    "items": {"model": "text-embedding-3-small"},      # Note, Todo, Reminder, NaturalResolver
+    "files": {"model": "text-embedding-3-small"},      # UploadedFile chunks
+    "avatars": {"model": "text-embedding-3-small"},    # AvatarMemoryChunk
+    "knowledge": {"model": "text-embedding-3-small"},  # KnowledgeVaultEntry, EmbeddingService
+}
+
+
+class EmbeddingSpace:
+    """
+    A (model, dimensions) pair that stored and query vectors must share.
+    """
+
+    def __init__(self, name: str, model: str, dimensions: Optional[int] = None):
+        if model not in MODEL_DIMENSIONS:
+            raise ImproperlyConfigured(f"Embedding space '{name}': unknown model '{model}'")
+
+        self.name = name
+        self.model = model
+        self.native_dimensions = MODEL_DIMENSIONS[model]
+        self.dimensions = dimensions or self.native_dimensions
+
+        if self.dimensions > self.native_dimensions:
+            raise ImproperlyConfigured(
+                f"Embedding space '{name}': {model} only produces {self.native_dimensions} dimensions"
+            )
+        if self.reduced and model not in MATRYOSHKA_MODELS:
+            raise ImproperlyConfigured(f"Embedding space '{name}': {model} vectors cannot be truncated")
+
+    def __repr__(self) -> str:
+        return f"<EmbeddingSpace {self.name}: {self.space_id}>"
+
+    @property
+    def space_id(self) -> str:
+        return f"{self.model}:{self.dimensions}:{NORMALIZATION}"
+
+    @property
+    def reduced(self) -> bool:
+        return self.dimensions < self.native_dimensions
+
+    @property
+    def cache_dimensions(self) -> Optional[int]:
+        """Dimension component of embedding cache keys (None for native vectors)."""
+        return self.dimensions if self.reduced else None
+
+    def project(self, vectors) -> np.ndarray:
+        """
+        Truncates a vector (or each row of a matrix) to the space's dimension
+        and renormalizes it to unit length.
+        """
+        arr = np.asarray(vectors, dtype=np.float32)
+        if arr.shape[-1] > self.dimensions:
+            arr = arr[..., : self.dimensions]
+        return normalize(arr)
+
+    def accepts(self, vector) -> bool:
+        """True if `vector` already has this space's dimension."""
+        return vector is not None and np.shape(vector)[-1] == self.dimensions
+
+    def coerce(self, vector, space_id: str = "") -> Optional[np.ndarray]:
+        """
+        Returns a stored vector ready to compare in this space, or None if it
+        must not be compared.
+
+        Tagged vectors are used only when tagged with this space. Untagged
+        (legacy) vectors are judged by width: the space's dimension passes
+        through, the model's native size is projected, anything else is
+        another model.
+        """
+        if vector is None or len(vector) == 0:
+            return None
+        if space_id:
+            return vector if space_id == self.space_id else None
+
+        width = np.shape(vector)[-1]
+        if width == self.dimensions:
+            return vector
+        if width == self.native_dimensions:
+            return self.project(vector)
+        return None
+
+    def convert(self, vector, space_id: str = "") -> Optional[np.ndarray]:
+        """
+        Like coerce, but also projects vectors tagged with an older space of
+        the same model at a larger dimension (no API call needed). Returns
+        None when the vector has to be re-embedded.
+        """
+        if not space_id or space_id == self.space_id:
+            return self.coerce(vector, space_id)
+        if vector is None or len(vector) == 0:
+            return None
+        model, dimensions = parse_space_id(space_id)
+        if model != self.model or dimensions < self.dimensions or np.shape(vector)[-1] != dimensions:
+            return None
+        return self.project(vector)
+
+    def assign(self, obj, vector, field: str = "embedding"):
+        """Sets obj.<field> and tags obj with this space (or clears the tag)."""
+        setattr(obj, field, vector)
+        setattr(obj, SPACE_FIELD, self.space_id if vector is not None else "")
+
+    def active(self, queryset):
+        """Restricts a queryset to rows tagged with this space (plus untagged legacy rows)."""
+        return queryset.filter(**{f"{SPACE_FIELD}__in": [self.space_id, ""]})
+
+
+def parse_space_id(space_id: str) -> Tuple[str, int]:
+    model, dimensions, _ = space_id.rsplit(":", 2)
+    return model, int(dimensions)
+
+
+_spaces: Dict[str, EmbeddingSpace] = {}
+
+
+def get_space(name: str) -> EmbeddingSpace:
+    if name not in _spaces:
+        if name not in DEFAULT_SPACES:
+            raise KeyError(f"Unknown embedding space '{name}'")
+        config = {**DEFAULT_SPACES[name], **settings.EMBEDDING_SPACES.get(name, {})}
+        _spaces[name] = EmbeddingSpace(name, config["model"], config.get("dimensions"))
+    return _spaces[name]
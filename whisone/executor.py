@@ -16,6 +16,7 @@ from .services.todo_service import TodoService
 from .task_frame_builder import TaskFrameBuilder
 # from .knowledge_vault_manager import KnowledgeVaultManager
 from .memory_querier import MemoryQueryManager
+from .pipeline import Pipeline, current_deadline
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -29,7 +30,25 @@ class Executor:
 
     FETCH_ACTIONS = {"fetch_emails", "fetch_events", "fetch_todos", "fetch_notes", "fetch_reminders"}
 
-    def __init__(self, user: User, gmail_creds=None, calendar_creds=None):
+    # Parallel execution of independent frames
+    MAX_PARALLEL = 4
+    FRAME_TIMEOUT = 60  # seconds
+    REPORT_MARGIN = 2  # seconds kept before the caller's deadline to return the results
+    ACTION_RESOURCES = {
+        "mark_email_read": "email",
+        "mark_email_unread": "email",
+        "general_query": "memory",
+    }
+    RESOURCE_ID_FIELDS = {
+        "note": ("note_id",),
+        "reminder": ("reminder_id",),
+        "todo": ("todo_id",),
+        "event": ("event_id",),
+        "email": ("email_id", "msg_id"),
+    }
+    SERIAL_RESOURCES = {"email", "event"}  # one googleapiclient (httplib2) client per service
+
+    def __init__(self, user: User, gmail_creds=None, calendar_creds=None, vault_manager: MemoryQueryManager = None):
         self.user = user
 
         # Services
@@ -42,7 +61,7 @@ class Executor:
         self.calendar_service = GoogleCalendarService(**calendar_creds) if calendar_creds else None
 
         # Knowledge Vault
-        self.vault_manager = MemoryQueryManager(user)
+        self.vault_manager = vault_manager or MemoryQueryManager(user)
 
     # -------------------------
     # UTILITY FUNCTIONS
@@ -74,66 +93,151 @@ class Executor:
         """
         Executes all task frames and returns a consistent result list.
         Every frame gets a response — success, validation error, or execution error.
+
+        Frames that don't depend on each other (see _frame_dependencies) run
+        concurrently on a pool of MAX_PARALLEL threads; results are still
+        returned in the frames' original order. A frame that runs past
+        FRAME_TIMEOUT is reported as failed (it may still complete), and the
+        frames that depend on it are reported as skipped rather than run.
+        Inside a pipeline stage, frames still queued when the stage's
+        deadline draws near are reported as timed out instead of started.
         """
-        results = []
+        results: Dict[int, Dict[str, Any]] = {}
+        ready = []
 
         for i, frame in enumerate(task_frames):
-            action = frame.get("action", "unknown_action")
-            intent = frame.get("intent", "No intent provided")
-            params = frame.get("parameters", {})
-
             # === 1. Not ready → validation failure ===
             if not frame.get("ready", False):
                 missing = frame.get("missing_fields", [])
                 error_msg = f"Missing required fields: {', '.join(missing)}" if missing else "Task not ready"
-                results.append({
+                results[i] = {
                     "index": i,
-                    "intent": intent,
-                    "action": action,
+                    "intent": frame.get("intent", "No intent provided"),
+                    "action": frame.get("action", "unknown_action"),
                     "ready": False,
                     "error": error_msg,
                     "missing_fields": missing,
-                    "parameters": params,
-                })
-                continue
-
-            # === 2. Ready → try to execute ===
-            try:
-                result = self._execute_single_action(action, params)
-
-                results.append({
-                    "index": i,
-                    "intent": intent,
-                    "action": action,
-                    "ready": True,
-                    "success": True,
-                    "result": result,
-                    "parameters": params,
-                })
-
-            except Exception as e:
-                import traceback
-                error_detail = str(e)
-                tb = traceback.format_exc()
-
-                logger.error(f"Execution failed for action '{action}' (intent: {intent})\n"
-                             f"Params: {params}\n"
-                             f"Error: {error_detail}\n"
-                             f"Traceback: {tb}")
+                    "parameters": frame.get("parameters", {}),
+                }
+            else:
+                ready.append(i)
+
+        # === 2. Ready → execute, independent frames in parallel ===
+        if len(ready) == 1:
+            results[ready[0]] = self._execute_frame(ready[0], task_frames[ready[0]])
+        elif ready:
+            depends_on = self._frame_dependencies({i: task_frames[i] for i in ready})
+            pipeline = Pipeline(name="execute_task_frames", max_workers=self.MAX_PARALLEL)
+            for i in ready:
+                pipeline.stage(
+                    str(i),
+                    lambda i=i, **_: self._execute_frame(i, task_frames[i]),
+                    after=[str(j) for j in depends_on[i]],
+                    timeout=self.FRAME_TIMEOUT,
+                    fallback=None,  # replaced below from pipeline.errors
+                )
+            deadline = current_deadline()
+            for name, result in pipeline.run(deadline=deadline - self.REPORT_MARGIN if deadline else None).items():
+                results[int(name)] = result
+            # Timed-out frames, and the frames after them that were never started
+            for name, error in pipeline.errors.items():
+                results[int(name)] = self._failed_frame(int(name), task_frames[int(name)], error, [])
+
+        return [results[i] for i in range(len(task_frames))]
+
+    def _execute_frame(self, i: int, frame: Dict[str, Any]) -> Dict[str, Any]:
+        action = frame.get("action", "unknown_action")
+        intent = frame.get("intent", "No intent provided")
+        params = frame.get("parameters", {})
+        try:
+            result = self._execute_single_action(action, params)
+
+            return {
+                "index": i,
+                "intent": intent,
+                "action": action,
+                "ready": True,
+                "success": True,
+                "result": result,
+                "parameters": params,
+            }
 
-                results.append({
-                    "index": i,
-                    "intent": intent,
-                    "action": action,
-                    "ready": True,
-                    "success": False,
-                    "error": error_detail,
-                    "error_type": type(e).__name__,
-                    "parameters": params,
-                    "traceback": tb.splitlines()[-5:],  # last 5 lines for context
-                })
+        except Exception as e:
+            import traceback
+            tb = traceback.format_exc()
+
+            logger.error(f"Execution failed for action '{action}' (intent: {intent})\n"
+                         f"Params: {params}\n"
+                         f"Error: {str(e)}\n"
+                         f"Traceback: {tb}")
+            return self._failed_frame(i, frame, e, tb.splitlines()[-5:])  # last 5 lines for context
+
+    @classmethod
+    def timed_out_results(cls, task_frames: List[Dict[str, Any]], error: Exception) -> List[Dict[str, Any]]:
+        """Results for frames whose execution ran out of time; their outcome is unknown."""
+        return [cls._failed_frame(i, frame, error, []) for i, frame in enumerate(task_frames)]
+
+    @staticmethod
+    def _failed_frame(i: int, frame: Dict[str, Any], error: Exception, tb: List[str]) -> Dict[str, Any]:
+        return {
+            "index": i,
+            "intent": frame.get("intent", "No intent provided"),
+            "action": frame.get("action", "unknown_action"),
+            "ready": True,
+            "success": False,
+            "error": str(error),
+            "error_type": type(error).__name__,
+            "parameters": frame.get("parameters", {}),
+            "traceback": tb,
+        }
 
-        return results
+    # -------------------------
+    # DEPENDENCIES BETWEEN FRAMES
+    # -------------------------
+    @classmethod
+    def _frame_target(cls, frame: Dict[str, Any]):
+        """(resource, object id or None, is_read) of a frame's action."""
+        action = frame.get("action") or ""
+        params = frame.get("parameters") or {}
+        resource = cls.ACTION_RESOURCES.get(action)
+        if resource is None:
+            resource = action.split("_", 1)[-1].rstrip("s")  # create_note / fetch_notes -> note
+        object_id = next((params.get(k) for k in cls.RESOURCE_ID_FIELDS.get(resource, ()) if params.get(k)), None)
+        return resource, object_id, action in cls.FETCH_ACTIONS or action == "general_query"
+
+    @classmethod
+    def _frame_dependencies(cls, frames: Dict[int, Dict[str, Any]]) -> Dict[int, List[int]]:
+        """
+        For each frame, the earlier frames it must wait for. Two frames on
+        the same resource are ordered when they target the same object, when
+        one reads what the other writes (fetch-then-update, create-then-fetch),
+        or when a write has no object id to tell its target apart. Frames on
+        the same Google service are always ordered: its HTTP client is not
+        thread-safe.
+        """
+        targets = {i: cls._frame_target(frame) for i, frame in frames.items()}
+        depends_on: Dict[int, List[int]] = {}
+        for i in frames:
+            resource, object_id, is_read = targets[i]
+            action = frames[i].get("action") or ""
+            depends_on[i] = []
+            for j in frames:
+                if j >= i:
+                    break
+                other, other_id, other_read = targets[j]
+                if resource != other:
+                    continue
+                if (
+                    resource in cls.SERIAL_RESOURCES
+                    or (object_id is not None and object_id == other_id)
+                    or is_read != other_read
+                    or (not is_read and not other_read and (
+                        (object_id is None and not action.startswith("create_"))
+                        or (other_id is None and not (frames[j].get("action") or "").startswith("create_"))
+                    ))
+                ):
+                    depends_on[i].append(j)
+        return depends_on
 
     # -------------------------
     # SINGLE ACTION EXECUTION
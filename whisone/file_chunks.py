@@ -0,0 +1,166 @@
+"""
+Chunk storage for uploaded files.
+
+Each processed UploadedFile keeps its chunks as FileChunk rows (page number,
+character offsets into UploadedFile.content, text) and their vectors as one
+float32 .npy matrix in the file's `vector_file`, row i belonging to chunk i.
+Queries memory-map the matrix, score it, and load only the top chunks' text.
+
+Files processed before chunks were stored keep their vectors in
+UploadedFile.embedding; load_vectors falls back to that column.
+
+Uploads and chunks are fingerprinted with sha256. A re-upload of bytes the
+user already has processed copies the earlier result (copy_processed), and
+chunk vectors are reused by chunk hash (reusable_vectors), so reprocessing
+only embeds chunks whose text changed.
+"""
+import hashlib
+import io
+import tempfile
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from django.core.files import File
+from django.db import transaction
+
+from .embedding_spaces import get_space
+from .models import FileChunk, UploadedFile
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's bytes, read in 1 MiB blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_hash(text: str) -> str:
+    """sha256 of the whitespace-normalized chunk text."""
+    return hashlib.sha256(" ".join((text or "").split()).encode("utf-8")).hexdigest()
+
+
+def store_chunks(uploaded_file: UploadedFile, chunks: Iterable[Dict], vectors, space: str = "files"):
+    """
+    Replaces the file's chunks and vector matrix.
+
+    `chunks` are dicts with page_num, start_char, end_char and text, in the
+    same order as the rows of `vectors`. Sets (but does not save) the file's
+    vector_file and embedding space tag, and clears the legacy embedding
+    column; the caller saves the UploadedFile.
+    """
+    count = write_chunks(uploaded_file, chunks)
+    write_vectors(uploaded_file, vectors if count else None, space=space)
+
+
+def write_chunks(uploaded_file: UploadedFile, chunks: Iterable[Dict]) -> int:
+    """Replaces the file's FileChunk rows; `chunks` is consumed lazily, in batches."""
+    chunks = iter(chunks)
+    count = 0
+    with transaction.atomic():
+        FileChunk.objects.filter(file=uploaded_file).delete()
+        while True:
+            batch = list(islice(chunks, 500))
+            if not batch:
+                break
+            FileChunk.objects.bulk_create(
+                [
+                    FileChunk(
+                        file=uploaded_file,
+                        index=count + i,
+                        content_hash=chunk.get("content_hash") or chunk_hash(chunk["text"]),
+                        **{k: v for k, v in chunk.items() if k != "content_hash"},
+                    )
+                    for i, chunk in enumerate(batch)
+                ]
+            )
+            count += len(batch)
+    return count
+
+
+def write_vectors(uploaded_file: UploadedFile, vectors, space: str = "files"):
+    """
+    Replaces the file's vector matrix (row i = chunk i; may be memory-mapped)
+    and tags the file with the space. Does not save the UploadedFile.
+    """
+    if uploaded_file.vector_file:
+        uploaded_file.vector_file.delete(save=False)
+    uploaded_file.embedding = None
+    uploaded_file.embedding_space = ""
+    if vectors is not None and len(vectors):
+        with tempfile.TemporaryFile() as tmp:
+            np.save(tmp, np.asarray(vectors, dtype=np.float32), allow_pickle=False)
+            tmp.seek(0)
+            uploaded_file.vector_file.save(f"{uploaded_file.pk}.npy", File(tmp), save=False)
+        uploaded_file.embedding_space = get_space(space).space_id
+
+
+def load_vectors(uploaded_file: UploadedFile, mmap: bool = True) -> Optional[np.ndarray]:
+    """
+    The file's chunk vectors as a (chunks, dim) float32 matrix, memory-mapped
+    from its .npy file when the storage is local. Falls back to the legacy
+    UploadedFile.embedding column. None when the file has no vectors.
+    """
+    if uploaded_file.vector_file:
+        try:
+            return np.load(uploaded_file.vector_file.path, mmap_mode="r" if mmap else None, allow_pickle=False)
+        except NotImplementedError:  # remote storage: no local path to map
+            with uploaded_file.vector_file.open("rb") as f:
+                return np.load(io.BytesIO(f.read()), allow_pickle=False)
+    return uploaded_file.embedding
+
+
+def chunk_texts(uploaded_file: UploadedFile, indexes: Sequence[int]) -> List[str]:
+    """Texts of the given chunk indexes, in the order asked for."""
+    by_index = dict(
+        FileChunk.objects.filter(file=uploaded_file, index__in=[int(i) for i in indexes]).values_list("index", "text")
+    )
+    return [by_index[int(i)] for i in indexes if int(i) in by_index]
+
+
+def reusable_vectors(user_id: int, hashes: Iterable[str], space: str = "files") -> Dict[str, np.ndarray]:
+    """
+    {chunk hash: vector} for chunks with these hashes already embedded in
+    the current space in any of the user's files.
+    """
+    space = get_space(space)
+    rows = (
+        FileChunk.objects.filter(
+            file__user_id=user_id,
+            file__embedding_space=space.space_id,
+            content_hash__in=set(hashes),
+        )
+        .exclude(file__vector_file="")
+        .exclude(file__vector_file=None)
+        .values_list("content_hash", "file_id", "index")
+    )
+    by_file: Dict[int, Dict[str, int]] = {}
+    for digest, file_id, index in rows:
+        by_file.setdefault(file_id, {}).setdefault(digest, index)
+
+    found: Dict[str, np.ndarray] = {}
+    for f in UploadedFile.objects.filter(id__in=list(by_file)).only("id", "user_id", "vector_file", "embedding_space"):
+        vectors = load_vectors(f)
+        for digest, index in by_file[f.id].items():
+            if digest not in found and index < len(vectors):
+                found[digest] = np.array(vectors[index], dtype=np.float32)
+    return found
+
+
+def copy_processed(target: UploadedFile, source: UploadedFile):
+    """
+    Gives `target` the content, chunks and vectors of an already processed
+    upload with the same bytes. Does not save the target.
+    """
+    target.content = source.content
+    write_chunks(
+        target,
+        FileChunk.objects.filter(file=source)
+        .order_by("index")
+        .values("page_num", "start_char", "end_char", "text", "content_hash")
+        .iterator(),
+    )
+    write_vectors(target, load_vectors(source))
+    target.processed = True
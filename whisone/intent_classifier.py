@@ -0,0 +1,265 @@
+"""
+Local fast path in front of the TaskPlanner LLM call.
+
+Messages that are a single, plainly worded CRUD request ("remind me to call
+mom at 6pm", "show my todos", "add a todo: renew passport") are matched by
+anchored rules; reminder times must parse with dateparser. A match is
+scored by the rule's confidence, averaged with the probability the intent
+model gives its action once a model trained on that action exists. Plans
+at or above settings.FAST_PATH_THRESHOLD are returned in the planner's raw
+action format; everything else (several actions, questions, anything
+relying on conversation context) returns None and goes to the LLM.
+
+The intent model is a multinomial naive Bayes over word unigrams and
+bigrams, trained on the plans the LLM produced (PlannerLog rows) by
+`manage.py train_intent_classifier` and kept in the Django cache.
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import dateparser
+from django.conf import settings
+from django.core.cache import cache
+
+from .search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+OTHER = "other"  # label of plans with zero or several actions
+
+_PLEASE = r"^(?:(?:hey|hi|ok|okay)[,!]?\s+)?(?:please\s+|pls\s+|can you\s+|could you\s+)?"
+_END = r"\s*[.!]*\s*(?:please|pls|thanks|thank you)?[.!]*$"
+
+FETCH_RE = re.compile(
+    _PLEASE
+    + r"(?:show|list|display|get|give|check|see|view|open|what(?:'s| is| are)?)\s+(?:me\s+)?(?:all\s+)?(?:of\s+)?my\s+"
+    + r"(?P<what>to-?dos?(?:\s+list)?|tasks?|notes?|reminders?|unread\s+(?:e-?mails?|mails?|messages)|e-?mails?|mails?|inbox|calendar|events?|schedule)"
+    + r"\s*[?.!]*$",
+    re.IGNORECASE,
+)
+REMIND_RE = re.compile(_PLEASE + r"(?:remind me|set (?:a |me a )?reminder)\s+(?:to|about|that)\s+(?P<rest>.+)$", re.IGNORECASE)
+REMIND_WHEN_FIRST_RE = re.compile(
+    _PLEASE + r"remind me\s+(?P<when>(?:at|on|in|tomorrow|tonight|today|next|this)\b.+?)\s+(?:to|about|that)\s+(?P<text>.+)$",
+    re.IGNORECASE,
+)
+WHEN_START_RE = re.compile(r"\s(?=(?:at|on|in|by|tomorrow|tonight|today|next|this|every)\b)", re.IGNORECASE)
+TODO_RES = [
+    re.compile(_PLEASE + r"(?:add|create|make|new)\s+(?:a\s+)?(?:new\s+)?(?:to-?do|task)(?:\s+item)?\s*(?::|-|to|for)?\s+(?P<task>.+)$", re.IGNORECASE),
+    re.compile(_PLEASE + r"add\s+(?P<task>.+?)\s+to\s+my\s+(?:to-?do|task)s?(?:\s+list)?" + _END, re.IGNORECASE),
+    re.compile(r"^(?:to-?do|task)\s*:\s*(?P<task>.+)$", re.IGNORECASE),
+]
+NOTE_RES = [
+    re.compile(_PLEASE + r"(?:take|make|create|add|save|write)\s+(?:a\s+|this\s+as\s+a\s+)?note\s*(?::|-|that|about|saying)?\s+(?P<content>.+)$", re.IGNORECASE),
+    re.compile(r"^note\s*:\s*(?P<content>.+)$", re.IGNORECASE),
+]
+# A payload mentioning another action is probably a multi-step request: leave it to the LLM.
+OTHER_INTENT_RE = re.compile(
+    r"\b(?:remind me|reminder|to-?do|todo list|take a note|make a note|e-?mails?|inbox|calendar|schedule|and then|also)\b",
+    re.IGNORECASE,
+)
+
+# Head noun of FETCH_RE's `what` (see _fetch_noun) -> action
+FETCH_ACTIONS = {
+    "todo": "fetch_todos", "task": "fetch_todos", "note": "fetch_notes", "reminder": "fetch_reminders",
+    "unread": "fetch_emails", "email": "fetch_emails", "mail": "fetch_emails", "inbox": "fetch_emails",
+    "calendar": "fetch_events", "event": "fetch_events", "schedule": "fetch_events",
+}
+
+
+def _fetch_noun(what: str) -> str:
+    """First word of a fetch target, singular and without hyphens: "To-dos list" -> "todo"."""
+    word = re.sub(r"[^a-z]", "", what.split()[0].lower())
+    return word[:-1] if word.endswith("s") else word
+
+
+RULE_CONFIDENCE = {
+    "fetch": 0.95,
+    "create_reminder": 0.9,
+    "create_todo": 0.9,
+    "create_note": 0.9,
+}
+
+
+class IntentModel:
+    """Multinomial naive Bayes over unigrams + bigrams, serializable to the cache."""
+
+    CACHE_KEY = "intent_classifier:model"
+    MAX_VOCAB = 5000
+    ALPHA = 1.0  # Laplace smoothing
+
+    def __init__(self, priors: Dict[str, float], likelihoods: Dict[str, Dict[str, float]], unknown: Dict[str, float]):
+        self.priors = priors
+        self.likelihoods = likelihoods
+        self.unknown = unknown
+
+    @staticmethod
+    def features(text: str) -> List[str]:
+        tokens = ["#" if t.isdigit() else t for t in tokenize(text)]
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    @staticmethod
+    def label(actions) -> str:
+        actions = [a for a in (actions or []) if isinstance(a, dict)]
+        if len(actions) != 1:
+            return OTHER
+        return actions[0].get("action") or OTHER
+
+    @classmethod
+    def train(cls, examples: Iterable[Tuple[str, str]]) -> Optional["IntentModel"]:
+        """Fits the model on (message, label) pairs; None without at least two labels."""
+        counts: Dict[str, Counter] = defaultdict(Counter)
+        docs = Counter()
+        for text, label in examples:
+            counts[label].update(cls.features(text))
+            docs[label] += 1
+        if len(docs) < 2:
+            return None
+
+        totals = Counter()
+        for c in counts.values():
+            totals.update(c)
+        vocab = [term for term, _ in totals.most_common(cls.MAX_VOCAB)]
+        n_docs = sum(docs.values())
+
+        priors, likelihoods, unknown = {}, {}, {}
+        for label, c in counts.items():
+            size = sum(c[t] for t in vocab) + cls.ALPHA * (len(vocab) + 1)
+            priors[label] = math.log(docs[label] / n_docs)
+            likelihoods[label] = {t: math.log((c[t] + cls.ALPHA) / size) for t in vocab if c[t]}
+            unknown[label] = math.log(cls.ALPHA / size)
+        return cls(priors, likelihoods, unknown)
+
+    def probabilities(self, text: str) -> Dict[str, float]:
+        feats = self.features(text)
+        scores = {
+            label: prior + sum(self.likelihoods[label].get(f, self.unknown[label]) for f in feats)
+            for label, prior in self.priors.items()
+        }
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp.values())
+        return {label: value / total for label, value in exp.items()}
+
+    def save(self):
+        cache.set(self.CACHE_KEY, {"priors": self.priors, "likelihoods": self.likelihoods, "unknown": self.unknown}, None)
+
+    @classmethod
+    def load(cls) -> Optional["IntentModel"]:
+        data = cache.get(cls.CACHE_KEY)
+        return cls(**data) if data else None
+
+
+class FastPathClassifier:
+    """Rules + dateparser + the optional IntentModel; see the module docstring."""
+
+    MODEL_REFRESH = 300  # seconds between checks for a retrained model
+
+    def __init__(self):
+        self._model: Optional[IntentModel] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def threshold(self) -> float:
+        return getattr(settings, "FAST_PATH_THRESHOLD", 0.85)
+
+    def model(self) -> Optional[IntentModel]:
+        with self._lock:
+            if time.monotonic() - self._loaded_at > self.MODEL_REFRESH:
+                try:
+                    self._model = IntentModel.load()
+                except Exception as e:
+                    logger.warning("FastPathClassifier: could not load the intent model: %s", e)
+                    self._model = None
+                self._loaded_at = time.monotonic()
+            return self._model
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def classify(self, message: str) -> Optional[List[Dict]]:
+        """The planner-format action list for `message`, or None to use the LLM."""
+        text = " ".join((message or "").split())
+        if not text or len(text) > 300:
+            return None
+
+        match = self._match(text)
+        if match is None:
+            return None
+        action, params, intent, rule_confidence = match
+
+        confidence = rule_confidence
+        model = self.model()
+        if model is not None and action in model.priors:
+            confidence = (rule_confidence + model.probabilities(text).get(action, 0.0)) / 2
+        if confidence < self.threshold:
+            logger.debug("FastPathClassifier: %s scored %.2f, deferring to the LLM", action, confidence)
+            return None
+        return [{"action": action, "params": params, "intent": intent, "confidence": round(confidence, 3)}]
+
+    # -------------------------
+    # Rules
+    # -------------------------
+    def _match(self, text: str) -> Optional[Tuple[str, Dict, str, float]]:
+        m = FETCH_RE.match(text)
+        if m:
+            what = m.group("what").lower()
+            action = FETCH_ACTIONS[_fetch_noun(what)]
+            params = {"filters": [{"unread": True}]} if what.startswith("unread") else {}
+            return action, params, f"Show {what}", RULE_CONFIDENCE["fetch"]
+
+        reminder = self._reminder(text)
+        if reminder:
+            reminder_text, when = reminder
+            return (
+                "create_reminder", {"text": reminder_text, "remind_at": when},
+                "Set reminder", RULE_CONFIDENCE["create_reminder"],
+            )
+
+        for pattern in TODO_RES:
+            m = pattern.match(text)
+            if m and self._single(m.group("task")):
+                return "create_todo", {"task": self._clean(m.group("task"))}, "Create todo", RULE_CONFIDENCE["create_todo"]
+
+        for pattern in NOTE_RES:
+            m = pattern.match(text)
+            if m and self._single(m.group("content")):
+                return "create_note", {"content": m.group("content").strip()}, "Create note", RULE_CONFIDENCE["create_note"]
+        return None
+
+    def _reminder(self, text: str) -> Optional[Tuple[str, str]]:
+        m = REMIND_WHEN_FIRST_RE.match(text)
+        if m and self._parses(m.group("when")) and self._single(m.group("text")):
+            return self._clean(m.group("text")), self._clean(m.group("when"))
+
+        m = REMIND_RE.match(text)
+        if not m:
+            return None
+        rest = self._clean(m.group("rest"))
+        # Leftmost split whose tail is a time: "look at the car at 5pm" -> ("look at the car", "at 5pm")
+        for split in WHEN_START_RE.finditer(rest):
+            reminder_text, when = rest[:split.start()].strip(), rest[split.end():].strip()
+            if reminder_text and self._parses(when) and self._single(reminder_text):
+                return reminder_text, when
+        return None
+
+    @staticmethod
+    def _parses(when: str) -> bool:
+        when = re.sub(r"^(?:at|on|by)\s+", "", when.strip(), flags=re.IGNORECASE)
+        return dateparser.parse(when, settings={"PREFER_DATES_FROM": "future"}) is not None
+
+    @staticmethod
+    def _single(payload: str) -> bool:
+        return bool(payload.strip()) and not OTHER_INTENT_RE.search(payload)
+
+    @staticmethod
+    def _clean(value: str) -> str:
+        return re.sub(_END, "", value.strip(), flags=re.IGNORECASE).strip()
+
+
+fast_path = FastPathClassifier()
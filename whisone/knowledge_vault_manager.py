@@ -3,26 +3,31 @@ from django.utils import timezone
 from django.db.models import Q
 from .models import KnowledgeVaultEntry
 import uuid
-import openai
-import numpy as np
 from celery import shared_task
 
+from . import similarity
+from .access_tracker import access_tracker
+from .utils.embedding_utils import embed_many, generate_embedding
+
 @shared_task
 def generate_embedding_task(entry_id: str):
-    entry = KnowledgeVaultEntry.objects.get(id=entry_id)
-    client = openai.OpenAI()
+    generate_embeddings_task([entry_id])
 
 
-    text_search = entry.text_search or entry.summary
-    if not text_search:
+@shared_task
+def generate_embeddings_task(entry_ids: List[str]):
+    """Embeds many entries through one batched embed_many call."""
+    entries = [
+        e for e in KnowledgeVaultEntry.objects.filter(id__in=entry_ids)
+        if e.text_search or e.summary
+    ]
+    if not entries:
         return
 
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text_search
-    )
-    entry.embedding = response.data[0].embedding
-    entry.save(update_fields=["embedding"])
+    vectors = embed_many([e.text_search or e.summary for e in entries], space="knowledge")
+    for entry, vector in zip(entries, vectors):
+        entry.embedding = vector
+    KnowledgeVaultEntry.objects.bulk_update(entries, ["embedding"])
 
 
 class KnowledgeVaultManager:
@@ -173,35 +178,22 @@ class KnowledgeVaultManager:
         # 2. Semantic embedding ranking
         # -------------------------
         if keyword and entries:
-            client = openai.OpenAI()
-            response = client.embeddings.create(
-                model="text-embedding-3-small",
-                input=keyword
-            )
-            query_embedding = response.data[0].embedding
-
-            def cosine(a, b):
-                a, b = np.array(a), np.array(b)
-                return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
-
-            ranked = []
-            for entry in entries:
-                if entry.embedding:
-                    sim = cosine(query_embedding, entry.embedding)
-                    ranked.append((sim, entry))
-            if ranked:
-                ranked.sort(key=lambda x: x[0], reverse=True)
-                entries = [e for _, e in ranked[:limit]]
+            query_embedding = generate_embedding(keyword, space="knowledge")
+
+            embedded = [e for e in entries if e.embedding is not None and len(e.embedding)]
+            if embedded:
+                picked, _ = similarity.rank(query_embedding, [e.embedding for e in embedded], k=limit)
+                entries = [embedded[i] for i in picked]
             else:
                 entries = entries[:limit]
         else:
             entries = entries[:limit]
 
-        # Update last accessed
+        # Update last accessed (buffered, flushed by flush_access_buffer)
         now = timezone.now()
+        access_tracker.touch(KnowledgeVaultEntry, [e.pk for e in entries], at=now)
         for e in entries:
             e.last_accessed = now
-            e.save(update_fields=["last_accessed"])
 
         # -------------------------
         # 3. Return structured dict
@@ -223,12 +215,12 @@ class KnowledgeVaultManager:
     # 4️⃣ Fetch Recent Memories
     # ---------------------------
     def recent_memories(self, limit: int = 5):
-        entries = KnowledgeVaultEntry.objects.filter(user=self.user).order_by("-timestamp")[:limit]
+        entries = list(KnowledgeVaultEntry.objects.filter(user=self.user).order_by("-timestamp")[:limit])
         now = timezone.now()
+        access_tracker.touch(KnowledgeVaultEntry, [entry.pk for entry in entries], at=now)
         for entry in entries:
             entry.last_accessed = now
-            entry.save(update_fields=["last_accessed"])
-        return list(entries)
+        return entries
 
     # ---------------------------
     # 5️⃣ Prune Old Memories
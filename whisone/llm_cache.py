@@ -0,0 +1,233 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .pipeline import current_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionCache:
+    """
+    Cache for deterministic (low-temperature) chat completions.
+
+    Keys are sha256 of (model, whitespace-normalized messages, remaining
+    request parameters), so a retried job, a repeated message or a
+    redelivered webhook replays the stored completion text instead of paying
+    for it again. Entries live in the Django cache (Redis) with a TTL.
+
+    Caching is opt-in: only call sites that go through `complete()` use it,
+    and requests with a temperature above settings.LLM_CACHE_MAX_TEMPERATURE
+    go straight to the API.
+
+    Concurrent identical requests are coalesced into one API call: threads
+    of a worker wait on the same in-process future, and workers wait on a
+    short Redis lock held by whichever process is making the call. A waiter
+    whose lock holder dies or stalls past LOCK_TIMEOUT makes the call itself.
+    Inside a whisone.pipeline stage no waiter waits past the stage's
+    deadline: it then makes the call itself, which the shared LLM client
+    fails at once with a timeout.
+
+    Hit/miss counters are kept like EmbeddingCache's and read with `stats()`.
+    """
+
+    KEY_PREFIX = "llm"
+    LOCK_SUFFIX = ":lock"
+    STATS_KEY = "llm:stats:{name}"
+    TTL = 60 * 60 * 24  # 1 day
+    LOCK_TIMEOUT = 60  # seconds; longer than any completion we make
+    POLL_INTERVAL = 0.1
+    STATS_FLUSH_EVERY = 50
+
+    def __init__(self, ttl: int = TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._pending_stats: Counter = Counter()
+
+    # -------------------------
+    # Keys
+    # -------------------------
+    @staticmethod
+    def _normalize_message(message: Dict[str, Any]) -> Dict[str, Any]:
+        content = message.get("content")
+        if isinstance(content, str):
+            content = " ".join(content.split())
+        return {**message, "content": content}
+
+    def key(self, model: str, messages: List[Dict[str, Any]], **params) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": [self._normalize_message(m) for m in messages], "params": params},
+            sort_keys=True,
+            default=str,
+        )
+        return f"{self.KEY_PREFIX}:{model}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    @staticmethod
+    def cacheable(temperature: Optional[float]) -> bool:
+        if not getattr(settings, "LLM_CACHE_ENABLED", True):
+            return False
+        return (temperature or 0.0) <= getattr(settings, "LLM_CACHE_MAX_TEMPERATURE", 0.2)
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def complete(self, client, model: str, messages: List[Dict[str, Any]], ttl: Optional[int] = None, **params) -> str:
+        """
+        The text of `client.chat.completions.create(model=..., messages=...,
+        **params)`, served from the cache when an identical request was made
+        within `ttl` seconds. API errors propagate and are never cached.
+        """
+        if not self.cacheable(params.get("temperature")):
+            self._count("bypassed")
+            return self._create(client, model, messages, params)
+
+        key = self.key(model, messages, **params)
+        cached = self._get(key)
+        if cached is not None:
+            self._count("hits")
+            return cached
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+
+        if not leader:
+            try:
+                text = future.result(timeout=self._wait_budget(None))
+            except FutureTimeout:
+                logger.warning("CompletionCache: deadline reached waiting on %s, calling the API", key)
+                return self._create(client, model, messages, params)
+            self._count("coalesced")
+            return text
+
+        try:
+            text = self._fetch(key, client, model, messages, params, ttl or self.ttl)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(text)
+            return text
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            self._maybe_flush_stats()
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _fetch(self, key: str, client, model: str, messages, params: Dict[str, Any], ttl: int) -> str:
+        """Makes the call under the cross-worker lock, or waits for the worker holding it."""
+        lock_key, token = key + self.LOCK_SUFFIX, uuid.uuid4().hex
+        deadline = time.monotonic() + self._wait_budget(self.LOCK_TIMEOUT)
+        while not self._acquire(lock_key, token):
+            if time.monotonic() >= deadline:
+                logger.warning("CompletionCache: gave up waiting on %s, calling the API", key)
+                break
+            time.sleep(self.POLL_INTERVAL)
+            cached = self._get(key)
+            if cached is not None:
+                self._count("coalesced")
+                return cached
+        else:
+            # We hold the lock, but a holder may have stored the answer just before releasing it.
+            cached = self._get(key)
+            if cached is not None:
+                self._release(lock_key, token)
+                self._count("hits")
+                return cached
+
+        try:
+            self._count("misses")
+            text = self._create(client, model, messages, params)
+            if text:
+                try:
+                    cache.set(key, text, ttl)
+                except Exception as e:
+                    logger.warning("CompletionCache: redis write failed: %s", e)
+            return text
+        finally:
+            self._release(lock_key, token)
+
+    @staticmethod
+    def _wait_budget(limit: Optional[float]) -> Optional[float]:
+        """Seconds a waiter may wait: `limit`, capped by the running stage's deadline."""
+        deadline = current_deadline()
+        if deadline is None:
+            return limit
+        remaining = max(0.0, deadline - time.monotonic())
+        return remaining if limit is None else min(limit, remaining)
+
+    @staticmethod
+    def _create(client, model: str, messages, params: Dict[str, Any]) -> str:
+        response = client.chat.completions.create(model=model, messages=messages, **params)
+        return response.choices[0].message.content or ""
+
+    @staticmethod
+    def _get(key: str) -> Optional[str]:
+        try:
+            return cache.get(key)
+        except Exception as e:
+            logger.warning("CompletionCache: redis lookup failed: %s", e)
+            return None
+
+    @staticmethod
+    def _acquire(lock_key: str, token: str) -> bool:
+        try:
+            return cache.add(lock_key, token, CompletionCache.LOCK_TIMEOUT)
+        except Exception as e:
+            logger.warning("CompletionCache: could not take %s: %s", lock_key, e)
+            return True  # no Redis: behave like an uncoordinated call
+
+    @staticmethod
+    def _release(lock_key: str, token: str):
+        try:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+        except Exception as e:
+            logger.debug("CompletionCache: could not release %s: %s", lock_key, e)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._pending_stats[name] += 1
+
+    def _maybe_flush_stats(self, force: bool = False):
+        with self._lock:
+            if not force and sum(self._pending_stats.values()) < self.STATS_FLUSH_EVERY:
+                return
+            pending, self._pending_stats = self._pending_stats, Counter()
+
+        for name, count in pending.items():
+            key = self.STATS_KEY.format(name=name)
+            try:
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, count)
+            except Exception as e:
+                logger.debug("CompletionCache: could not record %s: %s", name, e)
+
+    def stats(self) -> Dict[str, float]:
+        """Cluster-wide counters plus the derived hit rate (coalesced calls count as hits)."""
+        self._maybe_flush_stats(force=True)
+        names = ("hits", "coalesced", "misses", "bypassed")
+        values = cache.get_many([self.STATS_KEY.format(name=n) for n in names])
+        counts = {n: int(values.get(self.STATS_KEY.format(name=n)) or 0) for n in names}
+        served = counts["hits"] + counts["coalesced"]
+        total = served + counts["misses"]
+        counts["hit_rate"] = served / total if total else 0.0
+        return counts
+
+
+# Process-wide instance shared by every cached call site.
+completion_cache = CompletionCache()
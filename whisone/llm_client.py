@@ -0,0 +1,244 @@
+"""
+Process-wide OpenAI client with a shared HTTP connection pool.
+
+Every call site gets its client from `get_client(site)`. All clients share
+one keep-alive httpx pool (HTTP/2 when the `h2` package is installed), so
+connections and TLS sessions are reused across the stages of a message
+instead of being set up by each component. Sites differ only in their
+timeout budget (SITE_TIMEOUTS, overridable with settings.LLM_TIMEOUTS).
+
+Resilience lives in the transport, below the SDK (whose own retries are
+switched off):
+  - 429 and 5xx responses and connection errors are retried with
+    exponential backoff and full jitter, honouring Retry-After, for as long
+    as the request's timeout budget allows. Each attempt gets only what is
+    left of the budget as its timeout, so a call never outlives it. Inside
+    a whisone.pipeline stage the budget also ends at the stage's deadline;
+  - a per-host circuit breaker opens after BREAKER_FAILURES consecutive
+    requests that ended in a 5xx or a connection error and rejects calls
+    for BREAKER_COOLDOWN seconds, then lets a single probe through. Rate
+    limits (429) and read timeouts don't count: they say nothing about the
+    host being down. Rejected calls surface as openai.APIConnectionError,
+    which callers already handle.
+
+The pool is re-created after a fork, so module-level clients imported
+before Celery forks its workers never share sockets between processes.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+from django.conf import settings
+from openai import OpenAI
+
+from .pipeline import current_deadline
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+except ImportError:  # optional: fall back to HTTP/1.1 keep-alive
+    h2 = None
+
+logger = logging.getLogger(__name__)
+
+# Timeout budget per call site, in seconds; retries stop once it is spent.
+SITE_TIMEOUTS = {
+    "default": 30,
+    "planner": 20,
+    "extractor": 20,
+    "response": 30,
+    "embeddings": 30,
+    "summary": 60,
+    "avatars": 60,
+    "memory_query": 15,
+    "memory_ingest": 20,
+    "resolver": 15,
+    "file_chat": 30,
+    "reminders": 20,
+}
+CONNECT_TIMEOUT = 5
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE = 10
+KEEPALIVE_EXPIRY = 60
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 0.5  # seconds; doubled per attempt
+BACKOFF_CAP = 8
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+BREAKER_FAILURES = 5
+BREAKER_COOLDOWN = 30  # seconds
+
+
+class CircuitOpen(httpx.ConnectError):
+    pass
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open (cooldown) -> half-open (one probe)."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._count = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True  # half-open: this caller is the probe
+            return True
+
+    def record(self, ok: Optional[bool]):
+        """ok=None ends a probe without counting the outcome either way."""
+        with self._lock:
+            self._probing = False
+            if ok is None:
+                return
+            if ok:
+                self._count, self._opened_at = 0, None
+                return
+            self._count += 1
+            if self._opened_at is not None or self._count >= self.failures:
+                if self._opened_at is None:
+                    logger.warning("CircuitBreaker: opening after %d consecutive failures", self._count)
+                self._opened_at = time.monotonic()
+
+
+class ResilientTransport(httpx.BaseTransport):
+    """Pooled transport with retry/backoff and a per-host circuit breaker (see the module docstring)."""
+
+    def __init__(self):
+        self._pid = None
+        self._inner: Optional[httpx.HTTPTransport] = None
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def _transport(self) -> httpx.HTTPTransport:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._inner = httpx.HTTPTransport(
+                    http2=h2 is not None,
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=MAX_KEEPALIVE,
+                        keepalive_expiry=KEEPALIVE_EXPIRY,
+                    ),
+                )
+                self._pid = os.getpid()
+            return self._inner
+
+    def _breaker(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            return self._breakers.setdefault(host, CircuitBreaker())
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        breaker = self._breaker(request.url.host)
+        if not breaker.allow():
+            raise CircuitOpen(f"circuit open for {request.url.host}", request=request)
+
+        timeouts = dict(request.extensions.get("timeout") or {})
+        budget = timeouts.get("read") or SITE_TIMEOUTS["default"]
+        deadline = time.monotonic() + budget
+        stage_deadline = current_deadline()
+        if stage_deadline is not None:
+            if stage_deadline <= time.monotonic():
+                raise httpx.ReadTimeout("stage deadline passed before the request was sent", request=request)
+            deadline = min(deadline, stage_deadline)
+        for attempt in range(MAX_ATTEMPTS):
+            remaining = deadline - time.monotonic()
+            request.extensions["timeout"] = {
+                key: remaining if value is None else min(value, remaining) for key, value in timeouts.items()
+            }
+            response, error = None, None
+            try:
+                response = self._transport().handle_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError) as e:
+                error = e
+            except Exception:
+                breaker.record(ok=None)
+                raise
+
+            if error is None and response.status_code not in RETRY_STATUSES:
+                breaker.record(ok=response.status_code < 500)
+                return response
+
+            delay = self._delay(attempt, response)
+            if attempt + 1 == MAX_ATTEMPTS or time.monotonic() + delay >= deadline:
+                # only server errors and unreachable hosts count against the breaker
+                breaker.record(ok=None if error is None and response.status_code == 429 else False)
+                if error is not None:
+                    raise error
+                return response
+
+            logger.warning(
+                "ResilientTransport: %s %s failed (%s), retry %d in %.1fs",
+                request.method, request.url.path, error or response.status_code, attempt + 1, delay,
+            )
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+
+    @staticmethod
+    def _delay(attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            try:
+                return min(float(response.headers.get("retry-after", "")), BACKOFF_CAP)
+            except ValueError:
+                pass
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+    def close(self):
+        with self._lock:
+            if self._inner is not None and self._pid == os.getpid():
+                self._inner.close()
+            self._inner, self._pid = None, None
+
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, str], OpenAI] = {}
+_http_client: Optional[httpx.Client] = None
+
+
+def http_client() -> httpx.Client:
+    """The shared pooled httpx client behind every OpenAI client."""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                transport=ResilientTransport(),
+                timeout=httpx.Timeout(SITE_TIMEOUTS["default"], connect=CONNECT_TIMEOUT),
+            )
+        return _http_client
+
+
+def timeout_for(site: str) -> float:
+    timeouts = {**SITE_TIMEOUTS, **getattr(settings, "LLM_TIMEOUTS", {})}
+    return timeouts.get(site, timeouts["default"])
+
+
+def get_client(site: str = "default", api_key: Optional[str] = None) -> OpenAI:
+    """The OpenAI client for a call site: the shared pool with the site's timeout budget."""
+    api_key = api_key or settings.OPENAI_API_KEY
+    client = _clients.get((site, api_key))
+    if client is not None:
+        return client
+
+    pool = http_client()
+    with _lock:
+        if (site, api_key) not in _clients:
+            _clients[(site, api_key)] = OpenAI(
+                api_key=api_key,
+                http_client=pool,
+                max_retries=0,  # retried in ResilientTransport
+                timeout=httpx.Timeout(timeout_for(site), connect=CONNECT_TIMEOUT),
+            )
+        return _clients[(site, api_key)]
@@ -0,0 +1,104 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from whisone.memory_index import MemoryIndex
+from whisone.models import Memory
+from whisone.similarity import normalize, top_k
+
+
+class Command(BaseCommand):
+    """
+    Measures recall@k of the memory index against exact search on real data.
+
+    For each user, queries are sampled from the user's own stored memory
+    embeddings (so they follow the production distribution). The query's own
+    memory is excluded from both the exact and the approximate results.
+    Reported per variant:
+      - float:      IVF over float32 rows
+      - int8:       IVF over int8 codes, first pass only
+      - int8+rerank: int8 first pass, full-precision re-rank
+    """
+
+    help = "Report recall@k and latency of float32 vs int8-quantized memory index search."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users", help="User id (repeatable).")
+        parser.add_argument("--k", type=int, action="append", dest="ks", help="k to report (repeatable, default 5 and 10).")
+        parser.add_argument("--queries", type=int, default=100, help="Queries sampled per user.")
+        parser.add_argument("--min-memories", type=int, default=50)
+        parser.add_argument("--max-users", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        ks = sorted(options["ks"] or [5, 10])
+        user_ids = options["users"] or list(
+            Memory.objects.exclude(embedding=None)
+            .values("user_id")
+            .annotate(n=Count("id"))
+            .filter(n__gte=options["min_memories"])
+            .order_by("-n")
+            .values_list("user_id", flat=True)[: options["max_users"]]
+        )
+        if not user_ids:
+            self.stdout.write(self.style.WARNING("No users with enough embedded memories."))
+            return
+
+        rng = np.random.default_rng(options["seed"])
+        totals = {}
+        for user_id in user_ids:
+            variants = {
+                "float": MemoryIndex.build(user_id, quantized=False),
+                "int8": MemoryIndex.build(user_id, quantized=True),
+            }
+            base = variants["float"]
+            n = len(base)
+            if n <= max(ks):
+                continue
+
+            sample = rng.choice(n, size=min(options["queries"], n), replace=False)
+            self.stdout.write(
+                f"user={user_id}: {n} memories, dim={base.dim}, "
+                f"index bytes float={len(base._serialize())} int8={len(variants['int8']._serialize())}"
+            )
+
+            for name, index, rerank in (
+                ("float", variants["float"], True),
+                ("int8", variants["int8"], False),
+                ("int8+rerank", variants["int8"], True),
+            ):
+                for k in ks:
+                    recall, elapsed = self._measure(base, index, sample, k, rerank)
+                    hits, count, seconds = totals.get((name, k), (0.0, 0, 0.0))
+                    totals[(name, k)] = (hits + recall * len(sample), count + len(sample), seconds + elapsed)
+                    self.stdout.write(
+                        f"  {name:<12} recall@{k}={recall:.3f}  {1000 * elapsed / len(sample):.2f} ms/query"
+                    )
+
+        self.stdout.write(self.style.SUCCESS("Overall:"))
+        for (name, k), (hits, count, seconds) in sorted(totals.items()):
+            self.stdout.write(f"  {name:<12} recall@{k}={hits / count:.3f}  {1000 * seconds / count:.2f} ms/query")
+
+    @staticmethod
+    def _measure(base: MemoryIndex, index: MemoryIndex, sample, k: int, rerank: bool):
+        vectors = normalize(base.vectors)
+        hits = 0
+        elapsed = 0.0
+        for row in sample:
+            query = vectors[row]
+            own_id = base.ids[row]
+
+            scores = vectors @ query
+            scores[row] = -np.inf
+            exact, _ = top_k(scores, k)
+            truth = {base.ids[i] for i in exact}
+
+            started = time.perf_counter()
+            found = index.search(query, k=k + 1, rerank=rerank)
+            elapsed += time.perf_counter() - started
+
+            found_ids = [mid for mid, _ in found if mid != own_id][:k]
+            hits += len(truth.intersection(found_ids))
+        return hits / (k * len(sample)), elapsed
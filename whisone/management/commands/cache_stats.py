@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from whisone.embedding_cache import embedding_cache
+from whisone.llm_cache import completion_cache
+
+
+class Command(BaseCommand):
+    """
+    Prints the cluster-wide hit/miss counters of the embedding and
+    completion caches (counters are flushed to Redis in batches, so the
+    last few lookups of each worker may not be included yet).
+    """
+
+    help = "Show hit rates of the embedding and LLM completion caches."
+
+    def handle(self, *args, **options):
+        for name, stats in (("embeddings", embedding_cache.stats()), ("completions", completion_cache.stats())):
+            counters = "  ".join(f"{key}={value}" for key, value in stats.items() if key != "hit_rate")
+            self.stdout.write(f"{name:<12} hit_rate={stats['hit_rate']:.1%}  {counters}")
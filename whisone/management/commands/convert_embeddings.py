@@ -0,0 +1,146 @@
+import json
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from whisone.fields import VectorField, encode_vector
+
+
+# Every model whose embedding column moved from JSON to packed float32.
+TARGET_MODELS = [
+    "whisone.Note",
+    "whisone.Todo",
+    "whisone.Reminder",
+    "whisone.AutomationRule",
+    "whisone.Memory",
+    "whisone.UploadedFile",
+    "avatars.AvatarMemoryChunk",
+]
+
+
+class Command(BaseCommand):
+    """
+    Converts legacy JSON embedding columns into the packed float32 format used
+    by VectorField.
+
+    On Postgres the vectors are written into a temporary bytea column in
+    batches (each batch commits on its own, so the command can be re-run after
+    an interruption), then swapped in place of the jsonb column. Run this
+    before `migrate` so the VectorField AlterField finds a bytea column.
+    """
+
+    help = "Convert JSON embedding columns to packed float32 VectorField storage, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--model", action="append", dest="models", help="app_label.Model to convert (repeatable).")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for label in options["models"] or TARGET_MODELS:
+            try:
+                model = apps.get_model(label)
+            except LookupError:
+                self.stdout.write(self.style.WARNING(f"Skipping {label}: app not installed"))
+                continue
+            self._convert_model(model, batch_size)
+
+    # -------------------------
+    # Per-table conversion
+    # -------------------------
+    def _convert_model(self, model, batch_size: int):
+        field = model._meta.get_field("embedding")
+        if not isinstance(field, VectorField):
+            return
+
+        table = model._meta.db_table
+        column = field.column
+        pk_column = model._meta.pk.column
+
+        if connection.vendor == "postgresql":
+            column_type = self._column_type(table, column)
+            if column_type == "bytea":
+                self.stdout.write(f"{table}.{column} already binary, skipping")
+                return
+            target = f"{column}_f32"
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"ALTER TABLE {connection.ops.quote_name(table)} "
+                    f"ADD COLUMN IF NOT EXISTS {connection.ops.quote_name(target)} bytea"
+                )
+            source_expr = f"{connection.ops.quote_name(column)}::text"
+        else:
+            # SQLite is dynamically typed: rewrite the JSON text in place.
+            target = column
+            source_expr = connection.ops.quote_name(column)
+
+        converted = self._copy_in_batches(table, pk_column, column, source_expr, target, field.multi, batch_size)
+
+        if target != column:
+            with transaction.atomic(), connection.cursor() as cursor:
+                qt = connection.ops.quote_name(table)
+                cursor.execute(f"ALTER TABLE {qt} DROP COLUMN {connection.ops.quote_name(column)}")
+                cursor.execute(
+                    f"ALTER TABLE {qt} RENAME COLUMN {connection.ops.quote_name(target)} "
+                    f"TO {connection.ops.quote_name(column)}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"{table}: converted {converted} embeddings"))
+
+    def _copy_in_batches(self, table, pk_column, column, source_expr, target, multi, batch_size) -> int:
+        qn = connection.ops.quote_name
+        update_sql = f"UPDATE {qn(table)} SET {qn(target)} = %s WHERE {qn(pk_column)} = %s"
+
+        last_pk = None
+        converted = 0
+        while True:
+            # Keyset pagination on the primary key keeps every batch an index range scan.
+            where, params = f"{qn(column)} IS NOT NULL", []
+            if last_pk is not None:
+                where += f" AND {qn(pk_column)} > %s"
+                params.append(last_pk)
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT {qn(pk_column)}, {source_expr} FROM {qn(table)} "
+                    f"WHERE {where} ORDER BY {qn(pk_column)} LIMIT %s",
+                    params + [batch_size],
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                updates = []
+                for pk, raw in rows:
+                    packed = self._pack(raw, multi)
+                    if packed is None:
+                        self.stdout.write(self.style.WARNING(f"{table} pk={pk}: unreadable embedding, left empty"))
+                    updates.append((packed, pk))
+                cursor.executemany(update_sql, updates)
+
+            last_pk = rows[-1][0]
+            converted += len(rows)
+            self.stdout.write(f"{table}: {converted} rows processed")
+
+        return converted
+
+    @staticmethod
+    def _pack(raw, multi: bool):
+        if isinstance(raw, (bytes, memoryview)):
+            return bytes(raw)  # already converted on a previous run
+        try:
+            value = json.loads(raw) if isinstance(raw, str) else raw
+            return encode_vector(value, multi=multi)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _column_type(table: str, column: str) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT data_type FROM information_schema.columns WHERE table_name = %s AND column_name = %s",
+                [table, column],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else ""
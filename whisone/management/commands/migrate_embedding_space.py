@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from whisone.embedding_spaces import DEFAULT_SPACES, get_space
+from whisone.models import EmbeddingMigration
+from whisone.tasks.reembed import migrate_embedding_space
+
+
+class Command(BaseCommand):
+    """
+    Starts the background job that moves every vector of an embedding space
+    to the space's configured model and dimension (see EMBEDDING_SPACES),
+    or reports its per-table progress.
+    """
+
+    help = "Re-embed / truncate stored vectors so a space shares one model and dimension."
+
+    def add_arguments(self, parser):
+        parser.add_argument("spaces", nargs="*", help=f"Spaces to migrate (default: all of {', '.join(DEFAULT_SPACES)}).")
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--inline", action="store_true", help="Run in this process instead of queueing on Celery.")
+        parser.add_argument("--status", action="store_true", help="Only print per-table progress.")
+        parser.add_argument("--restart", action="store_true", help="Forget recorded progress and rescan from the start.")
+
+    def handle(self, *args, **options):
+        names = options["spaces"] or list(DEFAULT_SPACES)
+        for name in names:
+            try:
+                space = get_space(name)
+            except KeyError as e:
+                raise CommandError(str(e))
+
+            progress = EmbeddingMigration.objects.filter(space_id=space.space_id)
+            if options["status"]:
+                self.stdout.write(f"{space!r}")
+                for row in progress.order_by("table"):
+                    self.stdout.write(
+                        f"  {row.table:<28} {row.status:<8} processed={row.processed} "
+                        f"updated={row.updated} re-embedded={row.reembedded} last_pk={row.last_pk or '-'}"
+                    )
+                continue
+
+            if options["restart"]:
+                progress.delete()
+
+            if options["inline"]:
+                kwargs = {"batch_size": options["batch_size"], "requeue": False}
+                while migrate_embedding_space.apply(args=[name], kwargs=kwargs).get()["status"] != "done":
+                    pass
+                self.stdout.write(self.style.SUCCESS(f"{space!r}: migrated"))
+            else:
+                migrate_embedding_space.delay(name, batch_size=options["batch_size"])
+                self.stdout.write(f"{space!r}: migration queued")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from whisone.memory_lsh import MemoryLSH
+
+
+class Command(BaseCommand):
+    """
+    Backfills the near-duplicate LSH buckets from stored Memory embeddings.
+    The ingestor indexes memories as it writes them; this is only needed once
+    after deploying, or to repair the index.
+    """
+
+    help = "Rebuild the LSH near-duplicate index over Memory embeddings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Only re-index this user id.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = MemoryLSH.rebuild(user_id=options["user"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} memories"))
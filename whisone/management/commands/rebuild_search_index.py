@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from whisone.search_index import SearchIndex
+
+
+class Command(BaseCommand):
+    """
+    Backfills the search inverted index from existing Notes, Reminders and
+    Todos. New and edited rows are indexed by signals; this is only needed
+    once after deploying, or to repair the index.
+    """
+
+    help = "Rebuild the BM25 search index for Notes, Reminders and Todos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Only re-index this user id.")
+
+    def handle(self, *args, **options):
+        count = SearchIndex.rebuild(user_id=options["user"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} documents"))
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from whisone.intent_classifier import IntentModel
+from whisone.models import PlannerLog
+
+
+class Command(BaseCommand):
+    """
+    Trains the fast-path intent model on the plans the LLM produced
+    (PlannerLog rows with source="llm") and stores it in the cache, where
+    workers pick it up within FastPathClassifier.MODEL_REFRESH seconds.
+    """
+
+    help = "Train the local intent classifier on logged TaskPlanner outputs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=90, help="Only learn from plans this recent.")
+        parser.add_argument("--min-examples", type=int, default=200)
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options["days"])
+        rows = PlannerLog.objects.filter(source="llm", created_at__gte=since).values_list("message", "actions")
+        examples = [(message, IntentModel.label(actions)) for message, actions in rows.iterator(chunk_size=1000)]
+
+        if len(examples) < options["min_examples"]:
+            self.stdout.write(self.style.WARNING(
+                f"Only {len(examples)} logged plans (need {options['min_examples']}); model not trained"
+            ))
+            return
+
+        model = IntentModel.train(examples)
+        if model is None:
+            self.stdout.write(self.style.WARNING("Logged plans cover a single intent; model not trained"))
+            return
+        model.save()
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained on {len(examples)} plans across {len(model.priors)} intents"
+        ))
@@ -1,9 +1,11 @@
 from typing import Dict, Any, Optional
 from datetime import datetime
 import json
-import openai
 from django.conf import settings
 
+from .llm_cache import completion_cache
+from .llm_client import get_client
+
 
 class MemoryExtractor:
     """
@@ -16,7 +18,7 @@ class MemoryExtractor:
         api_key: str = settings.OPENAI_API_KEY,
         model: str = "gpt-4o-mini"
     ):
-        self.client = openai.OpenAI(api_key=api_key)
+        self.client = get_client("extractor", api_key)
         self.model = model
 
     def extract(
@@ -88,7 +90,8 @@ class MemoryExtractor:
             f"User messages (with recent context):\n{combined_content}\n"
         )
 
-        response = self.client.chat.completions.create(
+        response_text = completion_cache.complete(
+            self.client,
             model=self.model,
             messages=[
                 {"role": "system", "content": "You extract structured personal memories."},
@@ -96,9 +99,7 @@ class MemoryExtractor:
             ],
             temperature=0.2,
             max_tokens=500
-        )
-
-        response_text = response.choices[0].message.content.strip()
+        ).strip()
 
         # Remove code fences if present
         if response_text.startswith("```"):
@@ -0,0 +1,491 @@
+import copy
+import io
+import logging
+import threading
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .embedding_spaces import get_space
+from .models import Memory
+from .similarity import dequantize, normalize, quantize, quantized_scores, top_k
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryIndex:
+    """
+    Per-user IVF (inverted file) index over Memory embeddings.
+
+    Vectors are kept L2-normalized in one contiguous float32 matrix and
+    partitioned by spherical k-means into `nlist` cells. A search scores only
+    the rows in the `N_PROBE` cells closest to the query. Small indexes (and
+    filters so selective that the probed cells can't fill `k`) fall back to an
+    exact scan of the filtered rows.
+
+    The structured filters (memory_type, emotion, importance, created_at) are
+    applied as a pre-filter mask over metadata arrays held next to the vectors,
+    so filtered searches never touch the database.
+
+    The serialized index lives in the Django cache (Redis) and each worker
+    keeps a local copy, refreshed when the cached version token changes.
+    A published copy is never modified: updates are made on a clone and
+    swapped in by `save`, so concurrent searches always see one consistent
+    set of arrays.
+
+    With settings.MEMORY_INDEX_QUANTIZED the index keeps int8 codes with a
+    per-row scale and offset instead of float32 rows (4x smaller in Redis and
+    in worker memory). Searches score the codes first, then re-rank the best
+    k * RERANK_FACTOR candidates against their full-precision embeddings
+    from the Memory table.
+    """
+
+    CACHE_KEY = "memory_index:{user_id}"
+    VERSION_KEY = "memory_index:{user_id}:version"
+    CACHE_TTL = 60 * 60 * 24 * 7  # 1 week; rebuilt from the DB on miss
+
+    FLAT_LIMIT = 1024  # exact scan below this many vectors
+    N_PROBE = 6
+    MIN_LIST_COUNT = 8
+    MAX_LIST_COUNT = 256
+    KMEANS_ITERATIONS = 8
+    RETRAIN_GROWTH = 2.0  # re-cluster once the index doubles since last training
+    RERANK_FACTOR = 4  # quantized mode: exact re-rank of k * RERANK_FACTOR candidates
+
+    _local: Dict[int, "MemoryIndex"] = {}
+    _local_lock = threading.Lock()
+    _update_lock = threading.RLock()
+    _pending_discards: Dict[int, set] = {}
+
+    def __init__(self, user_id: int, dim: int = 0, quantized: Optional[bool] = None):
+        self.user_id = user_id
+        self.dim = dim
+        self.quantized = settings.MEMORY_INDEX_QUANTIZED if quantized is None else quantized
+        self.version = ""
+        self.ids: List[str] = []
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.codes = np.empty((0, dim), dtype=np.int8)
+        self.scales = np.empty(0, dtype=np.float32)
+        self.offsets = np.empty(0, dtype=np.float32)
+        self.memory_types = np.empty(0, dtype="U32")
+        self.emotions = np.empty(0, dtype="U64")
+        self.importance = np.empty(0, dtype=np.float32)
+        self.created_at = np.empty(0, dtype=np.float64)
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.trained_size = 0
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # -------------------------
+    # Loading / persistence
+    # -------------------------
+    @classmethod
+    def for_user(cls, user) -> "MemoryIndex":
+        """
+        Returns the user's index: the worker-local copy if it is current,
+        else the cached copy, else a fresh build from the Memory table.
+        """
+        user_id = user.id if hasattr(user, "id") else int(user)
+        version = cache.get(cls.VERSION_KEY.format(user_id=user_id))
+
+        with cls._local_lock:
+            local = cls._local.get(user_id)
+        if local is not None and version and local.version == version:
+            return local
+
+        index = None
+        if version:
+            blob = cache.get(cls.CACHE_KEY.format(user_id=user_id))
+            if blob:
+                try:
+                    index = cls._deserialize(user_id, blob)
+                    index.version = version
+                except Exception as e:
+                    logger.warning("MemoryIndex: corrupt cache entry for user=%s: %s", user_id, e)
+                    index = None
+
+        if index is None:
+            index = cls.build(user_id)
+            index.save()
+
+        with cls._local_lock:
+            cls._local[user_id] = index
+        return index
+
+    @classmethod
+    def build(cls, user_id: int, quantized: Optional[bool] = None) -> "MemoryIndex":
+        space = get_space("memory")
+        rows = (
+            space.active(Memory.objects.filter(user_id=user_id))
+            .exclude(embedding=None)
+            .values_list("id", "embedding", "embedding_space", "memory_type", "emotion", "importance", "created_at")
+        )
+
+        index = cls(user_id, quantized=quantized)
+        ids, vectors, types, emotions, importance, created = [], [], [], [], [], []
+        for mem_id, emb, tag, mem_type, emotion, imp, created_at in rows.iterator(chunk_size=2000):
+            emb = space.coerce(emb, tag)
+            if emb is None:
+                continue
+            if index.dim == 0:
+                index.dim = len(emb)
+            if len(emb) != index.dim:
+                logger.warning("MemoryIndex: skipping memory=%s with dim %d != %d", mem_id, len(emb), index.dim)
+                continue
+            ids.append(str(mem_id))
+            vectors.append(emb)
+            types.append(mem_type or "")
+            emotions.append(emotion or "")
+            importance.append(imp if imp is not None else 0.5)
+            created.append(created_at.timestamp())
+
+        if ids:
+            index.ids = ids
+            matrix = normalize(np.vstack(vectors))
+            if index.quantized:
+                index.codes, index.scales, index.offsets = quantize(matrix)
+            else:
+                index.vectors = matrix
+            index.memory_types = np.array(types, dtype="U32")
+            index.emotions = np.array(emotions, dtype="U64")
+            index.importance = np.array(importance, dtype=np.float32)
+            index.created_at = np.array(created, dtype=np.float64)
+            index._positions = {mid: i for i, mid in enumerate(ids)}
+            index._train(matrix)
+
+        logger.info("MemoryIndex: built index for user=%s with %d vectors", user_id, len(index))
+        return index
+
+    def save(self):
+        self.version = uuid.uuid4().hex
+        cache.set(self.CACHE_KEY.format(user_id=self.user_id), self._serialize(), self.CACHE_TTL)
+        cache.set(self.VERSION_KEY.format(user_id=self.user_id), self.version, self.CACHE_TTL)
+        with self._local_lock:
+            self._local[self.user_id] = self
+
+    @classmethod
+    def invalidate(cls, user_id: int):
+        with cls._local_lock:
+            cls._local.pop(user_id, None)
+        cache.delete_many([cls.CACHE_KEY.format(user_id=user_id), cls.VERSION_KEY.format(user_id=user_id)])
+
+    def _serialize(self) -> bytes:
+        buf = io.BytesIO()
+        arrays = {
+            "ids": np.array(self.ids, dtype="U36"),
+            "memory_types": self.memory_types,
+            "emotions": self.emotions,
+            "importance": self.importance,
+            "created_at": self.created_at,
+            "assignments": self.assignments,
+            "meta": np.array([self.dim, self.trained_size, int(self.quantized)], dtype=np.int64),
+        }
+        if self.quantized:
+            arrays.update(codes=self.codes, scales=self.scales, offsets=self.offsets)
+        else:
+            arrays["vectors"] = self.vectors
+        if self.centroids is not None:
+            arrays["centroids"] = self.centroids
+        np.savez(buf, **arrays)
+        return buf.getvalue()
+
+    @classmethod
+    def _deserialize(cls, user_id: int, blob: bytes) -> "MemoryIndex":
+        data = np.load(io.BytesIO(blob), allow_pickle=False)
+        meta = [int(v) for v in data["meta"]]
+        dim, trained_size = meta[:2]
+        index = cls(user_id, dim, quantized=bool(meta[2]) if len(meta) > 2 else False)
+        index.ids = data["ids"].tolist()
+        if index.quantized:
+            index.codes, index.scales, index.offsets = data["codes"], data["scales"], data["offsets"]
+        else:
+            index.vectors = data["vectors"]
+        index.memory_types = data["memory_types"]
+        index.emotions = data["emotions"]
+        index.importance = data["importance"]
+        index.created_at = data["created_at"]
+        index.assignments = data["assignments"]
+        index.centroids = data["centroids"] if "centroids" in data.files else None
+        index.trained_size = trained_size
+        index._positions = {mid: i for i, mid in enumerate(index.ids)}
+        return index
+
+    # -------------------------
+    # Incremental updates
+    # -------------------------
+    @classmethod
+    def upsert_memory(cls, memory: Memory):
+        """Adds or replaces one memory in its owner's index and persists it."""
+        lock = cls._lock_for(memory.user_id)
+        with lock:
+            index = cls.for_user(memory.user_id).clone()
+            index.upsert(memory)
+            index.save()
+
+    @classmethod
+    def discard_memories(cls, user_id: int, memory_ids):
+        """Removes several memories from the user's index with a single save."""
+        lock = cls._lock_for(user_id)
+        with lock:
+            index = cls.for_user(user_id).clone()
+            removed = [index.remove(str(mem_id)) for mem_id in memory_ids]
+            if any(removed):
+                index.save()
+
+    @classmethod
+    def schedule_upsert(cls, memory: Memory):
+        """Upserts `memory` into its owner's index once the transaction commits."""
+        cls._after_commit(memory.user_id, lambda: cls.upsert_memory(memory))
+
+    @classmethod
+    def schedule_discard(cls, user_id: int, memory_id):
+        """
+        Queues a deleted memory for removal once the transaction commits, so
+        deleting many memories costs one index update per user instead of one
+        per row. Ids left over from a rolled-back transaction are dropped
+        when they still exist in the table.
+        """
+        with cls._local_lock:
+            cls._pending_discards.setdefault(user_id, set()).add(str(memory_id))
+        cls._after_commit(user_id, lambda: cls._flush_discards(user_id))
+
+    @classmethod
+    def _after_commit(cls, user_id: int, update):
+        """
+        Runs an index update after commit. The rows are already written by
+        then, so a lock timeout or Redis error must not fail the caller: the
+        index is invalidated instead and rebuilt by the next query.
+        """
+        def run():
+            try:
+                update()
+            except Exception:
+                logger.exception("MemoryIndex: update failed for user=%s, invalidating the index", user_id)
+                try:
+                    cls.invalidate(user_id)
+                except Exception as e:
+                    logger.warning("MemoryIndex: could not invalidate index for user=%s: %s", user_id, e)
+
+        transaction.on_commit(run)
+
+    @classmethod
+    def _flush_discards(cls, user_id: int):
+        with cls._local_lock:
+            ids = cls._pending_discards.pop(user_id, None)
+        if not ids:
+            return  # an earlier callback of the same transaction took them
+        alive = {str(mid) for mid in Memory.objects.filter(id__in=ids).values_list("id", flat=True)}
+        if ids - alive:
+            cls.discard_memories(user_id, ids - alive)
+
+    def clone(self) -> "MemoryIndex":
+        """A private copy to update; arrays are shared since updates replace them rather than write into them."""
+        index = copy.copy(self)
+        index.ids = list(self.ids)
+        index._positions = dict(self._positions)
+        return index
+
+    def upsert(self, memory: Memory):
+        emb = get_space("memory").coerce(memory.embedding, memory.embedding_space)
+        if emb is None:
+            self.remove(str(memory.id))
+            return
+        if self.dim == 0:
+            self.dim = len(emb)
+            self.vectors = np.empty((0, self.dim), dtype=np.float32)
+            self.codes = np.empty((0, self.dim), dtype=np.int8)
+        if len(emb) != self.dim:
+            logger.warning("MemoryIndex: memory=%s has dim %d, index dim is %d", memory.id, len(emb), self.dim)
+            return
+
+        vec = normalize(np.asarray(emb, dtype=np.float32).reshape(1, -1))
+        mem_id = str(memory.id)
+        pos = self._positions.get(mem_id)
+        cell = self._assign(vec)[0] if self.centroids is not None else 0
+        codes, scales, offsets = quantize(vec) if self.quantized else (None, None, None)
+
+        if pos is None:
+            self.ids.append(mem_id)
+            self._positions[mem_id] = len(self.ids) - 1
+            if self.quantized:
+                self.codes = np.vstack([self.codes, codes])
+                self.scales = np.append(self.scales, scales)
+                self.offsets = np.append(self.offsets, offsets)
+            else:
+                self.vectors = np.vstack([self.vectors, vec])
+            self.memory_types = np.append(self.memory_types, memory.memory_type or "")
+            self.emotions = np.append(self.emotions, memory.emotion or "")
+            self.importance = np.append(self.importance, np.float32(memory.importance or 0.5))
+            self.created_at = np.append(self.created_at, memory.created_at.timestamp())
+            self.assignments = np.append(self.assignments, np.int32(cell))
+        else:
+            # The arrays are shared with the published copy (and, when loaded
+            # from the cache, read-only views of the blob).
+            self._own_arrays()
+            if self.quantized:
+                self.codes[pos], self.scales[pos], self.offsets[pos] = codes[0], scales[0], offsets[0]
+            else:
+                self.vectors[pos] = vec[0]
+            self.memory_types[pos] = memory.memory_type or ""
+            self.emotions[pos] = memory.emotion or ""
+            self.importance[pos] = memory.importance or 0.5
+            self.assignments[pos] = cell
+
+        if len(self) > self.FLAT_LIMIT and len(self) >= self.trained_size * self.RETRAIN_GROWTH:
+            self._train()
+
+    def remove(self, mem_id: str) -> bool:
+        pos = self._positions.pop(mem_id, None)
+        if pos is None:
+            return False
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[pos] = False
+        self.ids.pop(pos)
+        if self.quantized:
+            self.codes, self.scales, self.offsets = self.codes[keep], self.scales[keep], self.offsets[keep]
+        else:
+            self.vectors = self.vectors[keep]
+        self.memory_types = self.memory_types[keep]
+        self.emotions = self.emotions[keep]
+        self.importance = self.importance[keep]
+        self.created_at = self.created_at[keep]
+        self.assignments = self.assignments[keep]
+        self._positions = {mid: i for i, mid in enumerate(self.ids)}
+        return True
+
+    # -------------------------
+    # Search
+    # -------------------------
+    def search(
+        self,
+        query: Sequence[float],
+        k: int = 5,
+        threshold: Optional[float] = None,
+        memory_types: Optional[List[str]] = None,
+        emotions: Optional[List[str]] = None,
+        min_importance: Optional[float] = None,
+        time_after=None,
+        time_before=None,
+        rerank: bool = True,
+    ) -> List[Tuple[str, float]]:
+        """
+        Returns up to k (memory_id, similarity) pairs ordered by
+        (similarity, importance) descending.
+
+        rerank=False returns the quantized first-pass scores as-is (only
+        useful for measuring recall).
+        """
+        if not len(self) or query is None or len(query) != self.dim:
+            return []
+
+        q = normalize(query)
+
+        mask = np.ones(len(self), dtype=bool)
+        if memory_types:
+            mask &= np.isin(self.memory_types, list(memory_types))
+        if emotions:
+            mask &= np.isin(self.emotions, list(emotions))
+        if min_importance is not None:
+            mask &= self.importance >= min_importance
+        if time_after:
+            mask &= self.created_at >= time_after.timestamp()
+        if time_before:
+            mask &= self.created_at <= time_before.timestamp()
+
+        rows = np.flatnonzero(mask)
+        if self.centroids is not None and len(rows) > self.FLAT_LIMIT:
+            probes = np.argsort(self.centroids @ q)[::-1][: self.N_PROBE]
+            probed = rows[np.isin(self.assignments[rows], probes)]
+            if len(probed) >= k:
+                rows = probed
+
+        if not len(rows):
+            return []
+
+        if not self.quantized:
+            picked, scores = top_k(self.vectors[rows] @ q, k, threshold=threshold, tie_breakers=[self.importance[rows]])
+            return [(self.ids[rows[i]], float(score)) for i, score in zip(picked, scores)]
+
+        approx = quantized_scores(q, self.codes[rows], self.scales[rows], self.offsets[rows])
+        if not rerank:
+            picked, scores = top_k(approx, k, threshold=threshold, tie_breakers=[self.importance[rows]])
+            return [(self.ids[rows[i]], float(score)) for i, score in zip(picked, scores)]
+
+        candidates, _ = top_k(approx, k * self.RERANK_FACTOR)
+        rows = rows[candidates]
+        exact = self._exact_scores([self.ids[r] for r in rows], q)
+        picked, scores = top_k(exact, k, threshold=threshold, tie_breakers=[self.importance[rows]])
+        return [(self.ids[rows[i]], float(score)) for i, score in zip(picked, scores)]
+
+    def _exact_scores(self, ids: List[str], q: np.ndarray) -> np.ndarray:
+        """Full-precision scores for a few candidates, read from the Memory table."""
+        space = get_space("memory")
+        rows = Memory.objects.filter(id__in=ids).values_list("id", "embedding", "embedding_space")
+        stored = {str(mid): space.coerce(emb, tag) for mid, emb, tag in rows}  # as when indexed
+        scores = np.full(len(ids), -np.inf, dtype=np.float32)  # deleted since indexing: never picked
+        for i, mid in enumerate(ids):
+            emb = stored.get(mid)
+            if emb is not None and len(emb) == self.dim:
+                scores[i] = normalize(emb) @ q
+        return scores
+
+    # -------------------------
+    # Clustering helpers
+    # -------------------------
+    def _float_rows(self) -> np.ndarray:
+        if self.quantized:
+            return dequantize(self.codes, self.scales, self.offsets)
+        return self.vectors
+
+    def _train(self, vectors: Optional[np.ndarray] = None):
+        """Clusters the rows; quantized indexes train on dequantized rows unless given the originals."""
+        n = len(self)
+        if n <= self.FLAT_LIMIT:
+            self.centroids = None
+            self.assignments = np.zeros(n, dtype=np.int32)
+            self.trained_size = n
+            return
+
+        vectors = self._float_rows() if vectors is None else vectors
+
+        nlist = int(np.clip(np.sqrt(n), self.MIN_LIST_COUNT, self.MAX_LIST_COUNT))
+        rng = np.random.default_rng(self.user_id)
+        centroids = vectors[rng.choice(n, size=nlist, replace=False)].copy()
+
+        for _ in range(self.KMEANS_ITERATIONS):
+            self.centroids = centroids
+            assignments = self._assign(vectors)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            empty = ~np.any(sums, axis=1)
+            sums[empty] = centroids[empty]  # keep empty cells where they were
+            centroids = normalize(sums)
+
+        self.centroids = centroids
+        self.assignments = self._assign(vectors)
+        self.trained_size = n
+
+    def _assign(self, vectors: np.ndarray, batch: int = 4096) -> np.ndarray:
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch):
+            out[start:start + batch] = np.argmax(vectors[start:start + batch] @ self.centroids.T, axis=1)
+        return out
+
+    def _own_arrays(self):
+        for name in ("vectors", "codes", "scales", "offsets", "memory_types", "emotions", "importance", "assignments"):
+            setattr(self, name, getattr(self, name).copy())
+
+    @classmethod
+    def _lock_for(cls, user_id: int):
+        """Cross-process lock (django-redis) so concurrent upserts don't drop each other."""
+        make_lock = getattr(cache, "lock", None)
+        if make_lock is None:
+            return cls._update_lock
+        return make_lock(f"memory_index:{user_id}:lock", timeout=30, blocking_timeout=10)
@@ -2,9 +2,11 @@ from typing import Dict, Any, Optional, List
 from django.db import transaction
 from django.utils import timezone
 from .models import Memory
-import openai
-from django.conf import settings
-import numpy as np
+from .memory_index import MemoryIndex
+from .memory_lsh import MemoryLSH
+from .embedding_spaces import get_space
+from .utils.embedding_utils import generate_embedding
+from .llm_client import get_client
 
 
 class MemoryIngestor:
@@ -17,7 +19,7 @@ class MemoryIngestor:
 
     def __init__(self, user):
         self.user = user
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = get_client("memory_ingest")
 
     # ------------------------
     # Public ingestion method
@@ -43,7 +45,10 @@ class MemoryIngestor:
                 if allow_merge:
                     existing = self._find_similar_memory(embedding)
                     if existing:
-                        stored_memories.append(self._merge(existing, mem, embedding))
+                        merged = self._merge(existing, mem, embedding)
+                        MemoryLSH.index(merged)
+                        MemoryIndex.schedule_upsert(merged)
+                        stored_memories.append(merged)
                         continue
 
                 memory = Memory.objects.create(
@@ -56,7 +61,10 @@ class MemoryIngestor:
                     importance=mem.get("importance", 0.5),
                     context=mem.get("context", {}),
                     embedding=embedding,
+                    embedding_space=get_space("memory").space_id if embedding is not None else "",
                 )
+                MemoryLSH.index(memory)
+                MemoryIndex.schedule_upsert(memory)
                 stored_memories.append(memory)
 
         return stored_memories
@@ -65,21 +73,12 @@ class MemoryIngestor:
     # Helpers
     # ------------------------
     def _embed(self, text: str):
-        response = self.client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text,
-        )
-        return response.data[0].embedding
+        return generate_embedding(text, space="memory")
 
     def _find_similar_memory(self, embedding) -> Optional[Memory]:
-        memories = Memory.objects.filter(user=self.user).exclude(embedding=None)
-
-        for mem in memories:
-            sim = self._cosine_similarity(mem.embedding, embedding)
-            if sim >= self.DUPLICATE_SIM_THRESHOLD:
-                return mem
-
-        return None
+        # LSH bucket lookup, then exact cosine on the candidates only; best match wins
+        match = MemoryLSH.find_duplicate(self.user.id, embedding, self.DUPLICATE_SIM_THRESHOLD)
+        return match[0] if match else None
 
     def _merge(
         self,
@@ -92,14 +91,7 @@ class MemoryIngestor:
         memory.sentiment = new_data.get("sentiment") or memory.sentiment
         memory.importance = max(memory.importance, new_data.get("importance", 0.5))
         memory.context.update(new_data.get("context", {}))
-        memory.embedding = embedding
+        get_space("memory").assign(memory, embedding)
         memory.updated_at = timezone.now()
         memory.save()
         return memory
-
-    @staticmethod
-    def _cosine_similarity(a, b) -> float:
-        a, b = np.array(a), np.array(b)
-        if np.linalg.norm(a) == 0 or np.linalg.norm(b) == 0:
-            return 0.0
-        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
@@ -12,6 +12,8 @@ from .memory_extractor import MemoryExtractor
 from .knowledge_vault_manager import KnowledgeVaultManager
 from .models import KnowledgeVaultEntry  # ensure this exists in your app
 from .embedding_service import EmbeddingService
+from . import similarity
+from .access_tracker import access_tracker
 
 logger = logging.getLogger(__name__)
 
@@ -148,21 +150,20 @@ class MemoryIntegrator:
         if incoming_embedding is None:
             return None
 
-        best_entry = None
-        best_score = 0.0
-
-        for cand in candidates:
-            if not cand.embedding:
-                continue
-
-            score = EmbeddingService.cosine_sim(incoming_embedding, cand.embedding)
-            if score > best_score:
-                best_score = score
-                best_entry = cand
+        embedded = [c for c in candidates if c.embedding is not None and len(c.embedding)]
+        if not embedded:
+            return None
 
-        if best_score >= self.similarity_threshold:  # e.g. 0.85 recommended
-            logger.debug(f"[EmbeddingMatch] Best score={best_score}")
-            return best_entry
+        # e.g. 0.85 threshold recommended
+        picked, scores = similarity.rank(
+            incoming_embedding,
+            [c.embedding for c in embedded],
+            k=1,
+            threshold=self.similarity_threshold,
+        )
+        if len(picked):
+            logger.debug(f"[EmbeddingMatch] Best score={scores[0]}")
+            return embedded[picked[0]]
 
         return None
 
@@ -219,8 +220,8 @@ class MemoryIntegrator:
             entry.save()
             logger.debug("MemoryIntegrator: merged and saved entry id=%s", entry.memory_id)
         else:
-            # still update access time
-            entry.save(update_fields=["last_accessed"])
+            # still update access time (buffered write)
+            access_tracker.touch(KnowledgeVaultEntry, [entry.pk], at=entry.last_accessed)
         return entry
 
     # -------------------------
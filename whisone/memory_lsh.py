@@ -0,0 +1,163 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .embedding_spaces import get_space
+from .models import Memory, MemoryLSHBucket
+from .similarity import normalize, rank
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryLSH:
+    """
+    Persistent near-duplicate index over Memory embeddings.
+
+    Each embedding gets a BANDS x ROWS bit signature from random hyperplanes
+    (bit = which side of the plane the vector lies on; two vectors at angle
+    θ agree on a bit with probability 1 - θ/π). Every band of ROWS bits is
+    stored as one MemoryLSHBucket row, so candidates for a new embedding are
+    the memories sharing at least one (band, bucket) with it: an indexed
+    lookup whose cost depends on the bucket sizes, not on the account size.
+
+    With ROWS=10, BANDS=20 a pair at cosine 0.88 (the ingestor's duplicate
+    threshold) collides in some band ~98% of the time, a pair at 0.5 ~29%.
+    Candidates are ranked by how many bands they share, and only the best
+    MAX_CANDIDATES are verified with exact cosine.
+
+    Hyperplanes are drawn from a fixed seed per embedding space, so every
+    worker computes identical signatures; a space change re-indexes through
+    migrate_embedding_space.
+    """
+
+    BANDS = 20
+    ROWS = 10
+    SEED = 20240611
+    MAX_CANDIDATES = 200
+
+    _planes: Dict[Tuple[str, int], np.ndarray] = {}
+
+    # -------------------------
+    # Signatures
+    # -------------------------
+    @classmethod
+    def planes(cls, space_id: str, dim: int) -> np.ndarray:
+        key = (space_id, dim)
+        if key not in cls._planes:
+            rng = np.random.default_rng([cls.SEED, dim, *space_id.encode()])
+            cls._planes[key] = rng.standard_normal((cls.BANDS * cls.ROWS, dim)).astype(np.float32)
+        return cls._planes[key]
+
+    @classmethod
+    def signatures(cls, vectors, space_id: str) -> np.ndarray:
+        """(n, BANDS) int array of bucket ids, one row per vector."""
+        vectors = normalize(vectors)
+        bits = (vectors @ cls.planes(space_id, vectors.shape[1]).T) >= 0
+        weights = 1 << np.arange(cls.ROWS)
+        return bits.reshape(len(vectors), cls.BANDS, cls.ROWS).astype(np.int64) @ weights
+
+    # -------------------------
+    # Maintenance
+    # -------------------------
+    @classmethod
+    def index(cls, memory: Memory):
+        cls.index_many([memory])
+
+    @classmethod
+    def index_many(cls, memories: Iterable[Memory]) -> int:
+        """(Re)writes the buckets of each memory from its current embedding."""
+        space = get_space("memory")
+        memories = list(memories)
+        rows, vectors = [], []
+        for memory in memories:
+            vector = space.coerce(memory.embedding, memory.embedding_space)
+            if vector is not None and space.accepts(vector):
+                rows.append(memory)
+                vectors.append(vector)
+
+        with transaction.atomic():
+            MemoryLSHBucket.objects.filter(memory__in=[m.pk for m in memories]).delete()
+            if rows:
+                buckets = cls.signatures(np.vstack(vectors), space.space_id)
+                MemoryLSHBucket.objects.bulk_create(
+                    [
+                        MemoryLSHBucket(
+                            user_id=memory.user_id,
+                            memory_id=memory.pk,
+                            space=space.space_id,
+                            band=band,
+                            bucket=int(bucket),
+                        )
+                        for memory, signature in zip(rows, buckets)
+                        for band, bucket in enumerate(signature)
+                    ],
+                    batch_size=2000,
+                )
+        return len(rows)
+
+    # -------------------------
+    # Lookup
+    # -------------------------
+    @classmethod
+    def candidates(cls, user_id: int, embedding) -> List:
+        """Memory ids sharing a bucket with `embedding`, most shared bands first."""
+        space = get_space("memory")
+        signature = cls.signatures(np.asarray(embedding, dtype=np.float32)[None, :], space.space_id)[0]
+        same_bucket = Q()
+        for band, bucket in enumerate(signature):
+            same_bucket |= Q(band=band, bucket=int(bucket))
+
+        return list(
+            MemoryLSHBucket.objects.filter(same_bucket, user_id=user_id, space=space.space_id)
+            .values("memory_id")
+            .annotate(bands=Count("id"))
+            .order_by("-bands")
+            .values_list("memory_id", flat=True)[: cls.MAX_CANDIDATES]
+        )
+
+    @classmethod
+    def find_duplicate(cls, user_id: int, embedding, threshold: float) -> Optional[Tuple[Memory, float]]:
+        """
+        The most similar memory at or above `threshold` among the bucket
+        candidates, with its exact cosine score, or None.
+        """
+        if embedding is None or len(embedding) == 0:
+            return None
+        ids = cls.candidates(user_id, embedding)
+        if not ids:
+            return None
+
+        space = get_space("memory")
+        rows = []
+        for memory in space.active(Memory.objects.filter(user_id=user_id, id__in=ids)):
+            vector = space.coerce(memory.embedding, memory.embedding_space)
+            if vector is not None and len(vector) == len(embedding):
+                rows.append((memory, vector))
+        if not rows:
+            return None
+
+        picked, scores = rank(embedding, [v for _, v in rows], k=1, threshold=threshold)
+        if not len(picked):
+            return None
+        return rows[picked[0]][0], float(scores[0])
+
+    # -------------------------
+    # Backfill
+    # -------------------------
+    @classmethod
+    def rebuild(cls, user_id: Optional[int] = None, batch_size: int = 500) -> int:
+        qs = Memory.objects.exclude(embedding=None).order_by("pk")
+        if user_id is not None:
+            qs = qs.filter(user_id=user_id)
+        indexed, batch = 0, []
+        for memory in qs.iterator(chunk_size=batch_size):
+            batch.append(memory)
+            if len(batch) >= batch_size:
+                indexed += cls.index_many(batch)
+                batch = []
+        if batch:
+            indexed += cls.index_many(batch)
+        return indexed
@@ -1,9 +1,10 @@
 from typing import List, Dict, Any, Optional
 from django.utils import timezone
 from .models import Memory
-import openai
-import numpy as np
-from django.conf import settings
+from .memory_index import MemoryIndex
+from .access_tracker import access_tracker
+from .utils.embedding_utils import generate_embedding
+from .llm_client import get_client
 
 
 class MemoryQueryManager:
@@ -17,7 +18,24 @@ class MemoryQueryManager:
 
     def __init__(self, user):
         self.user = user
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = get_client("memory_query")
+
+    # -------------------------
+    # Semantic warm-up (runs alongside task planning)
+    # -------------------------
+    def prepare_semantic(self, keyword: str):
+        """
+        Loads the user's MemoryIndex and embeds `keyword`, the slow half of a
+        semantic query, so it can run before the task plan is known. Returns
+        the embedding (None when it can't be computed or there is nothing to
+        search).
+        """
+        if not keyword or not len(MemoryIndex.for_user(self.user)):
+            return None
+        try:
+            return generate_embedding(keyword, space="memory")
+        except Exception:
+            return None
 
     # -------------------------
     # Main query method
@@ -33,7 +51,12 @@ class MemoryQueryManager:
         task_plan: Optional[List[Dict[str, Any]]] = None,
         limit: int = 5,
         use_semantic: bool = True,
+        query_embedding=None,
     ) -> List[Dict[str, Any]]:
+        """
+        `query_embedding` may carry the keyword's memory-space embedding when
+        the caller computed it ahead of time (see prepare_semantic).
+        """
 
         # --- Extract memory_types and emotions from task_plan ---
         if task_plan:
@@ -64,47 +87,45 @@ class MemoryQueryManager:
         if time_before:
             memories = memories.filter(created_at__lte=time_before)
 
-        memories = list(memories)
-
         # -------------------------
-        # 2. Semantic search
+        # 2. Semantic search (per-user ANN index, same filters as above)
         # -------------------------
-        if keyword and use_semantic and memories:
-            try:
-                emb = self.client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=keyword,
+        index = MemoryIndex.for_user(self.user) if keyword and use_semantic else None
+
+        if index is not None and len(index):
+            if query_embedding is None:
+                try:
+                    query_embedding = generate_embedding(keyword, space="memory")
+                except Exception:
+                    query_embedding = None
+
+            if query_embedding is not None:
+                hits = index.search(
+                    query_embedding,
+                    k=limit,
+                    threshold=self.SEMANTIC_THRESHOLD,
+                    memory_types=memory_types,
+                    emotions=emotions,
+                    min_importance=min_importance,
+                    time_after=time_after,
+                    time_before=time_before,
                 )
-                query_embedding = emb.data[0].embedding
-            except Exception:
-                query_embedding = None
-
-            if query_embedding:
-                scored = []
-                for mem in memories:
-                    if not mem.embedding:
-                        continue
-                    sim = self._cosine(query_embedding, mem.embedding)
-                    if sim >= self.SEMANTIC_THRESHOLD:
-                        scored.append((sim, mem))
-
-                # Sort by similarity + importance
-                scored.sort(key=lambda x: (x[0], x[1].importance), reverse=True)
-                memories = [m for _, m in scored[:limit]]
+                by_id = {str(m.id): m for m in memories.filter(id__in=[mem_id for mem_id, _ in hits])}
+                memories = [by_id[mem_id] for mem_id, _ in hits if mem_id in by_id]
             else:
-                memories = memories[:limit]
+                memories = list(memories[:limit])
         else:
-            memories = memories[:limit]
+            memories = list(memories[:limit])
 
         # -------------------------
         # 3. Build results
         # -------------------------
         now = timezone.now()
         results = []
+        access_tracker.touch(Memory, [mem.id for mem in memories], at=now)
 
         for mem in memories:
             mem.updated_at = now
-            mem.save(update_fields=["updated_at"])
 
             results.append({
                 "memory_id": str(mem.id),
@@ -119,14 +140,4 @@ class MemoryQueryManager:
                 "updated_at": mem.updated_at.isoformat(),
             })
 
-        return results
-
-    # -------------------------
-    # Utils
-    # -------------------------
-    @staticmethod
-    def _cosine(a, b) -> float:
-        a, b = np.array(a), np.array(b)
-        if np.linalg.norm(a) == 0 or np.linalg.norm(b) == 0:
-            return 0.0
-        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+        return results
\ No newline at end of file
@@ -10,6 +10,7 @@ from .memory_ingestor import MemoryIngestor
 from .natural_resolver import NaturalResolver
 from .services.calendar_service import GoogleCalendarService
 from .memory_querier import MemoryQueryManager
+from .pipeline import Pipeline, StageTimeout
 from assistant.models import AssistantMessage
 from .models import Integration
 from whatsapp.tasks import send_whatsapp_text
@@ -66,11 +67,31 @@ def handle_memory(user_id: int, message: str):
 
 
 
+# Seconds a process_user_message stage may run before its fallback is used
+# (stages without a fallback fail the reply). A stage's LLM calls and the
+# frames it executes are cut short at its deadline (see whisone.pipeline).
+STAGE_TIMEOUTS = {
+    "setup": 15,
+    "plan": 45,
+    "memory_prep": 15,
+    "frames": 30,
+    "execute": 90,
+    "memory": 15,
+    "respond": 45,
+}
+
+
 @shared_task
 def process_user_message(user_id: int, message: str, whatsapp_mode: bool = False) -> str:
     """
     Main user message processing.
     Memory ingestion is handled asynchronously.
+
+    The reply is built by a dependency graph (whisone.pipeline): task
+    planning, calendar/resolver setup and the memory warm-up (index load and
+    query embedding) run concurrently; frames, execution and the filtered
+    memory query start as soon as their inputs are ready; the response waits
+    for all of them.
     """
     try:
         user = User.objects.get(id=user_id)
@@ -78,58 +99,102 @@ def process_user_message(user_id: int, message: str, whatsapp_mode: bool = False
         print(f"[process_user_message] User {user_id} not found.")
         return
 
-    # --- Calendar & Resolver Setup ---
-    integration = Integration.objects.filter(user=user, provider="gmail").first()
-    google_creds = {
-        "client_id": settings.GMAIL_CLIENT_ID,
-        "client_secret": settings.GMAIL_CLIENT_SECRET,
-        "refresh_token": integration.refresh_token if integration else None,
-        "access_token": integration.access_token if integration else None,
-    }
-    calendar_service = GoogleCalendarService(**google_creds)
-    resolver = NaturalResolver(user=user, api_key=settings.OPENAI_API_KEY, calendar_service=calendar_service)
-
     # --- Trigger async memory ingestion ---
     handle_memory.delay(user_id=user.id, message=message)
 
+    # Shared by the executor and the memory stages
+    querier = MemoryQueryManager(user=user)
+
+    # --- Calendar & Resolver Setup ---
+    def setup():
+        integration = Integration.objects.filter(user=user, provider="gmail").first()
+        google_creds = {
+            "client_id": settings.GMAIL_CLIENT_ID,
+            "client_secret": settings.GMAIL_CLIENT_SECRET,
+            "refresh_token": integration.refresh_token if integration else None,
+            "access_token": integration.access_token if integration else None,
+        }
+        calendar_service = GoogleCalendarService(**google_creds)
+        resolver = NaturalResolver(user=user, api_key=settings.OPENAI_API_KEY, calendar_service=calendar_service)
+        return {"google_creds": google_creds, "calendar_service": calendar_service, "resolver": resolver}
+
     # --- Task Planning & Frame Building ---
-    planner = TaskPlanner(api_key=settings.OPENAI_API_KEY)
-    raw_task_plan = planner.plan_tasks(user=user, user_message=message)
-    print("[process_user_message] Planned tasks:", raw_task_plan)
-
-    frame_builder = TaskFrameBuilder(user=user, resolver=resolver, calendar_service=calendar_service)
-    task_frames = [
-        frame_builder.build(
-            intent=step.get("intent", ""),
-            action=step.get("action"),
-            parameters=step.get("params", {})
-        )
-        for step in raw_task_plan
-    ]
-    ready_tasks = [tf for tf in task_frames if tf["ready"]]
-    skipped_tasks = [tf for tf in task_frames if not tf["ready"]]
+    def plan():
+        planner = TaskPlanner(api_key=settings.OPENAI_API_KEY)
+        raw_task_plan = planner.plan_tasks(user=user, user_message=message)
+        print("[process_user_message] Planned tasks:", raw_task_plan)
+        return raw_task_plan
+
+    def frames(setup, plan):
+        frame_builder = TaskFrameBuilder(user=user, resolver=setup["resolver"], calendar_service=setup["calendar_service"])
+        return [
+            frame_builder.build(
+                intent=step.get("intent", ""),
+                action=step.get("action"),
+                parameters=step.get("params", {})
+            )
+            for step in plan
+        ]
 
     # --- Execute Tasks ---
-    executor = Executor(user=user, gmail_creds=google_creds, calendar_creds=google_creds)
-    executor_results = executor.execute_task_frames(ready_tasks)
+    def execute(setup, frames):
+        ready_tasks = [tf for tf in frames if tf["ready"]]
+        executor = Executor(
+            user=user, gmail_creds=setup["google_creds"], calendar_creds=setup["google_creds"], vault_manager=querier
+        )
+        return executor.execute_task_frames(ready_tasks)
+
+    # --- Query Memory (embedding computed while the planner runs) ---
+    def memory(plan, memory_prep):
+        return querier.query(
+            keyword=message,
+            task_plan=plan,  # Pass the planned tasks
+            limit=5,
+            query_embedding=memory_prep,
+        )
 
-    # --- Query Memory (can now include already ingested memories) ---
-    querier = MemoryQueryManager(user=user)
-    kv_context = querier.query(
-    keyword=message,
-    task_plan=raw_task_plan,  # Pass the planned tasks
-    limit=5
-)
+    # Timed out (or failed): report every ready frame as unconfirmed
+    def execute_unfinished(frames=(), **_):
+        ready_tasks = [tf for tf in frames if tf["ready"]]
+        return Executor.timed_out_results(ready_tasks, StageTimeout(
+            f"Not finished within {STAGE_TIMEOUTS['execute']}s; the action may still complete"
+        ))
 
     # --- Generate Response ---
-    response_gen = ResponseGenerator(api_key=settings.OPENAI_API_KEY)
-    response_text = response_gen.generate_response(
-        user=user,
-        user_message=message,
-        executor_results=executor_results,
-        vault_context=kv_context,
-        missing_fields=[tf.get("missing_fields") for tf in skipped_tasks if tf.get("missing_fields")]
+    def respond(frames, execute, memory):
+        skipped_tasks = [tf for tf in frames if not tf["ready"]]
+        response_gen = ResponseGenerator(api_key=settings.OPENAI_API_KEY)
+        return response_gen.generate_response(
+            user=user,
+            user_message=message,
+            executor_results=execute,
+            vault_context=memory,
+            missing_fields=[tf.get("missing_fields") for tf in skipped_tasks if tf.get("missing_fields")]
+        )
+
+    # Timed out (or failed): a plain reply from the execution results
+    def respond_unfinished(execute=(), **_):
+        done = [r["intent"] for r in execute or () if r.get("success")]
+        unfinished = [r["intent"] for r in execute or () if not r.get("success")]
+        lines = ["Sorry, I couldn't put together a full reply in time."]
+        if done:
+            lines.append("Done: " + "; ".join(done))
+        if unfinished:
+            lines.append("Not confirmed: " + "; ".join(unfinished))
+        return "\n".join(lines)
+
+    pipeline = (
+        Pipeline(name="process_user_message", max_workers=4)
+        .stage("setup", setup, timeout=STAGE_TIMEOUTS["setup"])
+        .stage("plan", plan, timeout=STAGE_TIMEOUTS["plan"])
+        .stage("memory_prep", lambda: querier.prepare_semantic(message), timeout=STAGE_TIMEOUTS["memory_prep"], fallback=None)
+        .stage("frames", frames, after=["setup", "plan"], timeout=STAGE_TIMEOUTS["frames"])
+        .stage("execute", execute, after=["setup", "frames"], timeout=STAGE_TIMEOUTS["execute"], fallback=execute_unfinished)
+        .stage("memory", memory, after=["plan", "memory_prep"], timeout=STAGE_TIMEOUTS["memory"], fallback=lambda **_: [])
+        .stage("respond", respond, after=["frames", "execute", "memory"], timeout=STAGE_TIMEOUTS["respond"],
+               fallback=respond_unfinished)
     )
+    response_text = pipeline.run()["respond"]
 
     # --- Save Assistant Response ---
     AssistantMessage.objects.create(
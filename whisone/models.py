@@ -1,17 +1,26 @@
 from django.db import models
 from django.conf import settings
 
+from .fields import VectorField
+
 
 # -----------------------------
 # 1. Reminder
 # -----------------------------
 
 class BaseModel(models.Model):
-    embedding = models.JSONField(
+    embedding = VectorField(
         blank=True,
         null=True,
         help_text="Vector embedding for semantic search."
     )
+    embedding_space = models.CharField(
+        max_length=100,
+        blank=True,
+        default="",
+        db_index=True,
+        help_text="Id of the embedding space (model:dimensions:normalization) that produced the embedding."
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -187,7 +196,8 @@ class Memory(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    embedding = models.JSONField(blank=True, null=True)  # AI embedding of the content
+    embedding = VectorField(blank=True, null=True)  # AI embedding of the content
+    embedding_space = models.CharField(max_length=100, blank=True, default="", db_index=True)
 
     def __str__(self):
         return f"{self.memory_type} | {self.summary[:50]}"
@@ -201,6 +211,10 @@ def user_upload_path(instance, filename):
     # Files will be uploaded to MEDIA_ROOT/user_<id>/<filename>
     return f"user_{instance.user.id}/{filename}"
 
+def vector_upload_path(instance, filename):
+    # Chunk vector matrices live next to the uploads: MEDIA_ROOT/user_<id>/vectors/<filename>
+    return f"user_{instance.user.id}/vectors/{filename}"
+
 class UploadedFile(models.Model):
     FILE_TYPES = (
         ('pdf', 'PDF'),
@@ -224,7 +238,10 @@ class UploadedFile(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     processed = models.BooleanField(default=False)  # whether text has been extracted
     content = models.TextField(blank=True, null=True)  # extracted text from the file
-    embedding = models.JSONField(blank=True, null=True)  # AI embedding of the content
+    embedding = VectorField(multi=True, blank=True, null=True)  # legacy: one row per content chunk
+    embedding_space = models.CharField(max_length=100, blank=True, default="", db_index=True)
+    vector_file = models.FileField(upload_to=vector_upload_path, blank=True, null=True)  # .npy, row i = FileChunk index i
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)  # sha256 of the uploaded bytes
 
     def save(self, *args, **kwargs):
         # Capture original filename and size
@@ -250,3 +267,165 @@ class UploadedFile(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {self.original_filename}"
+
+
+class FileChunk(models.Model):
+    """
+    One embedded chunk of an UploadedFile. `start_char` / `end_char` are
+    offsets into UploadedFile.content; the chunk's vector is row `index` of
+    the file's vector_file.
+    """
+    file = models.ForeignKey(UploadedFile, on_delete=models.CASCADE, related_name="chunks")
+    index = models.PositiveIntegerField()
+    page_num = models.PositiveIntegerField(default=1)
+    start_char = models.PositiveIntegerField()
+    end_char = models.PositiveIntegerField()
+    text = models.TextField()
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)  # sha256 of the normalized text
+
+    class Meta:
+        unique_together = ("file", "index")
+        ordering = ["file", "index"]
+
+    def __str__(self):
+        return f"{self.file_id}#{self.index} (p.{self.page_num})"
+
+
+class FileProcessingJob(models.Model):
+    """
+    Extraction progress of an UploadedFile. Extracted page windows are
+    recorded as they are written to the blob store, so a dispatcher that
+    dies mid-file resumes after `last_page` instead of re-parsing it.
+    """
+    STATUS_CHOICES = [
+        ("extracting", "Extracting"),
+        ("embedding", "Embedding"),
+        ("done", "Done"),
+    ]
+
+    file = models.OneToOneField(UploadedFile, on_delete=models.CASCADE, related_name="processing_job")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="extracting")
+    last_page = models.PositiveIntegerField(default=0)  # last page written to a window
+    windows = models.JSONField(default=list, blank=True)  # [{"ref", "first_page", "last_page"}]
+    error = models.TextField(blank=True, default="")  # last dispatcher error; the next run resumes
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.file_id}: {self.status} (page {self.last_page})"
+
+
+
+class EmbeddingMigration(models.Model):
+    """
+    Progress of moving one table's vectors into an embedding space.
+    One row per (target space id, table); the re-embed pipeline resumes
+    from last_pk.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    space = models.CharField(max_length=50)  # space name, e.g. "memory"
+    space_id = models.CharField(max_length=100)  # target space id
+    table = models.CharField(max_length=100)  # app_label.Model
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    last_pk = models.CharField(max_length=64, blank=True, default="")
+    processed = models.PositiveIntegerField(default=0)  # stale rows examined
+    updated = models.PositiveIntegerField(default=0)  # rows rewritten
+    reembedded = models.PositiveIntegerField(default=0)  # rows that needed an API call
+    error = models.TextField(blank=True, default="")
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("space_id", "table")
+
+    def __str__(self):
+        return f"{self.table} → {self.space_id} ({self.status})"
+
+
+
+# -----------------------------
+# Search index (BM25 postings for Notes, Reminders, Todos)
+# -----------------------------
+class SearchDocument(models.Model):
+    """
+    One indexed Note / Reminder / Todo. `length` is its token count,
+    used for BM25 length normalization.
+    """
+    DOC_TYPES = [
+        ("note", "Note"),
+        ("reminder", "Reminder"),
+        ("todo", "Todo"),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="search_documents")
+    doc_type = models.CharField(max_length=20, choices=DOC_TYPES)
+    doc_id = models.BigIntegerField()
+    length = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("doc_type", "doc_id")
+        indexes = [models.Index(fields=["user", "doc_type"])]
+
+
+class SearchPosting(models.Model):
+    """
+    Inverted index entry: `term` occurs `tf` times in one document.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="search_postings")
+    term = models.CharField(max_length=64, db_index=True)  # also gets a LIKE 'prefix%' index on Postgres
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name="postings")
+    tf = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "term"])]
+
+
+# -----------------------------
+# Near-duplicate index (random-hyperplane LSH over Memory embeddings)
+# -----------------------------
+class MemoryLSHBucket(models.Model):
+    """
+    One band of a memory's LSH signature: the memory falls in `bucket` of
+    `band`. Memories sharing any (band, bucket) are near-duplicate candidates.
+    `space` is the embedding space id the signature was computed in.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="memory_lsh_buckets")
+    memory = models.ForeignKey(Memory, on_delete=models.CASCADE, related_name="lsh_buckets")
+    space = models.CharField(max_length=100)
+    band = models.PositiveSmallIntegerField()
+    bucket = models.IntegerField()
+
+    class Meta:
+        unique_together = ("memory", "band")
+        indexes = [models.Index(fields=["user", "space", "band", "bucket"])]
+
+
+# -----------------------------
+# Task planner log (training data for the local intent classifier)
+# -----------------------------
+class PlannerLog(models.Model):
+    """
+    A message and the raw actions planned for it. Plans made by the LLM are
+    what `manage.py train_intent_classifier` learns from; fast-path plans are
+    kept so the classifier's hit rate can be watched.
+    """
+    SOURCES = [("llm", "LLM"), ("fast_path", "Fast path")]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="planner_logs")
+    message = models.TextField()
+    actions = models.JSONField(default=list, blank=True)
+    source = models.CharField(max_length=20, choices=SOURCES, default="llm")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["source", "created_at"])]
+
+    def __str__(self):
+        return f"{self.source}: {self.message[:50]}"
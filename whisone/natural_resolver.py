@@ -1,8 +1,11 @@
 from datetime import datetime
 from typing import List, Optional, Dict, Any, Union
-import numpy as np
 import dateparser
-from openai import OpenAI
+
+from . import similarity
+from .embedding_spaces import get_space
+from .llm_client import get_client
+from .utils.embedding_utils import generate_embedding
 
 
 class NaturalResolver:
@@ -22,16 +25,14 @@ class NaturalResolver:
         api_key: str,
         calendar_service=None,
         generate_event_embeddings: bool = True,
-        embedding_model: str = "text-embedding-3-small",
+        embedding_space: str = "items",
     ):
         self.user = user
-        self.client = OpenAI(api_key=api_key)
+        self.client = get_client("resolver", api_key)
         self.calendar_service = calendar_service
         self.generate_event_embeddings = generate_event_embeddings
-        self.embedding_model = embedding_model
+        self.embedding_space = embedding_space
 
-        # Cache embeddings per session to avoid re-computing
-        self._embedding_cache = {}
 
     def resolve(self, item_type: str, natural_query: str) -> Optional[Dict[str, Any]]:
         """
@@ -47,16 +48,16 @@ class NaturalResolver:
         if not items:
             return None
 
-        # Pre-compute embeddings (with cache)
+        # Pre-compute embeddings (served from the shared embedding cache)
         for item in items:
             text = self._extract_text(item)
-            if text and text not in self._embedding_cache:
+            embedding = None
+            if text:
                 try:
-                    self._embedding_cache[text] = self._embed(text)
+                    embedding = self._embed(text)
                 except Exception as e:
                     print(f"Embedding failed for text: {text[:50]}... | Error: {e}")
-                    self._embedding_cache[text] = None
-            item.embedding = self._embedding_cache.get(text)
+            item.embedding = embedding
 
         # Phase 1: Fast filters (exact-ish)
         candidates = self._keyword_filter(items, query)
@@ -182,19 +183,20 @@ class NaturalResolver:
         except Exception:
             return None
 
-        scores = []
-        for item in items:
-            if not hasattr(item, "embedding") or item.embedding is None:
-                continue
-            sim = self._cosine(query_emb, item.embedding)
-            if sim > 0.65:  # strong match
-                scores.append((sim, item))
+        embedded = [item for item in items if getattr(item, "embedding", None) is not None]
+        if not embedded:
+            return None
 
-        if not scores:
+        picked, scores = similarity.rank(
+            query_emb,
+            [item.embedding for item in embedded],
+            k=1,
+            threshold=0.65,  # strong match
+        )
+        if not len(picked):
             return None
 
-        scores.sort(key=lambda x: x[0], reverse=True)
-        best_sim, best_item = scores[0]
+        best_item, best_sim = embedded[picked[0]], float(scores[0])
         return self._pack(best_item, confidence=round(best_sim, 3), source="semantic")
 
     # ===========================
@@ -202,12 +204,8 @@ class NaturalResolver:
     # ===========================
     def _embed(self, text: str) -> List[float]:
         if not text.strip():
-            return [0.0] * 1536
-        resp = self.client.embeddings.create(
-            model=self.embedding_model,
-            input=text[:8000]  # avoid token limit
-        )
-        return resp.data[0].embedding
+            return [0.0] * get_space(self.embedding_space).dimensions
+        return generate_embedding(text[:8000], space=self.embedding_space)  # avoid token limit
 
     def _extract_text(self, item) -> str:
         if hasattr(item, "summary"):  # EventWrapper
@@ -223,15 +221,6 @@ class NaturalResolver:
             return item.title or ""
         return ""
 
-    def _cosine(self, a: List[float], b: List[float]) -> float:
-        a_np = np.array(a)
-        b_np = np.array(b)
-        norm_a = np.linalg.norm(a_np)
-        norm_b = np.linalg.norm(b_np)
-        if norm_a == 0 or norm_b == 0:
-            return 0.0
-        return float(np.dot(a_np, b_np) / (norm_a * norm_b))
-
     def _pack(self, item, confidence: float, source: str = "unknown") -> Dict[str, Any]:
         if hasattr(item, "gcal_id"):  # Google Calendar event
             return {
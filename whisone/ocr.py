@@ -0,0 +1,150 @@
+"""
+OCR for image uploads and PDF pages without a text layer.
+
+Pages are rasterized in the calling process and recognized by tesseract in
+a bounded worker pool, a few pages ahead of the consumer, with a per-page
+timeout. Images are downscaled and binarized before recognition, which
+makes tesseract several times faster on phone photos and 300+ dpi scans
+with no loss on body text.
+
+Results are cached per file content hash and page number, so reprocessing
+a file (or resuming an interrupted run) never OCRs a page twice.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+MAX_SIDE = 2500  # px; longer sides are downscaled before recognition
+RASTER_DPI = 200  # PDF pages are rendered at this resolution
+BINARIZE_THRESHOLD = 160  # after autocontrast, 0-255
+
+
+def preprocess(image: Image.Image) -> Image.Image:
+    """Grayscale, downscale to MAX_SIDE, stretch contrast and binarize."""
+    image = ImageOps.exif_transpose(image).convert("L")
+    if max(image.size) > MAX_SIDE:
+        image.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+    image = ImageOps.autocontrast(image)
+    return image.point(lambda p: 255 if p > BINARIZE_THRESHOLD else 0, mode="1")
+
+
+def recognize(image_bytes: bytes, timeout: int) -> str:
+    """Runs in a pool worker: decode, preprocess and OCR one image."""
+    import pytesseract
+
+    image = preprocess(Image.open(io.BytesIO(image_bytes)))
+    return pytesseract.image_to_string(image, timeout=timeout)
+
+
+class OCREngine:
+    """
+    Bounded pool running `recognize` off the calling thread.
+
+    A process pool is used where the caller may fork. Celery's prefork
+    children are daemonic and cannot, so there the pool is threads; the
+    recognition itself still runs in tesseract's own subprocess, outside
+    the GIL.
+    """
+
+    CACHE_KEY = "ocr:{digest}:{page}"
+    CACHE_TTL = 60 * 60 * 24 * 30  # 30 days
+
+    def __init__(self):
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self) -> int:
+        return settings.OCR_MAX_WORKERS
+
+    @property
+    def timeout(self) -> int:
+        return settings.OCR_PAGE_TIMEOUT
+
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if multiprocessing.current_process().daemon:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+                else:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def ocr_image(self, path: str) -> str:
+        """Text of an image file."""
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        return next(self.ocr_pages(digest, [("", 1, lambda: data)]))[0]
+
+    def ocr_pages(
+        self, digest: str, pages: Iterable[Tuple[str, int, Optional[Callable[[], bytes]]]]
+    ) -> Iterator[Tuple[str, int]]:
+        """
+        Fills in the text of pages that have none.
+
+        `pages` yields (text, page_num, render) where `render` is None when
+        the page has a text layer, else a callable returning the page image
+        as encoded bytes (only called on a cache miss). Yields (text,
+        page_num) in input order; up to 2 x workers pages are recognized
+        ahead of the consumer. A page that fails or times out yields "".
+        """
+        pending = deque()
+        for text, page_num, render in pages:
+            if render is None:
+                pending.append((text, page_num, None))
+            else:
+                key = self.CACHE_KEY.format(digest=digest, page=page_num)
+                cached = cache.get(key)
+                if cached is not None:
+                    pending.append((cached, page_num, None))
+                else:
+                    future = self.executor().submit(recognize, render(), self.timeout)
+                    pending.append((key, page_num, future))
+
+            while pending and (pending[0][2] is None or len(pending) > 2 * self.workers):
+                yield self._resolve(*pending.popleft())
+
+        while pending:
+            yield self._resolve(*pending.popleft())
+
+    def _resolve(self, text_or_key: str, page_num: int, future) -> Tuple[str, int]:
+        if future is None:
+            return text_or_key, page_num
+        try:
+            text = future.result(timeout=self.timeout + 5)
+        except FutureTimeout:
+            future.cancel()
+            logger.warning("OCR: page %s timed out after %ss", page_num, self.timeout)
+            return "", page_num
+        except Exception as e:
+            logger.warning("OCR: page %s failed: %s", page_num, e)
+            return "", page_num
+        cache.set(text_or_key, text, self.CACHE_TTL)
+        return text, page_num
+
+
+def render_pdf_page(page, resolution: int = RASTER_DPI) -> bytes:
+    """PNG bytes of a pdfplumber page, rendered no larger than MAX_SIDE."""
+    resolution = min(resolution, MAX_SIDE * 72 / max(page.width, page.height))
+    buffer = io.BytesIO()
+    page.to_image(resolution=resolution).original.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+ocr_engine = OCREngine()
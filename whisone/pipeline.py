@@ -0,0 +1,179 @@
+"""
+A small dependency-graph runner for request pipelines.
+
+Stages are functions that take the results of the stages they depend on
+as keyword arguments. `Pipeline.run` starts every stage as soon as its
+dependencies have finished, on a thread pool private to the run, so
+independent I/O (LLM calls, embedding calls, Google APIs) overlaps.
+
+Each stage may have a timeout, counted from when a worker picks the stage
+up (not from when it is queued). A stage that fails or runs past its
+timeout resolves to its fallback when it has one (a callable fallback is
+called with the stage's available inputs); otherwise the run is cancelled
+(stages not yet started never start) and the error is raised. Errors
+resolved by a fallback are kept in `Pipeline.errors`.
+
+A stage runs with its deadline set for its thread (`current_deadline()`):
+the shared LLM client (whisone.llm_client) cuts its requests and retries
+short at that deadline, and a pipeline run inside a stage never lets its
+own stages outlive it. A stage whose deadline passes before a worker
+picks it up is never started.
+
+A timed-out stage's thread cannot be interrupted otherwise: work that
+doesn't check the deadline finishes in the background and its result is
+discarded. Stages that depend on it, directly or not, are therefore never
+started; they fail with StageSkipped so they don't run alongside the
+predecessor they were ordered after.
+"""
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_RAISE = object()
+_deadline: ContextVar[Optional[float]] = ContextVar("pipeline_deadline", default=None)
+
+
+def current_deadline() -> Optional[float]:
+    """time.monotonic() by which the running stage must finish, or None."""
+    return _deadline.get()
+
+
+class StageTimeout(TimeoutError):
+    pass
+
+
+class StageSkipped(StageTimeout):
+    """A stage not run because a stage it depends on timed out."""
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[..., Any]
+    after: Sequence[str] = ()
+    timeout: Optional[float] = None  # seconds
+    fallback: Any = _RAISE
+    started_at: float = field(default=0.0, repr=False)
+    deadline: Optional[float] = field(default=None, repr=False)
+
+
+class Pipeline:
+    def __init__(self, name: str = "pipeline", max_workers: int = 4):
+        self.name = name
+        self.max_workers = max_workers
+        self.stages: Dict[str, Stage] = {}
+        self.errors: Dict[str, Exception] = {}
+
+    def stage(self, name: str, fn: Callable[..., Any], after: Sequence[str] = (),
+              timeout: Optional[float] = None, fallback: Any = _RAISE) -> "Pipeline":
+        """Adds a stage; `fn` is called with the results of `after` as keyword arguments."""
+        missing = [dep for dep in after if dep not in self.stages]
+        if missing:
+            raise ValueError(f"{self.name}: stage {name} depends on unknown stages {missing}")
+        self.stages[name] = Stage(name, fn, tuple(after), timeout, fallback)
+        return self
+
+    def run(self, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Runs every stage; returns {stage name: result}. No stage runs past
+        `deadline` (a time.monotonic() value) or the deadline of the stage
+        this run is nested in.
+        """
+        inherited = current_deadline()
+        if inherited is not None:
+            deadline = inherited if deadline is None else min(deadline, inherited)
+        results: Dict[str, Any] = {}
+        self.errors = {}
+        abandoned: Dict[str, str] = {}  # timed out (maybe still running) or skipped -> the stage that timed out
+        pending = dict(self.stages)
+        running = {}  # future -> Stage
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        try:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    blocked_by = next((dep for dep in stage.after if dep in abandoned), None)
+                    if blocked_by is not None:
+                        del pending[name]
+                        abandoned[name] = abandoned[blocked_by]
+                        results[name] = self._fail(stage, StageSkipped(
+                            f"{self.name}: stage {name} skipped, it runs after stage {abandoned[name]} which timed out"
+                        ), self._inputs(stage, results))
+                    elif all(dep in results for dep in stage.after):
+                        del pending[name]
+                        stage.started_at, stage.deadline = 0.0, None  # set by the worker that runs it
+                        running[pool.submit(self._call, stage, self._inputs(stage, results), deadline)] = stage
+
+                wait_for = self._next_wakeup(running.values(), deadline)
+                done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        results[stage.name] = future.result()
+                    except Exception as e:
+                        results[stage.name] = self._fail(stage, e, self._inputs(stage, results))
+
+                now = time.monotonic()
+                for future, stage in list(running.items()):
+                    stage_deadline = stage.deadline if stage.started_at else deadline
+                    if stage_deadline is not None and now >= stage_deadline:
+                        running.pop(future)
+                        future.cancel()  # not started yet: it never will be
+                        abandoned[stage.name] = stage.name
+                        results[stage.name] = self._fail(stage, StageTimeout(
+                            f"{self.name}: stage {stage.name} timed out after {now - stage.started_at:.1f}s"
+                            if stage.started_at else f"{self.name}: stage {stage.name} not started before the deadline"
+                        ), self._inputs(stage, results))
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        return results
+
+    @staticmethod
+    def _next_wakeup(running, deadline: Optional[float]) -> Optional[float]:
+        """Seconds until the first running stage may time out. Queued stages
+        haven't started their clock yet; their timeout caps the wait so the
+        loop wakes to pick up their real deadline once they start."""
+        now = time.monotonic()
+        waits = [deadline - now] if deadline is not None else []
+        for stage in running:
+            if stage.started_at:
+                if stage.deadline is not None:
+                    waits.append(stage.deadline - now)
+            elif stage.timeout is not None:
+                waits.append(stage.timeout)
+        return max(0.0, min(waits)) if waits else None
+
+    @staticmethod
+    def _inputs(stage: Stage, results: Dict[str, Any]) -> Dict[str, Any]:
+        return {dep: results[dep] for dep in stage.after if dep in results}
+
+    def _fail(self, stage: Stage, error: Exception, inputs: Dict[str, Any]):
+        if stage.fallback is _RAISE:
+            raise error
+        self.errors[stage.name] = error
+        logger.warning("%s: stage %s failed (%s), using fallback", self.name, stage.name, error)
+        return stage.fallback(**inputs) if callable(stage.fallback) else stage.fallback
+
+    @staticmethod
+    def _call(stage: Stage, kwargs: Dict[str, Any], run_deadline: Optional[float]):
+        now = time.monotonic()
+        deadline = run_deadline
+        if stage.timeout is not None:
+            deadline = now + stage.timeout if deadline is None else min(deadline, now + stage.timeout)
+        stage.deadline = deadline
+        stage.started_at = now  # after the deadline: the run loop reads them in this order
+        if deadline is not None and now >= deadline:
+            raise StageTimeout(f"stage {stage.name} not started before the deadline")
+        token = _deadline.set(deadline)
+        try:
+            return stage.fn(**kwargs)
+        finally:
+            _deadline.reset(token)
+            connection.close()  # pool threads don't outlive the run; neither should their DB connections
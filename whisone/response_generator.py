@@ -1,10 +1,10 @@
 from typing import List, Dict, Any
 import json
-import openai
 import re
 import logging
 from django.contrib.auth import get_user_model
 from assistant.models import AssistantMessage
+from .llm_client import get_client
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -25,7 +25,7 @@ class ResponseGenerator:
     """
 
     def __init__(self, api_key: str, model: str = "gpt-4o-mini", history_limit: int = 3):
-        self.client = openai.OpenAI(api_key=api_key)
+        self.client = get_client("response", api_key)
         self.model = model
         self.history_limit = history_limit
 
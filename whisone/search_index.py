@@ -0,0 +1,223 @@
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Avg, Count
+
+from .embedding_spaces import get_space
+from .models import Note, Reminder, SearchDocument, SearchPosting, Todo
+from .similarity import rank
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# doc_type -> (model, text fields indexed)
+DOCUMENT_TYPES = {
+    "note": (Note, ("title", "content")),
+    "reminder": (Reminder, ("text",)),
+    "todo": (Todo, ("task",)),
+}
+
+Hit = Tuple[str, int, float]  # (doc_type, doc_id, score)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, clipped to the posting term length."""
+    return [t[: SearchIndex.MAX_TERM_LENGTH] for t in TOKEN_RE.findall((text or "").lower())]
+
+
+def doc_type_of(instance) -> Optional[str]:
+    for doc_type, (model, _) in DOCUMENT_TYPES.items():
+        if isinstance(instance, model):
+            return doc_type
+    return None
+
+
+class SearchIndex:
+    """
+    Per-user inverted index over Notes, Reminders and Todos.
+
+    Each document is stored once in SearchDocument (with its token count) and
+    once per distinct term in SearchPosting (with the term frequency), so a
+    search reads only the postings of the query terms instead of scanning
+    every row the user owns. Documents are (re)indexed by the post_save /
+    post_delete signals.
+
+    Ranking is Okapi BM25 over the user's whole corpus. The last query token
+    is also matched as a prefix (search-as-you-type), unless the query ends in
+    whitespace. `hybrid` fuses the BM25 ranking with a semantic ranking over
+    the items embedding space using reciprocal rank fusion.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    RRF_K = 60  # reciprocal rank fusion constant
+    MAX_TERM_LENGTH = 64
+    MIN_PREFIX_LENGTH = 2
+    MAX_PREFIX_EXPANSIONS = 50
+    CANDIDATES = 50  # per ranking fed into the fusion
+
+    # -------------------------
+    # Maintenance
+    # -------------------------
+    @classmethod
+    def index(cls, instance):
+        """Replaces the postings of one Note / Reminder / Todo."""
+        doc_type = doc_type_of(instance)
+        if doc_type is None:
+            return
+        _, fields = DOCUMENT_TYPES[doc_type]
+        tokens = tokenize(" ".join(getattr(instance, f) or "" for f in fields))
+        counts = Counter(tokens)
+
+        with transaction.atomic():
+            document, _ = SearchDocument.objects.update_or_create(
+                doc_type=doc_type,
+                doc_id=instance.pk,
+                defaults={"user_id": instance.user_id, "length": len(tokens)},
+            )
+            document.postings.all().delete()
+            SearchPosting.objects.bulk_create(
+                [
+                    SearchPosting(user_id=instance.user_id, term=term, document=document, tf=tf)
+                    for term, tf in counts.items()
+                ]
+            )
+
+    @classmethod
+    def remove(cls, instance):
+        doc_type = doc_type_of(instance)
+        if doc_type is not None:
+            SearchDocument.objects.filter(doc_type=doc_type, doc_id=instance.pk).delete()
+
+    # -------------------------
+    # Lexical search (BM25)
+    # -------------------------
+    @classmethod
+    def search(cls, user_id: int, query: str, limit: int = 10, doc_types: Sequence[str] = ()) -> List[Hit]:
+        """Returns up to `limit` (doc_type, doc_id, score) hits, best first."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        # One query "slot" per token; the last one may expand to several terms.
+        slots = [[t] for t in terms]
+        if not query[-1].isspace() and len(terms[-1]) >= cls.MIN_PREFIX_LENGTH:
+            expansions = list(
+                SearchPosting.objects.filter(user_id=user_id, term__startswith=terms[-1])
+                .values_list("term", flat=True)
+                .distinct()
+                .order_by("term")[: cls.MAX_PREFIX_EXPANSIONS]
+            )
+            slots[-1] = sorted(set(expansions) | {terms[-1]})
+
+        wanted = {t for slot in slots for t in slot}
+        postings = SearchPosting.objects.filter(user_id=user_id, term__in=wanted)
+        if doc_types:
+            postings = postings.filter(document__doc_type__in=doc_types)
+        rows = list(
+            postings.values_list("term", "tf", "document__doc_type", "document__doc_id", "document__length")
+        )
+        if not rows:
+            return []
+
+        corpus = SearchDocument.objects.filter(user_id=user_id)
+        if doc_types:
+            corpus = corpus.filter(doc_type__in=doc_types)
+        stats = corpus.aggregate(n=Count("id"), avgdl=Avg("length"))
+        n, avgdl = stats["n"] or 0, stats["avgdl"] or 1.0
+
+        df = Counter(term for term, *_ in rows)
+        by_term = defaultdict(list)
+        for term, tf, doc_type, doc_id, length in rows:
+            by_term[term].append(((doc_type, doc_id), tf, length))
+
+        scores: Dict[Tuple[str, int], float] = defaultdict(float)
+        for slot in slots:
+            # A document scores its best-matching term per slot, so a prefix
+            # that expands to many terms doesn't outweigh the other tokens.
+            best: Dict[Tuple[str, int], float] = {}
+            for term in slot:
+                idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                for key, tf, length in by_term.get(term, ()):
+                    norm = tf + cls.K1 * (1 - cls.B + cls.B * length / avgdl)
+                    score = idf * tf * (cls.K1 + 1) / norm
+                    if score > best.get(key, 0.0):
+                        best[key] = score
+            for key, score in best.items():
+                scores[key] += score
+
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+        return [(doc_type, doc_id, score) for (doc_type, doc_id), score in ranked]
+
+    # -------------------------
+    # Hybrid search (BM25 + embeddings, RRF)
+    # -------------------------
+    @classmethod
+    def semantic(cls, user_id: int, query_embedding, limit: int = 10, doc_types: Sequence[str] = ()) -> List[Hit]:
+        """Cosine ranking of the user's items against a query embedding."""
+        space = get_space("items")
+        keys, vectors = [], []
+        for doc_type, (model, _) in DOCUMENT_TYPES.items():
+            if doc_types and doc_type not in doc_types:
+                continue
+            rows = space.active(model.objects.filter(user_id=user_id).exclude(embedding=None))
+            for pk, embedding, space_id in rows.values_list("pk", "embedding", "embedding_space"):
+                vector = space.coerce(embedding, space_id)
+                if vector is not None and len(vector) == len(query_embedding):
+                    keys.append((doc_type, pk))
+                    vectors.append(vector)
+
+        if not vectors:
+            return []
+        idx, scores = rank(query_embedding, np.vstack(vectors), k=limit)
+        return [(*keys[i], float(s)) for i, s in zip(idx, scores)]
+
+    @classmethod
+    def hybrid(cls, user_id: int, query: str, limit: int = 10, doc_types: Sequence[str] = ()) -> List[Hit]:
+        """
+        Reciprocal rank fusion of the lexical and semantic rankings:
+        score(d) = sum over rankings of 1 / (RRF_K + rank of d).
+        Falls back to lexical results if the query can't be embedded.
+        """
+        from .utils.embedding_utils import generate_embedding
+
+        lexical = cls.search(user_id, query, limit=cls.CANDIDATES, doc_types=doc_types)
+        try:
+            query_embedding = generate_embedding(query, space="items")
+        except Exception as e:
+            logger.warning("Hybrid search: query embedding failed (%s), using lexical ranking", e)
+            query_embedding = None
+        if query_embedding is None:
+            return lexical[:limit]
+
+        semantic = cls.semantic(user_id, query_embedding, limit=cls.CANDIDATES, doc_types=doc_types)
+
+        fused: Dict[Tuple[str, int], float] = defaultdict(float)
+        for ranking in (lexical, semantic):
+            for position, (doc_type, doc_id, _) in enumerate(ranking, start=1):
+                fused[(doc_type, doc_id)] += 1.0 / (cls.RRF_K + position)
+
+        ranked = sorted(fused.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+        return [(doc_type, doc_id, score) for (doc_type, doc_id), score in ranked]
+
+    # -------------------------
+    # Backfill
+    # -------------------------
+    @classmethod
+    def rebuild(cls, user_id: Optional[int] = None) -> int:
+        """Re-indexes every Note / Reminder / Todo (optionally of one user)."""
+        count = 0
+        for model, _ in DOCUMENT_TYPES.values():
+            qs = model.objects.all()
+            if user_id is not None:
+                qs = qs.filter(user_id=user_id)
+            for instance in qs.iterator(chunk_size=500):
+                cls.index(instance)
+                count += 1
+        return count
@@ -2,6 +2,7 @@ from typing import List, Optional, Dict, Any
 from whisone.models import Note
 from django.contrib.auth.models import User
 from datetime import datetime, timedelta
+from whisone.embedding_spaces import get_space
 from whisone.utils.embedding_utils import generate_embedding
 
 
@@ -16,11 +17,12 @@ class NoteService:
         """
         Creates a note and generates an embedding.
         """
-        embedding = generate_embedding(content)
+        embedding = generate_embedding(content, space="items")
         note = Note.objects.create(
             user=self.user,
             content=content,
-            embedding=embedding
+            embedding=embedding,
+            embedding_space=get_space("items").space_id if embedding is not None else "",
         )
         return note
 
@@ -31,7 +33,7 @@ class NoteService:
         try:
             note = Note.objects.get(id=note_id, user=self.user)
             note.content = new_content
-            note.embedding = generate_embedding(new_content)
+            get_space("items").assign(note, generate_embedding(new_content, space="items"))
             note.save()
             return note
         except Note.DoesNotExist:
@@ -2,6 +2,7 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from whisone.models import Reminder
 from django.contrib.auth.models import User
+from whisone.embedding_spaces import get_space
 from whisone.utils.embedding_utils import generate_embedding
 
 
@@ -16,12 +17,13 @@ class ReminderService:
         """
         Creates a reminder and generates an embedding for semantic search.
         """
-        embedding = generate_embedding(text)
+        embedding = generate_embedding(text, space="items")
         reminder = Reminder.objects.create(
             user=self.user,
             text=text,
             remind_at=remind_at,
-            embedding=embedding
+            embedding=embedding,
+            embedding_space=get_space("items").space_id if embedding is not None else "",
         )
         return reminder
 
@@ -35,7 +37,7 @@ class ReminderService:
             reminder = Reminder.objects.get(id=reminder_id, user=self.user)
             if text:
                 reminder.text = text
-                reminder.embedding = generate_embedding(text)
+                get_space("items").assign(reminder, generate_embedding(text, space="items"))
             if remind_at:
                 reminder.remind_at = remind_at
             reminder.save()
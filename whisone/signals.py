@@ -1,8 +1,11 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
-from .models import Note, Todo, Reminder
+from .models import Note, Todo, Reminder, Memory
+from .memory_index import MemoryIndex
+from .search_index import DOCUMENT_TYPES, SearchIndex
+from .embedding_spaces import get_space
 from .utils.embedding_utils import generate_embedding
 
 
@@ -25,7 +28,7 @@ def record_user_interaction(instance):
 def update_note_embedding(sender, instance, **kwargs):
     # generate embedding
     if instance.content and (instance.embedding is None or instance.pk is None):
-        instance.embedding = generate_embedding(instance.content)
+        get_space("items").assign(instance, generate_embedding(instance.content, space="items"))
 
     # record first interaction
     record_user_interaction(instance)
@@ -38,7 +41,7 @@ def update_note_embedding(sender, instance, **kwargs):
 def update_todo_embedding(sender, instance, **kwargs):
     # embedding generation
     if instance.task and (instance.embedding is None or instance.pk is None):
-        instance.embedding = generate_embedding(instance.task)
+        get_space("items").assign(instance, generate_embedding(instance.task, space="items"))
 
     # record first interaction
     record_user_interaction(instance)
@@ -51,7 +54,37 @@ def update_todo_embedding(sender, instance, **kwargs):
 def update_reminder_embedding(sender, instance, **kwargs):
     # embedding generation
     if instance.text and (instance.embedding is None or instance.pk is None):
-        instance.embedding = generate_embedding(instance.text)
+        get_space("items").assign(instance, generate_embedding(instance.text, space="items"))
 
     # record first interaction
     record_user_interaction(instance)
+
+
+# -------------------------
+# MEMORY index maintenance
+# -------------------------
+@receiver(post_delete, sender=Memory)
+def drop_memory_from_index(sender, instance, **kwargs):
+    MemoryIndex.schedule_discard(instance.user_id, instance.id)
+
+
+# -------------------------
+# SEARCH index maintenance (Notes, Todos, Reminders)
+# -------------------------
+@receiver(post_save, sender=Note)
+@receiver(post_save, sender=Todo)
+@receiver(post_save, sender=Reminder)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    # skip saves that don't touch the indexed text (e.g. marking a todo done)
+    if update_fields is not None:
+        indexed = {f for model, fields in DOCUMENT_TYPES.values() if model is sender for f in fields}
+        if not indexed.intersection(update_fields):
+            return
+    SearchIndex.index(instance)
+
+
+@receiver(post_delete, sender=Note)
+@receiver(post_delete, sender=Todo)
+@receiver(post_delete, sender=Reminder)
+def drop_from_search_index(sender, instance, **kwargs):
+    SearchIndex.remove(instance)
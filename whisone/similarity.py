@@ -0,0 +1,157 @@
+"""
+Shared vector scoring for every semantic-search call site.
+
+Candidates are scored as one contiguous float32 matrix: vectors are
+L2-normalized once, all cosine scores come from a single matrix-vector
+product, and the top k are selected with argpartition instead of a full sort.
+Large scans can run over int8-quantized rows (see quantize) and re-rank the
+survivors at full precision.
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def as_matrix(vectors) -> np.ndarray:
+    """
+    Stacks candidate vectors into a contiguous (n, dim) float32 matrix.
+    Accepts an existing matrix, a list of arrays or a list of lists.
+    """
+    if isinstance(vectors, np.ndarray) and vectors.ndim == 2:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors is None or len(vectors) == 0:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.ascontiguousarray(np.vstack([np.asarray(v, dtype=np.float32) for v in vectors]))
+
+
+def normalize(vectors) -> np.ndarray:
+    """
+    L2-normalizes a vector or each row of a matrix. Zero vectors stay zero,
+    so they score 0.0 against everything.
+    """
+    arr = np.asarray(vectors, dtype=np.float32)
+    if arr.ndim == 1:
+        norm = np.linalg.norm(arr)
+        return arr / norm if norm else arr.copy()
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return arr / norms
+
+
+def cosine_scores(query, candidates, normalized: bool = False) -> np.ndarray:
+    """
+    Cosine similarity of `query` against every row of `candidates`.
+    Pass normalized=True when the matrix rows are already unit length.
+    """
+    matrix = as_matrix(candidates)
+    if matrix.size == 0 or query is None or len(query) == 0:
+        return np.empty(0, dtype=np.float32)
+    if not normalized:
+        matrix = normalize(matrix)
+    return matrix @ normalize(query)
+
+
+def cosine(a, b) -> float:
+    """Cosine similarity of two vectors; 0.0 for empty or zero vectors."""
+    if a is None or b is None or len(a) == 0 or len(b) == 0:
+        return 0.0
+    return float(normalize(a) @ normalize(b))
+
+
+def top_k(
+    scores: np.ndarray,
+    k: int,
+    threshold: Optional[float] = None,
+    tie_breakers: Sequence[np.ndarray] = (),
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Selects the indices of the k best scores, best first.
+
+    Scores below `threshold` are dropped. Equal scores are ordered by
+    `tie_breakers` (arrays aligned with `scores`, higher wins, earlier
+    arrays take precedence), e.g. importance then recency.
+
+    Returns (indices, scores).
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    idx = np.arange(len(scores))
+    if threshold is not None:
+        idx = idx[scores >= threshold]
+    if k <= 0 or not len(idx):
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+
+    if len(idx) > k:
+        if tie_breakers:
+            # Keep every candidate tied with the k-th score so tie-breaks stay exact.
+            kth = np.partition(scores[idx], len(idx) - k)[len(idx) - k]
+            idx = idx[scores[idx] >= kth]
+        else:
+            idx = idx[np.argpartition(-scores[idx], k - 1)[:k]]
+
+    keys = [-np.asarray(t)[idx] for t in reversed(tie_breakers)] + [-scores[idx]]
+    order = np.lexsort(keys)[:k]
+    idx = idx[order]
+    return idx, scores[idx]
+
+
+def rank(
+    query,
+    candidates,
+    k: int,
+    threshold: Optional[float] = None,
+    tie_breakers: Sequence[np.ndarray] = (),
+    normalized: bool = False,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    cosine_scores + top_k in one call: returns (indices, scores) of the k
+    candidates most similar to `query`, best first.
+    """
+    scores = cosine_scores(query, candidates, normalized=normalized)
+    return top_k(scores, k, threshold=threshold, tie_breakers=tie_breakers)
+
+
+# -------------------------
+# Int8 scalar quantization
+# -------------------------
+# Each row x is stored as int8 codes c plus its own scale s and offset o,
+# x ≈ c * s + o. Scores against a float query q come from the codes directly:
+#     q · x ≈ s * (q · c) + o * sum(q)
+CODE_MAX = 127
+
+
+def quantize(vectors) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Quantizes each row to int8 with a per-row scale and offset.
+    Returns (codes, scales, offsets).
+    """
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    if matrix.size == 0:
+        return (
+            np.empty(matrix.shape, dtype=np.int8),
+            np.empty(len(matrix), dtype=np.float32),
+            np.empty(len(matrix), dtype=np.float32),
+        )
+    lo, hi = matrix.min(axis=1), matrix.max(axis=1)
+    offsets = (hi + lo) / 2
+    scales = (hi - lo) / (2 * CODE_MAX)
+    scales[scales == 0] = 1.0
+    codes = np.rint((matrix - offsets[:, None]) / scales[:, None])
+    codes = np.clip(codes, -CODE_MAX, CODE_MAX).astype(np.int8)
+    return codes, scales.astype(np.float32), offsets.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None] + offsets[:, None]
+
+
+def quantized_scores(query, codes: np.ndarray, scales: np.ndarray, offsets: np.ndarray, block: int = 8192) -> np.ndarray:
+    """
+    Approximate dot products of `query` against quantized rows. Codes are
+    widened to float32 one block at a time, so the scan reads 1 byte per
+    dimension instead of 4.
+    """
+    q = np.asarray(query, dtype=np.float32)
+    out = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), block):
+        out[start:start + block] = codes[start:start + block].astype(np.float32) @ q
+    return out * scales + offsets * q.sum()
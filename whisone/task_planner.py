@@ -6,10 +6,14 @@ import json
 from datetime import datetime, timedelta
 
 import dateparser
-import openai
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
 from assistant.models import AssistantMessage
+from .intent_classifier import fast_path
+from .llm_cache import completion_cache
+from .llm_client import get_client
+from .models import PlannerLog
 
 User = get_user_model()
 
@@ -21,15 +25,30 @@ class TaskPlanner:
     """
 
     def __init__(self, api_key: str, model: str = "gpt-4o-mini", history_limit: int = 5):
-        self.client = openai.OpenAI(api_key=api_key)
+        self.client = get_client("planner", api_key)
         self.model = model
         self.history_limit = history_limit
 
     def plan_tasks(self, user: User, user_message: str) -> List[Dict[str, Any]]:
+        # Plainly worded single actions are planned locally; everything else goes to the LLM.
+        if getattr(settings, "FAST_PATH_ENABLED", False):
+            raw_actions = fast_path.classify(user_message)
+            if raw_actions is not None:
+                self._log_plan(user, user_message, raw_actions, "fast_path")
+                return self._normalize_and_enforce_fields(raw_actions)
+
         conversation_history = self._get_conversation_history(user)
         raw_actions = self._call_llm(user_message, conversation_history)
+        self._log_plan(user, user_message, raw_actions, "llm")
         return self._normalize_and_enforce_fields(raw_actions)
 
+    def _log_plan(self, user: User, user_message: str, raw_actions: List[Any], source: str):
+        """Keeps the plan as training data for the intent classifier; never fails planning."""
+        try:
+            PlannerLog.objects.create(user=user, message=user_message, actions=raw_actions, source=source)
+        except Exception as e:
+            print(f"[TaskPlanner] Could not log plan: {e}")
+
     # ===================================================================
     # Conversation History
     # ===================================================================
@@ -81,13 +100,14 @@ class TaskPlanner:
         )
 
         try:
-            response = self.client.chat.completions.create(
+            # Deterministic: retries and redelivered messages replay the cached plan.
+            content = completion_cache.complete(
+                self.client,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.0,
                 max_tokens=1000,
-            )
-            content = response.choices[0].message.content.strip()
+            ).strip()
             print("[TaskPlanner] LLM raw response:", content)
 
             # Clean common JSON wrappers
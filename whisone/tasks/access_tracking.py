@@ -0,0 +1,18 @@
+# whisone/tasks/access_tracking.py
+
+import logging
+
+from celery import shared_task
+
+from whisone.access_tracker import access_tracker
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_access_buffer():
+    """Writes buffered access timestamps (see AccessTracker) to the database."""
+    written = access_tracker.flush()
+    if written:
+        logger.info("flush_access_buffer: %d rows updated", written)
+    return written
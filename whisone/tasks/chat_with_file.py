@@ -1,77 +1,39 @@
-from openai import OpenAI
-import numpy as np
-from django.conf import settings
+from whisone import similarity
 from whisone.models import UploadedFile
+from whisone.embedding_spaces import get_space
+from whisone.file_chunks import chunk_texts, load_vectors
+from whisone.llm_client import get_client
 from whisone.utils.embedding_utils import generate_embedding
 
 
-def cosine_similarity(vec1, vec2):
-    vec1, vec2 = np.array(vec1), np.array(vec2)
-    norm1, norm2 = np.linalg.norm(vec1), np.linalg.norm(vec2)
-    if norm1 == 0 or norm2 == 0:
-        return 0.0
-    return float(np.dot(vec1, vec2) / (norm1 * norm2))
-
-
 def chat_with_file(file: UploadedFile, user_query: str, top_k: int = 5) -> str:
     """
-    Robust chat with file that handles multiple embedding storage formats.
+    Answers a question about a file using its stored chunk embeddings.
+    Only the text of the top-k chunks goes into the prompt.
     """
-    raw_chunks = file.embedding  # This could be None, list of dicts, or even a single list
+    space = get_space("files")
+    vectors = space.coerce(load_vectors(file), file.embedding_space)  # (chunks, dim) float32, memory-mapped
 
-    if not raw_chunks:
+    if vectors is None or len(vectors) == 0:
         return "No content available to answer from this file."
 
-    # Normalize everything into a list of dicts: [{"chunk": str, "embedding": list[float]}]
-    chunks = []
-
-    # Case 1: Single embedding stored as a plain list (old format)
-    if isinstance(raw_chunks, list) and raw_chunks and isinstance(raw_chunks[0], float):
-        text = getattr(file, "content", "") or "No text content available."
-        chunks = [{"chunk": text, "embedding": raw_chunks}]
-
-    # Case 2: List of embeddings (each embedding is a list)
-    elif isinstance(raw_chunks, list) and raw_chunks and isinstance(raw_chunks[0], list):
-        text = getattr(file, "content", "") or ""
-        # Assume whole file if no per-chunk text stored
-        chunks = [{"chunk": text, "embedding": emb} for emb in raw_chunks if isinstance(emb, list)]
-
-    # Case 3: Proper list of dicts (new/current format)
-    elif isinstance(raw_chunks, list):
-        for item in raw_chunks:
-            if isinstance(item, dict):
-                embedding = item.get("embedding") or item.get("vector")
-                text = item.get("chunk") or item.get("text") or ""
-                if isinstance(embedding, list):
-                    chunks.append({"chunk": text, "embedding": embedding})
-            elif isinstance(item, list):  # fallback: raw embedding list
-                chunks.append({"chunk": getattr(file, "content", ""), "embedding": item})
-
-    # Final safety check
-    if not chunks:
-        return "No valid embedded content found in this file."
-
     # Generate query embedding
     try:
-        query_embedding = generate_embedding(user_query)
+        query_embedding = generate_embedding(user_query, space="files")
     except Exception as e:
         return f"Failed to generate embedding for query: {e}"
 
-    # Score all chunks
-    scored_chunks = []
-    for chunk in chunks:
-        emb = chunk["embedding"]
-        if not isinstance(emb, list) or len(emb) == 0:
-            continue
-        score = cosine_similarity(query_embedding, emb)
-        scored_chunks.append({"chunk": chunk["chunk"], "score": score})
-
-    if not scored_chunks:
+    # Score all chunks in one pass and keep the top-k (stored vectors are unit length)
+    picked, _ = similarity.rank(query_embedding, vectors, k=top_k, normalized=bool(file.vector_file))
+    if not len(picked):
         return "Could not compute similarity with any content."
 
-    # Get top-k
-    top_chunks = sorted(scored_chunks, key=lambda x: x["score"], reverse=True)[:top_k]
-    context_text = "\n\n".join([c["chunk"].strip() for c in top_chunks if c["chunk"].strip()])
+    if file.vector_file:
+        top_chunks = chunk_texts(file, picked)
+    else:
+        # Legacy files have no per-chunk text, so every vector maps back to the whole file
+        top_chunks = [getattr(file, "content", "") or ""]
+    context_text = "\n\n".join([c.strip() for c in top_chunks if c.strip()])
 
     if not context_text.strip():
         return "No relevant text content found to answer your question."
@@ -96,7 +58,7 @@ Answer:
 
     # Call OpenAI
     try:
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        client = get_client("file_chat")
         response = client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
@@ -3,10 +3,9 @@
 import json
 from typing import Any, Dict
 
-from openai import OpenAI
-from django.conf import settings
+from whisone.llm_client import get_client
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+client = get_client("summary")
 
 
 OVERALL_SUMMARY_PROMPT = """
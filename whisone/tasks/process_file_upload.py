@@ -2,22 +2,30 @@
 
 from celery import shared_task, group, chord # <--- ADDED group and chord for parallel processing
 from django.utils import timezone
-from whisone.models import UploadedFile
-
-from openai import OpenAI
 from django.conf import settings
+from whisone.models import FileProcessingJob, UploadedFile
+from whisone.chunking import boilerplate_lines, chunk_spans
+from whisone.file_chunks import (
+    chunk_hash, copy_processed, file_digest, reusable_vectors, write_chunks, write_vectors,
+)
+from whisone import blob_store
+from whisone.embedding_spaces import get_space
+from whisone.ocr import ocr_engine, render_pdf_page
+from whisone.utils.embedding_utils import embed_many, generate_embedding
+
 
 import os
+import tempfile
+import numpy as np
 from pathlib import Path
 from docx import Document
 import pdfplumber
-import pytesseract
-from PIL import Image
 import traceback
 from datetime import datetime
 
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# Pages handed to one embedding task; their chunks share batched API requests.
+PAGES_PER_TASK = 50
 
 
 def debug_print(msg):
@@ -30,21 +38,19 @@ def debug_print(msg):
 # ----------------------------
 # Chunking helper
 # ----------------------------
-def chunk_text(text, chunk_size=800, overlap=150):
+def chunk_text(text, skip=None):
+    return [text[start:end] for start, end in page_chunks(text, skip)]
+
+
+def page_chunks(text, skip=None):
+    """
+    (start, end) character offsets of the token-budgeted chunks of `text`,
+    leaving out the header/footer lines in `skip`.
+    """
     debug_print("Starting chunk_text")
-    words = text.split()
-    chunks = []
-    start = 0
-    
-    while start < len(words):
-        end = start + chunk_size
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        debug_print(f"Created chunk {len(chunks)} | words {start}-{min(end, len(words))} | length {len(chunk.split())} words")
-        start += chunk_size - overlap
-    
-    debug_print(f"chunk_text finished → {len(chunks)} chunks")
-    return chunks
+    spans = chunk_spans(text, skip=skip, space="files")
+    debug_print(f"chunk_text finished → {len(spans)} chunks")
+    return spans
 
 
 # ----------------------------
@@ -53,13 +59,10 @@ def chunk_text(text, chunk_size=800, overlap=150):
 def embed_chunk(chunk: str):
     debug_print(f"Embedding chunk of {len(chunk.split())} words (~{len(chunk)} chars)")
     try:
-        response = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=chunk
-        )
-        embedding = response.data[0].embedding
+        embedding = generate_embedding(chunk, space="files")
         debug_print(f"Embedding successful | dim={len(embedding)}")
-        return embedding
+        # Page results travel through the Celery result backend as JSON.
+        return embedding.tolist()
     except Exception as e:
         debug_print(f"ERROR in embed_chunk: {type(e).__name__}: {str(e)}")
         debug_print(traceback.format_exc())
@@ -78,24 +81,108 @@ def process_page_and_embed(self, file_id, page_content, page_num, total_pages):
     debug_print(f"PAGE TASK STARTED for file_id={file_id} | Page {page_num}/{total_pages}")
     
     # 1. Chunk text
-    chunks = chunk_text(page_content)
+    spans = page_chunks(page_content)
 
-    # 2. Embed each chunk (This is the slow, API-intensive part that is now parallelized)
-    embeddings = []
-    for idx, chunk in enumerate(chunks, start=1):
-        emb = embed_chunk(chunk)
-        embeddings.append(emb)
+    # 2. Embed all chunks in batched API requests
+    embeddings = embed_many([page_content[start:end] for start, end in spans], space="files").tolist()
     
-    debug_print(f"PAGE TASK FINISHED for Page {page_num}: {len(chunks)} chunks, {len(embeddings)} embeddings.")
+    debug_print(f"PAGE TASK FINISHED for Page {page_num}: {len(spans)} chunks, {len(embeddings)} embeddings.")
     
-    # Return the page's content and its embeddings to the finalizer task
+    # Return the page's content, chunk offsets and embeddings to the finalizer task
     return {
         'page_num': page_num,
         'text': page_content,
+        'spans': spans,
         'embeddings': embeddings
     }
 
 
+# ========================================================
+# Task 1b — Chunk and Embed a BLOCK of pages in one go
+# ========================================================
+@shared_task(bind=True)
+def process_pages_and_embed(self, file_id, pages_ref, total_pages):
+    """
+    Chunks a block of (page_content, page_num) pairs and embeds every chunk
+    through one embed_many call, so a long PDF costs a handful of batched
+    requests instead of one round-trip per chunk.
+
+    Claim check: the pages arrive as a blob_store reference and the vectors
+    are written back to the blob store, so only references and chunk
+    offsets travel through the broker and result backend.
+
+    Chunks whose text the user already has embedded (same file before a
+    reprocess, or another upload) reuse the stored vector; only new or
+    changed chunks are sent to the embedding API.
+    """
+    pages = blob_store.get_json(pages_ref) if isinstance(pages_ref, str) else pages_ref
+    debug_print(f"PAGE BLOCK TASK STARTED for file_id={file_id} | {len(pages)} pages of {total_pages}")
+
+    # Running headers/footers repeated across the block's pages are kept out of every chunk
+    skip = boilerplate_lines([content for content, _ in pages])
+    if skip:
+        debug_print(f"Skipping {len(skip)} repeated header/footer lines")
+    page_spans = [page_chunks(content, skip) for content, _ in pages]
+    flat = [content[start:end] for (content, _), spans in zip(pages, page_spans) for start, end in spans]
+
+    vectors_ref = None
+    if flat:
+        user_id = UploadedFile.objects.filter(id=file_id).values_list("user_id", flat=True).first()
+        hashes = [chunk_hash(chunk) for chunk in flat]
+        reused = reusable_vectors(user_id, hashes, space="files")
+        missing = [i for i, h in enumerate(hashes) if h not in reused]
+        fresh = embed_many([flat[i] for i in missing], space="files") if missing else None
+
+        vectors = np.empty((len(flat), get_space("files").dimensions), dtype=np.float32)
+        for i, h in enumerate(hashes):
+            if h in reused:
+                vectors[i] = reused[h]
+        if missing:
+            vectors[missing] = fresh
+        vectors_ref = blob_store.put_array(f"file_{file_id}", vectors)
+        debug_print(f"Reused {len(flat) - len(missing)} stored chunk vectors, embedded {len(missing)}")
+
+    debug_print(f"PAGE BLOCK TASK FINISHED: {len(flat)} chunks embedded.")
+    return {
+        'first_page': pages[0][1] if pages else 0,
+        'pages_ref': pages_ref if isinstance(pages_ref, str) else blob_store.put_json(f"file_{file_id}", pages),
+        'spans': page_spans,
+        'vectors_ref': vectors_ref,
+    }
+
+
+def _iter_pages(result):
+    """
+    Yields (page_num, text, spans, vectors) for one page-task result: a
+    page-block claim check, or the inline page dicts older tasks returned.
+    """
+    if isinstance(result, dict) and 'pages_ref' in result:
+        pages = blob_store.get_json(result['pages_ref'])
+        vectors = blob_store.get_array(result['vectors_ref']) if result['vectors_ref'] else None
+        offset = 0
+        for (text, page_num), spans in zip(pages, result['spans']):
+            yield page_num, text, spans, vectors[offset:offset + len(spans)] if spans else None
+            offset += len(spans)
+    else:
+        for page in (result if isinstance(result, list) else [result]):
+            if isinstance(page, dict):
+                spans = page.get('spans', [])
+                yield page['page_num'], page['text'], spans, np.asarray(page['embeddings'], dtype=np.float32) if spans else None
+
+
+def _result_order(result):
+    if isinstance(result, dict):
+        return result.get('first_page', result.get('page_num', 0))
+    return result[0].get('page_num', 0) if result else 0
+
+
+def _chunk_count(result):
+    if isinstance(result, dict) and 'pages_ref' in result:
+        return sum(len(spans) for spans in result['spans'])
+    pages = result if isinstance(result, list) else [result]
+    return sum(len(page.get('spans', [])) for page in pages if isinstance(page, dict))
+
+
 # ========================================================
 # NEW Task 2 — Final Callback (The Collector/Finalizer)
 # ========================================================
@@ -103,46 +190,151 @@ def process_page_and_embed(self, file_id, page_content, page_num, total_pages):
 def finalize_file_processing(self, results_list, file_id):
     """
     Collects results from all parallel page tasks, aggregates them, and saves to DB.
+
+    Blocks are merged in page order one at a time: chunk rows are inserted
+    in batches while their vectors are copied into one memory-mapped matrix,
+    so the finalizer never holds every page's embeddings at once.
     """
     debug_print(f"FINALIZER STARTED for file_id={file_id}. Aggregating results...")
-    
+
+    results_list = sorted([r for r in results_list if r], key=_result_order)
+    blob_refs = [
+        ref for r in results_list if isinstance(r, dict)
+        for ref in (r.get('pages_ref'), r.get('vectors_ref'))
+    ]
+    total_chunks = sum(_chunk_count(r) for r in results_list)
     full_text_list = []
-    all_embeddings = []
-    
-    # Sort results by page number to maintain document order
-    sorted_results = sorted([r for r in results_list if isinstance(r, dict)], key=lambda x: x.get('page_num', 0))
-    
-    for result in sorted_results:
-        full_text_list.append(result['text'])
-        all_embeddings.extend(result['embeddings'])
-            
-    final_text = "\n".join(full_text_list).strip()
-    total_words = len(final_text.split())
-    total_chunks = len(all_embeddings)
-
-    # Save to database
+
     try:
         uploaded_file = UploadedFile.objects.get(id=file_id)
-        
+
+        with tempfile.TemporaryDirectory() as scratch:
+            matrix = None  # (total_chunks, dim), created from the first block's width
+            row = 0
+
+            def merged_chunks():
+                nonlocal matrix, row
+                page_start = 0
+                leading = None  # whitespace stripped from the start of the joined content
+                for result in results_list:
+                    for page_num, text, spans, vectors in _iter_pages(result):
+                        if leading is None and text.strip():
+                            leading = page_start + len(text) - len(text.lstrip())
+                        if spans:
+                            if matrix is None:
+                                matrix = np.lib.format.open_memmap(
+                                    os.path.join(scratch, "vectors.npy"), mode="w+",
+                                    dtype=np.float32, shape=(total_chunks, vectors.shape[1]),
+                                )
+                            matrix[row:row + len(spans)] = vectors
+                            row += len(spans)
+                        # Chunk offsets are page-relative; shift them to offsets into the content.
+                        for start, end in spans:
+                            yield {
+                                'page_num': page_num,
+                                'start_char': page_start + start - leading,
+                                'end_char': page_start + end - leading,
+                                'text': text[start:end],
+                            }
+                        full_text_list.append(text)
+                        page_start += len(text) + 1  # "\n" separator
+
+            write_chunks(uploaded_file, merged_chunks())
+            write_vectors(uploaded_file, matrix, space="files")
+
+        final_text = "\n".join(full_text_list).strip()
+        total_words = len(final_text.split())
+
         # Save all results
         uploaded_file.content = final_text
-        uploaded_file.embedding = all_embeddings
         uploaded_file.processed = True
-        uploaded_file.save(update_fields=["content", "embedding", "processed"])
-        
-        debug_print(f"FINALIZER SUCCESS: Total words={total_words}, Total chunks={total_chunks}")
-
-        return {
-            "status": "success",
-            "file_id": file_id,
-            "chunks": total_chunks,
-            "words": total_words,
-            "message": "Processing and embedding completed"
-        }
+        uploaded_file.save(update_fields=["content", "embedding", "embedding_space", "vector_file", "processed"])
+        FileProcessingJob.objects.filter(file=uploaded_file).update(status="done", error="")
     except Exception as e:
         debug_print(f"FINALIZER FAILED: {e}")
         raise
 
+    blob_store.delete(blob_refs)
+    debug_print(f"FINALIZER SUCCESS: Total words={total_words}, Total chunks={total_chunks}")
+
+    return {
+        "status": "success",
+        "file_id": file_id,
+        "chunks": total_chunks,
+        "words": total_words,
+        "message": "Processing and embedding completed"
+    }
+
+
+# ========================================================
+# Streaming extraction — yields one page / section at a time
+# ========================================================
+def iter_pages(uploaded_file, start_after=0):
+    """
+    Yields (text, page_num) as the file is parsed, skipping pages up to
+    `start_after` (already extracted by an earlier, interrupted run).
+    PDFs yield one page at a time and release each page's parsed objects;
+    DOCX and text files yield sections of about SECTION_CHARS characters.
+    """
+    file_path = uploaded_file.file.path
+
+    if uploaded_file.file_type == "pdf":
+        debug_print("Extracting PDF with pdfplumber...")
+        with pdfplumber.open(file_path) as pdf:
+            def pages():
+                for i in range(start_after, len(pdf.pages)):
+                    page = pdf.pages[i]
+                    t = page.extract_text()
+                    # Scanned page (no text layer): rendered and OCR'd in the pool
+                    yield t, i + 1, (None if (t or "").strip() else lambda page=page: render_pdf_page(page))
+                    page.close()  # drop the page's cached layout objects
+
+            digest = uploaded_file.content_hash or file_digest(file_path)
+            for t, page_num in ocr_engine.ocr_pages(digest, pages()):
+                if t and t.strip():
+                    debug_print(f"    Page {page_num} extracted {len(t.split())} words")
+                    yield t, page_num
+
+    elif uploaded_file.file_type == "docx":
+        debug_print("Extracting DOCX with python-docx...")
+        doc = Document(file_path)
+        paragraphs = (p.text for p in doc.paragraphs if p.text.strip())
+        yield from _sections(paragraphs, start_after, separator="\n")
+
+    elif uploaded_file.file_type in ["txt", "csv"]:
+        debug_print("Reading plain text file...")
+        with open(file_path, "r", encoding="utf-8") as f:
+            # sections are re-joined with "\n", so each drops its final line break
+            for text, num in _sections(f, start_after, separator=""):
+                yield (text[:-1] if text.endswith("\n") else text), num
+
+    elif uploaded_file.file_type == "image":
+        debug_print("Running OCR with pytesseract...")
+        if start_after < 1:
+            full_text = ocr_engine.ocr_image(file_path)
+            if full_text.strip():
+                yield full_text, 1
+
+
+SECTION_CHARS = 20_000
+
+
+def _sections(pieces, start_after, separator):
+    """Groups consecutive text pieces into numbered sections of about SECTION_CHARS."""
+    section, size, num = [], 0, 0
+    for piece in pieces:
+        section.append(piece)
+        size += len(piece)
+        if size >= SECTION_CHARS:
+            num += 1
+            if num > start_after:
+                yield separator.join(section), num
+            section, size = [], 0
+    if section:
+        num += 1
+        if num > start_after:
+            yield separator.join(section), num
+
 
 # ========================================================
 # MODIFIED Main Task — Dispatcher (Extracts pages and launches the Chord)
@@ -151,6 +343,12 @@ def finalize_file_processing(self, results_list, file_id):
 def process_uploaded_file(self, file_id):
     """
     Extracts content from uploaded file and dispatches parallel page-processing tasks.
+
+    Pages stream out of iter_pages into windows of at most PAGES_PER_TASK
+    pages and settings.FILE_PROCESSING_WINDOW_BYTES of text; each full
+    window is written to the blob store and recorded on the file's
+    FileProcessingJob, so only one window is ever held in memory and a
+    re-delivered task (worker crash) resumes after the last recorded page.
     """
     debug_print(f"DISPATCHER STARTED for file_id={file_id}")
 
@@ -161,48 +359,71 @@ def process_uploaded_file(self, file_id):
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File does not exist: {file_path}")
 
-        extracted_pages = [] # This list will hold (text_content, page_number) for dispatch
+        digest = file_digest(file_path)
+        if uploaded_file.content_hash != digest:
+            uploaded_file.content_hash = digest
+            uploaded_file.save(update_fields=["content_hash"])
+
+        # Same bytes already processed for this user (e.g. a PDF re-sent over WhatsApp): copy that result.
+        duplicate = (
+            UploadedFile.objects.filter(
+                user_id=uploaded_file.user_id,
+                content_hash=digest,
+                processed=True,
+                embedding_space=get_space("files").space_id,
+            )
+            .exclude(pk=uploaded_file.pk)
+            .exclude(vector_file="")
+            .exclude(vector_file=None)
+            .order_by("-uploaded_at")
+            .first()
+        )
+        if duplicate is not None:
+            copy_processed(uploaded_file, duplicate)
+            uploaded_file.save(update_fields=["content", "embedding", "embedding_space", "vector_file", "processed"])
+            FileProcessingJob.objects.update_or_create(file=uploaded_file, defaults={"status": "done", "error": ""})
+            debug_print(f"DISPATCHER: identical to processed file {duplicate.id}, copied its chunks and vectors")
+            return {"status": "success", "file_id": file_id, "duplicate_of": duplicate.id,
+                    "message": "Identical file already processed; reused its content and embeddings."}
+
+        job, _ = FileProcessingJob.objects.get_or_create(file=uploaded_file)
+        if job.status == "done":
+            # Reprocessing a finished file starts over
+            job.status, job.last_page, job.windows, job.error = "extracting", 0, [], ""
+            job.save()
+        elif job.last_page:
+            debug_print(f"Resuming extraction after page {job.last_page} ({len(job.windows)} windows recorded)")
 
         # ----------------------------------------
-        # 1. Sequential Text Extraction (Must happen first)
+        # 1. Streaming Text Extraction, one window at a time
         # ----------------------------------------
-        if uploaded_file.file_type == "pdf":
-            debug_print("Extracting PDF with pdfplumber...")
-            with pdfplumber.open(file_path) as pdf:
-                for i, page in enumerate(pdf.pages, start=1):
-                    t = page.extract_text()
-                    if t:
-                        extracted_pages.append((t, i))
-                        debug_print(f"    Page {i} extracted {len(t.split())} words")
-
-        elif uploaded_file.file_type == "docx":
-            debug_print("Extracting DOCX with python-docx...")
-            doc = Document(file_path)
-            paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-            full_text = "\n".join(paragraphs)
-            # Treat DOCX as a single page/block for processing
-            if full_text:
-                 extracted_pages.append((full_text, 1)) 
-
-        elif uploaded_file.file_type in ["txt", "csv"]:
-            debug_print("Reading plain text file...")
-            with open(file_path, "r", encoding="utf-8") as f:
-                full_text = f.read()
-            # Treat simple text files as a single page/block
-            if full_text:
-                extracted_pages.append((full_text, 1))
-
-        elif uploaded_file.file_type == "image":
-            debug_print("Running OCR with pytesseract...")
-            img = Image.open(file_path)
-            full_text = pytesseract.image_to_string(img)
-            # Treat images as a single page/block
-            if full_text:
-                extracted_pages.append((full_text, 1))
+        if job.status == "extracting":
+            window, window_bytes = [], 0
+
+            def flush_window():
+                ref = blob_store.put_json(f"file_{file_id}", window)
+                job.windows.append({"ref": ref, "first_page": window[0][1], "last_page": window[-1][1]})
+                job.last_page = window[-1][1]
+                job.save(update_fields=["windows", "last_page", "updated_at"])
+
+            for text, page_num in iter_pages(uploaded_file, start_after=job.last_page):
+                size = len(text.encode("utf-8"))
+                if window and (len(window) >= PAGES_PER_TASK or window_bytes + size > settings.FILE_PROCESSING_WINDOW_BYTES):
+                    flush_window()
+                    window, window_bytes = [], 0
+                window.append((text, page_num))
+                window_bytes += size
+            if window:
+                flush_window()
+
+            job.status = "embedding"
+            job.save(update_fields=["status", "updated_at"])
 
         # --- Handle empty content and unknown types (Refactored) ---
-        if not extracted_pages:
+        if not job.windows:
             debug_print("No content extracted from file. Marking as processed.")
+            job.status = "done"
+            job.save(update_fields=["status", "updated_at"])
             uploaded_file.processed = True
             uploaded_file.save(update_fields=["processed"])
             return {"status": "success", "message": "No text found for embedding."}
@@ -210,13 +431,13 @@ def process_uploaded_file(self, file_id):
         # ----------------------------------------
         # 2. Parallel Dispatch via Chord
         # ----------------------------------------
-        total_pages = len(extracted_pages)
-        debug_print(f"Dispatching {total_pages} content blocks in parallel...")
+        total_pages = job.last_page
+        debug_print(f"Dispatching {len(job.windows)} page windows in parallel...")
         
-        # 1. Header (The Group of parallel page tasks)
+        # 1. Header (The Group of parallel page-window tasks; page text stays in the blob store)
         page_signatures = [
-            process_page_and_embed.s(file_id, content, page_num, total_pages) 
-            for content, page_num in extracted_pages
+            process_pages_and_embed.s(file_id, w["ref"], total_pages)
+            for w in job.windows
         ]
         
         # 2. Workflow (Group | Finalizer)
@@ -232,7 +453,7 @@ def process_uploaded_file(self, file_id):
             "status": "dispatched",
             "file_id": file_id,
             "total_pages": total_pages,
-            "message": f"Processing of {total_pages} content blocks dispatched via Celery Chord."
+            "message": f"Processing of {len(job.windows)} page windows dispatched via Celery Chord."
         }
         debug_print(f"DISPATCHER FINISHED → {result}")
         return result
@@ -246,4 +467,5 @@ def process_uploaded_file(self, file_id):
         error_msg = f"FATAL ERROR in dispatcher: {type(e).__name__}: {str(e)}"
         debug_print(error_msg)
         debug_print(traceback.format_exc())
+        FileProcessingJob.objects.filter(file_id=file_id).update(error=error_msg)
         return {"status": "error", "message": error_msg, "traceback": traceback.format_exc()}
\ No newline at end of file
@@ -0,0 +1,192 @@
+# whisone/tasks/reembed.py
+
+import logging
+import time
+
+from celery import shared_task
+from django.apps import apps
+from django.db.models import Q
+from django.utils import timezone
+
+from whisone.embedding_spaces import SPACE_FIELD, get_space
+from whisone.models import EmbeddingMigration
+from whisone.utils.embedding_utils import embed_many
+
+logger = logging.getLogger(__name__)
+
+# Tables stored in each space, with the text field their embedding is computed from.
+SPACE_TARGETS = {
+    "memory": [("whisone.Memory", "raw_text")],
+    "items": [("whisone.Note", "content"), ("whisone.Todo", "task"), ("whisone.Reminder", "text")],
+    "files": [("whisone.UploadedFile", "content")],
+    "avatars": [("avatars.AvatarMemoryChunk", "text")],
+    "knowledge": [("whisone.KnowledgeVaultEntry", "text_search")],
+}
+
+# Rows holding vectors, per table (default: a non-null embedding column).
+HAS_VECTORS = {
+    "whisone.UploadedFile": Q(embedding__isnull=False) | (Q(vector_file__isnull=False) & ~Q(vector_file="")),
+}
+
+BATCH_SIZE = 200
+MAX_BATCHES_PER_RUN = 25
+MAX_TEXTS_PER_MINUTE = 3000  # re-embedding budget, shared with live traffic
+
+
+@shared_task(bind=True)
+def migrate_embedding_space(self, space_name: str, batch_size: int = BATCH_SIZE, requeue: bool = True):
+    """
+    Moves every stored vector of an embedding space into the space's current
+    id (model, dimension, normalization):
+      - rows already tagged with the current id are skipped by the query
+      - vectors of the same model at a larger dimension (or untagged rows
+        that fit) are projected and re-tagged in place, no API calls
+      - anything else is re-embedded from its source text, rate-limited to
+        MAX_TEXTS_PER_MINUTE
+
+    Progress is kept per table in EmbeddingMigration and committed after every
+    batch, so an interrupted run resumes where it stopped. Every
+    MAX_BATCHES_PER_RUN batches the task re-queues itself, so it never holds
+    the worker for long.
+    """
+    space = get_space(space_name)
+    batches = 0
+
+    for label, text_field in SPACE_TARGETS[space_name]:
+        try:
+            model = apps.get_model(label)
+        except LookupError:
+            continue
+
+        progress, _ = EmbeddingMigration.objects.get_or_create(
+            space_id=space.space_id, table=label, defaults={"space": space_name}
+        )
+        if progress.status == "done":
+            continue
+        if progress.status != "running":
+            progress.status = "running"
+            progress.started_at = progress.started_at or timezone.now()
+            progress.error = ""
+            progress.save(update_fields=["status", "started_at", "error", "updated_at"])
+
+        while batches < MAX_BATCHES_PER_RUN:
+            has_vectors = HAS_VECTORS.get(label, Q(embedding__isnull=False))
+            stale = model.objects.filter(has_vectors).exclude(**{SPACE_FIELD: space.space_id}).order_by("pk")
+            if progress.last_pk:
+                stale = stale.filter(pk__gt=progress.last_pk)
+            rows = list(stale[:batch_size])
+            if not rows:
+                progress.status = "done"
+                progress.finished_at = timezone.now()
+                progress.save(update_fields=["status", "finished_at", "updated_at"])
+                logger.info("migrate_embedding_space[%s]: %s done", space_name, label)
+                break
+
+            try:
+                updated, reembedded = _migrate_rows(space, model, rows, text_field)
+            except Exception as e:
+                progress.status = "failed"
+                progress.error = f"{type(e).__name__}: {e}"
+                progress.save(update_fields=["status", "error", "updated_at"])
+                raise
+
+            progress.last_pk = str(rows[-1].pk)
+            progress.processed += len(rows)
+            progress.updated += updated
+            progress.reembedded += reembedded
+            progress.save(update_fields=["last_pk", "processed", "updated", "reembedded", "updated_at"])
+            batches += 1
+            logger.info(
+                "migrate_embedding_space[%s]: %s up to pk=%s (%d processed, %d re-embedded)",
+                space_name, label, progress.last_pk, progress.processed, progress.reembedded,
+            )
+        else:
+            if requeue:
+                self.apply_async(args=[space_name], kwargs={"batch_size": batch_size})
+            return {"space": space_name, "status": "continued"}
+
+    return {"space": space_name, "status": "done"}
+
+
+def _migrate_rows(space, model, rows, text_field: str):
+    """Returns (rows updated, rows re-embedded)."""
+    if model._meta.label == "whisone.UploadedFile":
+        return _migrate_files(space, rows)
+
+    multi = model._meta.get_field("embedding").multi
+    changed, stale = [], []
+
+    for row in rows:
+        converted = space.convert(row.embedding, getattr(row, SPACE_FIELD))
+        if converted is not None:
+            space.assign(row, converted)
+            changed.append(row)
+        elif (getattr(row, text_field, "") or "").strip():
+            stale.append(row)
+
+    if stale:
+        started = time.monotonic()
+        texts = [getattr(row, text_field) for row in stale]
+        vectors = embed_many(texts, space=space.name)
+        for row, vector in zip(stale, vectors):
+            space.assign(row, vector.reshape(1, -1) if multi else vector)
+        changed.extend(stale)
+        _throttle(len(texts), time.monotonic() - started)
+
+    if changed:
+        model.objects.bulk_update(changed, ["embedding", SPACE_FIELD])
+        if model._meta.label == "whisone.Memory":
+            from whisone.memory_index import MemoryIndex
+            from whisone.memory_lsh import MemoryLSH
+
+            MemoryLSH.index_many(changed)
+            for user_id in {row.user_id for row in changed}:
+                MemoryIndex.invalidate(user_id)
+        elif model._meta.label == "avatars.AvatarMemoryChunk":
+            from avatars.services.retrieval_index import AvatarIndex
+
+            for avatar_id in {row.avatar_id for row in changed}:
+                AvatarIndex.invalidate(avatar_id)
+    return len(changed), len(stale)
+
+
+def _migrate_files(space, files):
+    """
+    Files keep one vector per FileChunk in a .npy matrix. Same-model vectors
+    are projected; otherwise the chunk texts are re-embedded. Legacy files
+    (vectors in UploadedFile.embedding, no chunk rows) are moved to the
+    chunk layout on the way, re-chunked from their content.
+    """
+    from whisone.chunking import chunk_spans
+    from whisone.file_chunks import load_vectors, store_chunks
+
+    updated = reembedded = 0
+    for f in files:
+        chunks = list(f.chunks.order_by("index").values("page_num", "start_char", "end_char", "text"))
+        if not chunks:
+            content = f.content or ""
+            chunks = [
+                {"page_num": 1, "start_char": start, "end_char": end, "text": content[start:end]}
+                for start, end in chunk_spans(content)
+            ]
+
+        vectors = space.convert(load_vectors(f, mmap=False), f.embedding_space)
+        if vectors is None or len(vectors) != len(chunks):
+            if not chunks:
+                continue
+            started = time.monotonic()
+            vectors = embed_many([c["text"] for c in chunks], space=space.name)
+            _throttle(len(chunks), time.monotonic() - started)
+            reembedded += 1
+
+        store_chunks(f, chunks, vectors, space=space.name)
+        f.save(update_fields=["embedding", SPACE_FIELD, "vector_file"])
+        updated += 1
+    return updated, reembedded
+
+
+def _throttle(sent: int, elapsed: float):
+    """Sleeps long enough to keep re-embedding under MAX_TEXTS_PER_MINUTE."""
+    budget = sent * 60.0 / MAX_TEXTS_PER_MINUTE
+    if budget > elapsed:
+        time.sleep(budget - elapsed)
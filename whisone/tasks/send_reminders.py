@@ -5,14 +5,13 @@ from django.utils import timezone
 from django.contrib.auth import get_user_model
 from whisone.models import Reminder
 from whatsapp.tasks import send_whatsapp_text
-import openai
+from whisone.llm_client import get_client
 import logging
-from django.conf import settings
 
 
 logger = logging.getLogger(__name__)
 
-client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+client = get_client("reminders")
 
 def generate_friendly_text(reminder_text: str) -> str:
     """
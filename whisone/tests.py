@@ -1,3 +1,28 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .intent_classifier import FETCH_ACTIONS, FETCH_RE, _fetch_noun
+
+
+class FetchIntentTests(SimpleTestCase):
+    CASES = {
+        "show my todos": "fetch_todos",
+        "list my to-dos list": "fetch_todos",
+        "show my tasks": "fetch_todos",
+        "show my notes": "fetch_notes",
+        "list my reminders": "fetch_reminders",
+        "show my unread emails": "fetch_emails",
+        "check my e-mails": "fetch_emails",
+        "show my mail": "fetch_emails",
+        "check my inbox": "fetch_emails",
+        "show my calendar": "fetch_events",
+        "show my events": "fetch_events",
+        "list my event": "fetch_events",
+        "what's my schedule?": "fetch_events",
+    }
+
+    def test_each_fetch_noun_maps_to_its_action(self):
+        for message, action in self.CASES.items():
+            with self.subTest(message=message):
+                match = FETCH_RE.match(message)
+                self.assertIsNotNone(match)
+                self.assertEqual(FETCH_ACTIONS[_fetch_noun(match.group("what"))], action)
@@ -1,16 +1,120 @@
-from openai import OpenAI
-from django.conf import settings
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
 
+import numpy as np
+from openai import BadRequestError
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+from whisone.embedding_cache import embedding_cache
+from whisone.embedding_spaces import EmbeddingSpace, get_space
+from whisone.llm_client import get_client
 
-def generate_embedding(text: str):
+
+logger = logging.getLogger(__name__)
+
+client = get_client("embeddings")
+
+DEFAULT_SPACE = "items"
+
+# Provider limits for one embeddings request.
+MAX_BATCH_ITEMS = 2048
+MAX_BATCH_TOKENS = 300_000
+MAX_PARALLEL_REQUESTS = 4
+
+
+def generate_embedding(text: str, space: str = DEFAULT_SPACE):
+    """
+    Returns the embedding for `text` in the given embedding space as a
+    float32 array, served from the shared embedding cache when the same text
+    was embedded before. Returns None for blank text and for text the
+    provider rejects.
+    """
     text = text.strip()
     if not text:
         return None
-    
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
+
+    space = get_space(space)
+    return embedding_cache.get_or_compute(
+        space.model,
+        text,
+        lambda t: _project_one(space, _embed_batch([t], space.model)[0]),
+        dimensions=space.cache_dimensions,
     )
-    return response.data[0].embedding
+
+
+def embed_many(texts: Sequence[str], space: str = DEFAULT_SPACE) -> np.ndarray:
+    """
+    Embeds many texts with as few API requests as possible.
+
+    Cached texts are served from the embedding cache. The rest are
+    de-duplicated and packed into requests up to the provider's item and
+    token limits, which run concurrently (at most MAX_PARALLEL_REQUESTS at
+    a time). Rate limits and connection errors are retried with backoff by
+    the shared client (whisone.llm_client); a rejected request is retried as
+    two halves until the bad input is isolated and skipped.
+
+    Returns a (len(texts), space dimensions) float32 matrix in input order.
+    Blank texts and texts the provider rejects get zero rows.
+    """
+    space: EmbeddingSpace = get_space(space)
+    texts = list(texts)
+    normalized = [embedding_cache.normalize_text(t) for t in texts]
+    vectors: Dict[str, np.ndarray] = embedding_cache.get_many(space.model, normalized, space.cache_dimensions)
+
+    missing = list(dict.fromkeys(n for n in normalized if n and n not in vectors))
+    if missing:
+        batches = _pack_batches(missing)
+        logger.info("embed_many: %d texts, %d cached, %d requests", len(texts), len(vectors), len(batches))
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_REQUESTS, len(batches))) as pool:
+            for batch, result in zip(batches, pool.map(lambda b: _embed_batch(b, space.model), batches)):
+                accepted = [(text, vec) for text, vec in zip(batch, result) if vec is not None]
+                if not accepted:
+                    continue
+                projected = space.project([vec for _, vec in accepted])
+                vectors.update(embedding_cache.set_many(
+                    space.model, dict(zip([text for text, _ in accepted], projected)), space.cache_dimensions
+                ))
+
+    out = np.zeros((len(texts), space.dimensions), dtype=np.float32)
+    for i, norm in enumerate(normalized):
+        vec = vectors.get(norm)
+        if vec is not None:
+            out[i] = vec
+    return out
+
+
+def _estimate_tokens(text: str) -> int:
+    # ~4 chars per token for English; 3 keeps us safely under the limit.
+    return len(text) // 3 + 1
+
+
+def _pack_batches(texts: List[str]) -> List[List[str]]:
+    batches, current, current_tokens = [], [], 0
+    for text in texts:
+        tokens = _estimate_tokens(text)
+        if current and (len(current) >= MAX_BATCH_ITEMS or current_tokens + tokens > MAX_BATCH_TOKENS):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _project_one(space: EmbeddingSpace, vector: Optional[List[float]]) -> Optional[np.ndarray]:
+    return None if vector is None else space.project(vector)
+
+
+def _embed_batch(batch: List[str], model: str) -> List[Optional[List[float]]]:
+    """Embeddings for `batch` in order; None for an input the provider rejects."""
+    try:
+        response = client.embeddings.create(model=model, input=batch)
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+    except BadRequestError as e:
+        # One input is unacceptable (e.g. too long): isolate it instead of failing the batch.
+        if len(batch) == 1:
+            logger.warning("embed_many: provider rejected input (%d chars, %r...): %s", len(batch[0]), batch[0][:80], e)
+            return [None]
+        mid = len(batch) // 2
+        return _embed_batch(batch[:mid], model) + _embed_batch(batch[mid:], model)
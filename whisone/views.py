@@ -26,6 +26,7 @@ from rest_framework import generics, filters
 from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
+from .search_index import SearchIndex
 
 
 
@@ -393,33 +394,35 @@ class OverviewView(APIView):
 
 
 class UnifiedSearchView(APIView):
+    """
+    Ranked search across the user's Notes, Reminders and Todos.
+
+    Uses the BM25 inverted index (whisone.search_index); the last word of
+    `q` also matches as a prefix. `?mode=hybrid` fuses the lexical ranking
+    with semantic similarity (reciprocal rank fusion).
+    """
     permission_classes = [IsAuthenticated]
 
+    RESULTS_PER_TYPE = 10
+
     def get(self, request):
-        query = request.query_params.get("q", "").strip()
-        if not query:
+        query = request.query_params.get("q", "")
+        if not query.strip():
             return Response({"results": []})
 
         user = request.user
+        search = SearchIndex.hybrid if request.query_params.get("mode") == "hybrid" else SearchIndex.search
 
-        # Search across Notes, Reminders, Todos
-        notes = Note.objects.filter(
-            Q(user=user) & Q(content__icontains=query)
-        ).order_by('-created_at')[:10]
-
-        reminders = Reminder.objects.filter(
-            Q(user=user) & Q(text__icontains=query)
-        ).order_by('-remind_at')[:10]
-
-        todos = Todo.objects.filter(
-            Q(user=user) & Q(task__icontains=query)
-        ).order_by('-created_at')[:10]
+        def ranked(doc_type, model):
+            hits = search(user.id, query, limit=self.RESULTS_PER_TYPE, doc_types=[doc_type])
+            objects = model.objects.filter(user=user).in_bulk([doc_id for _, doc_id, _ in hits])
+            return [objects[doc_id] for _, doc_id, _ in hits if doc_id in objects]
 
         results = {
-            "notes": NoteSerializer(notes, many=True).data,
-            "reminders": ReminderSerializer(reminders, many=True).data,
-            "todos": TodoSerializer(todos, many=True).data,
-            "query": query,
+            "notes": NoteSerializer(ranked("note", Note), many=True).data,
+            "reminders": ReminderSerializer(ranked("reminder", Reminder), many=True).data,
+            "todos": TodoSerializer(ranked("todo", Todo), many=True).data,
+            "query": query.strip(),
         }
 
         return Response(results)
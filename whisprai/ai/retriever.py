@@ -1,5 +1,5 @@
-from sentence_transformers import SentenceTransformer, util
-import numpy as np
+from sentence_transformers import SentenceTransformer
+from whisone import similarity
 # from unified.models import Message  
 from datetime import datetime, timedelta
 import re
@@ -51,20 +51,18 @@ def retrieve_relevant_messages(user, data=None, query_text: str = None, channel:
         # 6️⃣ Generate embedding for the query (only for non-generic)
         query_embedding = model.encode([query_text], normalize_embeddings=True)
 
-        # 7️⃣ Compute cosine similarity between query and each message
-        scored_messages = []
+        # 7️⃣ Score every message with one matrix product
+        candidates, vectors = [], []
         for msg in messages:
-            try:
-                msg_vec = np.array(msg.embedding, dtype=np.float32)
-                similarity = util.cos_sim(query_embedding, msg_vec)[0][0].item()
-                scored_messages.append((similarity, msg))
-            except Exception as e:
-                print(f"[Retriever Error for Message {msg.id}]: {e}")
+            if msg.embedding is None or len(msg.embedding) != query_embedding.shape[1]:
+                print(f"[Retriever Error for Message {msg.id}]: missing or mismatched embedding")
                 continue
+            candidates.append(msg)
+            vectors.append(msg.embedding)
 
-        # 8️⃣ Sort by highest similarity
-        scored_messages.sort(key=lambda x: x[0], reverse=True)
-        relevant_messages = [msg for _, msg in scored_messages[:top_k]]
+        # 8️⃣ Keep the top_k by similarity
+        picked, _ = similarity.rank(query_embedding[0], vectors, k=top_k)
+        relevant_messages = [candidates[i] for i in picked]
 
     return relevant_messages
 
@@ -14,6 +14,8 @@ app.autodiscover_tasks()
 app.conf.include = [
     'whisone.tasks.send_reminders',
     'whisone.tasks.daily_summary',
+    'whisone.tasks.reembed',
+    'whisone.tasks.access_tracking',
 ]
 
 
@@ -50,7 +52,11 @@ app.conf.beat_schedule = {
     "daily-summary-9am": {
         "task": "whisone.tasks.daily_summary.run_daily_summary",
         "schedule": crontab(hour=8, minute=0),  # every day at 8:00 AM
-    }
+    },
+    "flush-access-buffer-every-minute": {
+        "task": "whisone.tasks.access_tracking.flush_access_buffer",
+        "schedule": 60.0,  # write-behind access timestamps (whisone/access_tracker.py)
+    },
 }
 
 # Suppress tokenizer warnings (for HF models in tasks)
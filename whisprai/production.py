@@ -268,6 +268,37 @@ WHATSAPP_VERIFY_TOKEN = config("WHATSAPP_VERIFY_TOKEN", default="YOUR_VERIFY_TOK
 HUGGINGFACE_API_KEY = config("HUGGINGFACE_API_KEY", default="")
 HUGGINGFACE_SUMMARIZATION_MODEL = config("HUGGINGFACE_SUMMARIZATION_MODEL", default="facebook/bart-large-cnn")
 
+# --- Embedding spaces ---
+# Per-space model/dimension overrides (see whisone/embedding_spaces.py), e.g. {"memory": {"dimensions": 512}}.
+# After changing a space, run: python manage.py migrate_embedding_space <space>
+EMBEDDING_SPACES = {}
+
+# --- Semantic memory index ---
+# Keep int8-quantized rows (re-ranked at full precision) in the per-user memory index.
+MEMORY_INDEX_QUANTIZED = config("MEMORY_INDEX_QUANTIZED", default=False, cast=bool)
+
+# --- File processing ---
+# Upper bound on extracted text held in memory (and handed to one embedding task) while a file is parsed.
+FILE_PROCESSING_WINDOW_BYTES = config("FILE_PROCESSING_WINDOW_BYTES", default=4 * 1024 * 1024, cast=int)
+# OCR of images and scanned PDF pages (whisone/ocr.py): pool size and per-page timeout in seconds.
+OCR_MAX_WORKERS = config("OCR_MAX_WORKERS", default=2, cast=int)
+OCR_PAGE_TIMEOUT = config("OCR_PAGE_TIMEOUT", default=60, cast=int)
+
+# --- Task planner ---
+# Answer plainly worded single-action messages locally (whisone/intent_classifier.py) instead of calling the LLM
+# when the classifier's confidence reaches the threshold. Retrain with: python manage.py train_intent_classifier
+FAST_PATH_ENABLED = config("FAST_PATH_ENABLED", default=True, cast=bool)
+FAST_PATH_THRESHOLD = config("FAST_PATH_THRESHOLD", default=0.85, cast=float)
+
+# --- LLM completion cache ---
+# Replay identical low-temperature completions from Redis (whisone/llm_cache.py); hotter calls are never cached.
+LLM_CACHE_ENABLED = config("LLM_CACHE_ENABLED", default=True, cast=bool)
+LLM_CACHE_MAX_TEMPERATURE = config("LLM_CACHE_MAX_TEMPERATURE", default=0.2, cast=float)
+
+# --- OpenAI client ---
+# Per-call-site timeout budgets in seconds, overriding whisone/llm_client.py SITE_TIMEOUTS, e.g. {"planner": 15}.
+LLM_TIMEOUTS = {}
+
 # --- Swagger ---
 SWAGGER_SETTINGS = {
     "SECURITY_DEFINITIONS": {"Bearer": {"type": "apiKey", "name": "Authorization", "in": "header"}},